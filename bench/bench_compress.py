@@ -0,0 +1,128 @@
+# Usage: python3 bench_compress.py [baud] [delay] [window_bits]
+#                                  [lookahead_bits]
+# Parameters:
+#  baud:           emulated link baud rate (default 115200)
+#  delay:          emulated board processing time per command in seconds
+#                  (default 0)
+#  window_bits:    LZSS window size in bits (default 8)
+#  lookahead_bits: LZSS longest match in bits (default 4)
+# Output:
+#  For each program in expt-chad, its LZSS compression ratio and the upload
+#  time with write_page_ext commands, as an uncompressed image and as a
+#  compressed image
+
+# import Python modules
+import os   # paths
+import sys  # accessing script arguments
+import time # perf_counter
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import bootloader_emulator # emulated EXPT bootloader on a pty
+from taolst import device    # serial devices
+from taolst import fragment  # COMMON_DATA fragments and send window
+from taolst import hexfile   # Intel HEX pages
+from taolst import lzss      # compressed program images
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Programs compared
+HEX_DIR = os.path.join(BENCH_DIR,'..','expt-chad')
+
+## Command fields used by the upload scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+# helper functions
+
+## Uploads pages with write_page_ext commands, as upload_program_ext.py does;
+## returns True if every page was acknowledged
+def upload_pages(serial_port, pages):
+  rx_cmd_buff = RxCmdBuff()
+  for page_number, page_data in enumerate(pages):
+    cmd = TxCmd(BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, page_number, SRC, DST)
+    cmd.bootloader_write_page_ext(page_number=page_number, page_data=page_data)
+    rx_cmd_buff.clear()
+    if not transport.transact(serial_port, cmd, rx_cmd_buff, None, 1.0) or \
+       rx_cmd_buff.data[OPCODE_INDEX] != BOOTLOADER_ACK_OPCODE:
+      return False
+  return True
+
+## Uploads an image as COMMON_DATA fragments, as upload_program_lz.py does;
+## returns True if the board acknowledged every fragment
+def upload_image(serial_port, image):
+  cmds = fragment.fragment_cmds(image, HWID, 0x0000, SRC, DST)
+  return fragment.WindowedSender(serial_port).send(cmds)
+
+## Runs upload(serial_port, arg) against a fresh emulator; returns the wall
+## time in seconds, or None if the upload failed
+def timed_upload(upload, arg, baud, delay):
+  process, slave_fd, dev = bootloader_emulator.start(baud, delay)
+  serial_port = device.open_serial(dev, baud)
+  t_wall = time.perf_counter()
+  ok = upload(serial_port, arg)
+  t_wall = time.perf_counter()-t_wall
+  serial_port.close()
+  os.close(slave_fd)
+  process.join(1.0)
+  process.terminate()
+  return t_wall if ok else None
+
+## Formats an upload time
+def seconds(t):
+  return '{:8.3f} s'.format(t) if t is not None else '  FAILED  '
+
+################################################################################
+
+# initialize script arguments
+baud = bootloader_emulator.DEFAULT_BAUD
+delay = bootloader_emulator.DEFAULT_DELAY
+window_bits = lzss.DEFAULT_WINDOW_BITS
+lookahead_bits = lzss.DEFAULT_LOOKAHEAD_BITS
+
+# parse script arguments
+if len(sys.argv) > 5:
+  print(\
+   'Usage: '\
+   'python3 bench_compress.py '\
+   '[baud] [delay] [window_bits] [lookahead_bits]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  baud = int(sys.argv[1])
+if len(sys.argv) > 2:
+  delay = float(sys.argv[2])
+if len(sys.argv) > 3:
+  window_bits = int(sys.argv[3])
+if len(sys.argv) > 4:
+  lookahead_bits = int(sys.argv[4])
+
+print('{:d} baud, {:.6f} s delay, {:d}-bit window, {:d}-bit lookahead'.format(\
+ baud, delay, window_bits, lookahead_bits\
+))
+print('{:>18s} {:>6s} {:>7s} {:>6s} {:>10s} {:>10s} {:>10s} {:>6s}'.format(\
+ 'program', 'pages', 'bytes', 'ratio', 'ext', 'image', 'lzss', 'saved'\
+))
+for name in sorted(os.listdir(HEX_DIR)):
+  if not name.endswith('.hex'):
+    continue
+  pages = hexfile.read_pages(os.path.join(HEX_DIR,name))
+  program = b''.join(pages)
+  stored = lzss.pack_image(program, 0, lzss.STORED)
+  compressed = lzss.pack_image(program, 0, window_bits, lookahead_bits)
+  t_ext = timed_upload(upload_pages, pages, baud, delay)
+  t_stored = timed_upload(upload_image, stored, baud, delay)
+  t_lzss = timed_upload(upload_image, compressed, baud, delay)
+  saved = ''
+  if t_ext is not None and t_lzss is not None:
+    saved = '{:5.1f}%'.format(100.0*(t_ext-t_lzss)/t_ext)
+  print('{:>18s} {:6d} {:7d} {:6.2f} {:s} {:s} {:s} {:>6s}'.format(\
+   name, len(pages), len(program), len(program)/len(compressed),\
+   seconds(t_ext), seconds(t_stored), seconds(t_lzss), saved\
+  ))
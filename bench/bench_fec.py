@@ -0,0 +1,158 @@
+# Usage: python3 bench_fec.py [frames] [ber] [burst] [nsym] [depth] [seed]
+# Parameters:
+#  frames: write page commands in the uploaded stream (default 2000)
+#  ber:    simulated bit error rate (default 0.0001)
+#  burst:  bits flipped by each error event (default 8)
+#  nsym:   Reed-Solomon parity bytes per 255-byte codeword (default 32)
+#  depth:  codewords interleaved (default 4)
+#  seed:   random seed (default 1)
+# Output:
+#  Reed-Solomon encode and decode throughput, and how many commands arrive
+#  intact with and without FEC under the simulated errors, with the goodput
+#  each gives on a 115200 baud link
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+import time # perf_counter
+
+# initialize script arguments
+frames = 2000 # commands
+ber = 0.0001  # bit error rate
+burst = 8     # bits per error event
+nsym = 32     # parity bytes
+depth = 4     # interleaving depth
+seed = 1      # random seed
+
+# parse script arguments
+if len(sys.argv) > 7:
+  print(\
+   'Usage: '\
+   'python3 bench_fec.py '\
+   '[frames] [ber] [burst] [nsym] [depth] [seed]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  frames = int(sys.argv[1])
+if len(sys.argv) > 2:
+  ber = float(sys.argv[2])
+if len(sys.argv) > 3:
+  burst = int(sys.argv[3])
+if len(sys.argv) > 4:
+  nsym = int(sys.argv[4])
+if len(sys.argv) > 5:
+  depth = int(sys.argv[5])
+if len(sys.argv) > 6:
+  seed = int(sys.argv[6])
+
+# import modules needed once inputs are given
+import numpy # stream arrays and error injection
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import fec        # Reed-Solomon codec
+from taolst.protocol import * # TAOLST constants and TxCmd
+
+################################################################################
+
+# "constants"
+
+## Command fields used by the EXPT test scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+## Link rate for goodput, with 8N1 framing
+BAUD = 115200
+BITS_PER_BYTE = 10
+
+## Bytes of program data per write page command
+BYTES_PER_PAGE = 128
+
+# helper functions
+
+## Flips burst consecutive bits at each of a binomial number of random
+## positions of wire, so that the bit error rate is about ber
+def add_errors(rng, wire, ber, burst):
+  wire = numpy.frombuffer(bytes(wire), dtype=numpy.uint8).copy()
+  bits = 8*len(wire)
+  starts = rng.integers(0, bits, rng.binomial(bits, ber/burst))
+  flipped = (starts[:,None]+numpy.arange(burst)[None,:]).ravel()
+  flipped = flipped[flipped < bits]
+  numpy.bitwise_xor.at(\
+   wire, flipped//8, (1<<(flipped%8)).astype(numpy.uint8)\
+  )
+  return wire
+
+## Returns how many frames (spans of stream between bounds) are unchanged in
+## received
+def intact_frames(stream, received, bounds):
+  bad = numpy.flatnonzero(stream != received[0:len(stream)])
+  bad_frames = numpy.unique(numpy.searchsorted(bounds, bad, 'right'))
+  return len(bounds)-1-len(bad_frames)
+
+## Returns the goodput in bytes per second of intact frames over a wire of
+## wire_len bytes
+def goodput(intact, wire_len):
+  return intact*BYTES_PER_PAGE/(wire_len*BITS_PER_BYTE/BAUD)
+
+## Times fn over runs calls; returns the best time in seconds
+def best_time(fn, runs=3):
+  best = None
+  for i in range(0,runs):
+    t = time.perf_counter()
+    fn()
+    t = time.perf_counter()-t
+    best = t if best is None or t < best else best
+  return best
+
+################################################################################
+
+# Build the upload stream of write page commands
+rng = numpy.random.default_rng(seed)
+cmds = []
+for page_number in range(0,frames):
+  cmd = TxCmd(\
+   BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, page_number&0xffff, SRC, DST\
+  )
+  cmd.bootloader_write_page_ext(\
+   page_number=page_number&0xffff,\
+   page_data=rng.integers(0, 256, BYTES_PER_PAGE, dtype=numpy.uint8).tobytes()\
+  )
+  cmds.append(cmd)
+frame_bytes = [cmd.to_bytes() for cmd in cmds]
+stream = numpy.frombuffer(b''.join(frame_bytes), dtype=numpy.uint8)
+bounds = numpy.concatenate(([0], numpy.cumsum([len(f) for f in frame_bytes])))
+
+codec = fec.FecCodec(nsym, depth)
+wire = codec.encode(stream)
+print('{:d} commands, {:d} bytes; RS({:d},{:d}) depth {:d}: {:d} wire bytes '\
+ '({:.1f}% overhead)'.format(\
+  frames, len(stream), codec.rs.n, codec.rs.k, depth, len(wire),\
+  100.0*(len(wire)-len(stream))/len(stream)\
+ )\
+)
+
+# Throughput
+t_encode = best_time(lambda: codec.encode(stream))
+t_decode = best_time(lambda: fec.FecCodec(nsym, depth).decode(wire))
+noisy_fec = add_errors(rng, wire, ber, burst)
+t_noisy = best_time(lambda: fec.FecCodec(nsym, depth).decode(noisy_fec))
+print('encode {:.2f} MB/s, decode {:.2f} MB/s clean, {:.2f} MB/s noisy'.format(\
+ len(stream)/t_encode/1e6, len(stream)/t_decode/1e6, len(stream)/t_noisy/1e6\
+))
+
+# Goodput under errors
+print('bit error rate {:g} in bursts of {:d} bits, {:d} baud'.format(\
+ ber, burst, BAUD\
+))
+noisy_raw = add_errors(rng, stream, ber, burst)
+intact = intact_frames(stream, noisy_raw, bounds)
+print('raw: {:d} of {:d} commands intact, goodput {:.0f} B/s'.format(\
+ intact, frames, goodput(intact, len(stream))\
+))
+received = numpy.frombuffer(codec.decode(noisy_fec), dtype=numpy.uint8)
+intact = intact_frames(stream, received, bounds)
+print('fec: {:d} of {:d} commands intact, goodput {:.0f} B/s; {:s}'.format(\
+ intact, frames, goodput(intact, len(wire)), str(codec)\
+))
@@ -0,0 +1,112 @@
+# Usage: python3 bench_fragment.py [samples] [baud] [delay] [crc]
+# Parameters:
+#  samples: 9-channel IMU samples in the data block (default 512)
+#  baud:    emulated link baud rate (default 115200)
+#  delay:   emulated board processing time per command in seconds (default 0)
+#  crc:     CRC trailer width in bits: 0 (none, the default), 16 or 32
+# Output:
+#  Effective payload throughput of a fragmented COMMON_DATA transfer for each
+#  send window size
+
+# import Python modules
+import os     # paths
+import random # fragment arrival order
+import sys    # accessing script arguments
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import bootloader_emulator # emulated EXPT board on a pty
+from taolst import common_data # COMMON_DATA sample codec
+from taolst import device      # serial devices
+from taolst import fragment    # COMMON_DATA fragmentation
+from taolst.protocol import CRC_BY_BITS # CRC trailer modes
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_SAMPLES = 512
+
+## Command fields used by the EXPT test scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+## Send window sizes compared
+WINDOWS = (1, 2, 4, 8)
+
+## Bits on the wire per byte with 8N1 framing
+BITS_PER_BYTE = 10
+
+# helper functions
+
+## Returns a block of pseudo-random IMU samples
+def imu_block(samples):
+  rng = random.Random(samples)
+  return common_data.pack(\
+   [rng.randrange(0,0x10000) for i in range(0,samples*common_data.CHANNELS)]\
+  )
+
+## Checks that fragments delivered out of order and duplicated reassemble
+def check_reassembly(block):
+  cmds = fragment.fragment_cmds(block, HWID, 0x0000, SRC, DST)
+  order = list(range(0,len(cmds)))+[0]
+  random.Random(0).shuffle(order)
+  reassembler = fragment.Reassembler()
+  for i in order:
+    reassembler.add_payload(common_data.payload(cmds[i].data))
+  return reassembler.block() == block
+
+## Sends block over a fresh emulator with the given window and prints the
+## transfer statistics
+def bench_window(block, window, baud, delay, crc):
+  process, slave_fd, dev = bootloader_emulator.start(baud, delay, 0.0, crc)
+  serial_port = device.open_serial(dev, baud)
+  cmds = fragment.fragment_cmds(block, HWID, 0x0000, SRC, DST)
+  sender = fragment.WindowedSender(serial_port, window, crc=crc)
+  ok = sender.send(cmds)
+  serial_port.close()
+  os.close(slave_fd)
+  process.join(1.0)
+  process.terminate()
+  print('window {:d}: {:s}{:s}, {:.0f}% of link rate'.format(\
+   window, str(sender), '' if ok else ' FAILED',\
+   100.0*sender.throughput()*BITS_PER_BYTE/baud\
+  ))
+
+################################################################################
+
+# initialize script arguments
+samples = DEFAULT_SAMPLES
+baud = bootloader_emulator.DEFAULT_BAUD
+delay = bootloader_emulator.DEFAULT_DELAY
+crc = 0
+
+# parse script arguments
+if len(sys.argv) > 5:
+  print(\
+   'Usage: '\
+   'python3 bench_fragment.py '\
+   '[samples] [baud] [delay] [crc]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  samples = int(sys.argv[1])
+if len(sys.argv) > 2:
+  baud = int(sys.argv[2])
+if len(sys.argv) > 3:
+  delay = float(sys.argv[3])
+if len(sys.argv) > 4:
+  crc = int(sys.argv[4])
+
+block = imu_block(samples)
+print('{:d} samples, {:d} bytes, {:d} fragments, {:d} baud, {:.6f} s delay, '\
+ '{:d}-bit CRC'.format(\
+  samples, len(block), len(fragment.split(block)), baud, delay, crc\
+ )\
+)
+print('reassembly: '+('ok' if check_reassembly(block) else 'MISMATCH'))
+for window in WINDOWS:
+  bench_window(block, window, baud, delay, CRC_BY_BITS[crc])
@@ -0,0 +1,181 @@
+# Usage: python3 bench_hot_paths.py [pyperf options]
+# Parameters:
+#  pyperf options: e.g. -o results.json to store results, --fast for a quick run
+# Output:
+#  Timings of TAOLST encode/decode hot paths; compare two stored runs with
+#  python3 -m pyperf compare_to old.json new.json
+
+# import Python modules
+import numpy  # SGP4 time grids
+import os     # paths
+import pyperf # benchmark runner
+import sys    # path to the shared taolst package
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import fake_serial # in-memory serial port
+from taolst import common_data # COMMON_DATA sample codec
+from taolst import hexfile     # Intel HEX pages
+from taolst import protocol    # TAOLST constants, TxCmd and RxCmdBuff
+from taolst import sgp4        # vectorized SGP4
+from taolst import telem       # APP_TELEM schema and store
+from taolst import tle         # TLE validation and uplink frames
+from taolst import transport   # command round trips
+
+################################################################################
+
+# "constants"
+
+## Input files
+FLIGHT_HEX = os.path.join(BENCH_DIR,'..','expt-chad','flight-401-usr.hex')
+
+## Command fields used throughout
+HWID = 0x5441
+MSGID = 0x0123
+SRC = 0x00
+DST = 0x02
+
+## Frames in the long RxCmdBuff stream
+STREAM_FRAMES = 64
+
+## Samples held by the COMMON_DATA ring buffer
+RING_SAMPLES = 4096
+
+## Example TLE sent as COMMON_ASCII
+TLE = \
+ 'TLE'+'FLOCK 3K-5              '+\
+ '1 43899U 18111Z   21284.66246111  .00014637  00000-0  51582-3 0  9994'+\
+ '2 43899  97.2179 176.7560 0018058 232.7758 127.1835 15.29226533155475'
+
+# helper functions
+
+## Returns a bootloader_ack reply to a written frame
+def ack_reply(frame):
+  return bytes([\
+   0x22, 0x69, 0x07, frame[3], frame[4], frame[5], frame[6],\
+   ((frame[7]&0x0f)<<4)|((frame[7]&0xf0)>>4), 0x01, 0x00\
+  ])
+
+## Builds a TxCmd and returns its frame bytes
+def frame_bytes(cmd):
+  return bytes(cmd.data[0:cmd.get_byte_count()])
+
+## Feeds every byte of stream into rx_cmd_buff, clearing after each command
+def decode_stream(stream):
+  rx_cmd_buff = protocol.RxCmdBuff()
+  count = 0
+  for b in stream:
+    rx_cmd_buff.append_byte(b)
+    while rx_cmd_buff.state == protocol.RxCmdBuffState.COMPLETE:
+      rx_cmd_buff.clear()
+      count += 1
+  return count
+
+## Sends a write page command through transact and a FakeSerial
+def round_trip(port, page):
+  cmd = TxCmd(protocol.BOOTLOADER_WRITE_PAGE_OPCODE, HWID, MSGID, SRC, DST)
+  cmd.bootloader_write_page(page_number=1, page_data=page)
+  transport.transact(port, cmd, protocol.RxCmdBuff())
+
+################################################################################
+
+runner = pyperf.Runner()
+TxCmd = protocol.TxCmd
+pages = hexfile.read_pages(FLIGHT_HEX)
+page = pages[1]
+
+# TxCmd construction for every opcode
+for name in sorted(vars(protocol)):
+  if name.endswith('_OPCODE'):
+    runner.bench_func(\
+     'txcmd_'+name[:-len('_OPCODE')].lower(),\
+     TxCmd, getattr(protocol, name), HWID, MSGID, SRC, DST\
+    )
+
+# Bootloader write page population
+def write_page():
+  cmd = TxCmd(protocol.BOOTLOADER_WRITE_PAGE_OPCODE, HWID, MSGID, SRC, DST)
+  cmd.bootloader_write_page(page_number=1, page_data=page)
+def write_page_ext():
+  cmd = TxCmd(\
+   protocol.BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, MSGID, SRC, DST\
+  )
+  cmd.bootloader_write_page_ext(page_number=300, page_data=page)
+def write_page_addr32():
+  cmd = TxCmd(\
+   protocol.BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE, HWID, MSGID, SRC, DST\
+  )
+  cmd.bootloader_write_page_addr32(addr=0x08008080, page_data=page)
+def common_data_values():
+  cmd = TxCmd(protocol.COMMON_DATA_OPCODE, HWID, MSGID, SRC, DST)
+  cmd.common_data(imu_vals)
+def common_data_encode():
+  cmd = TxCmd(protocol.COMMON_DATA_OPCODE, HWID, MSGID, SRC, DST)
+  common_data.encode(cmd, imu_vals)
+imu_vals = [(i*2654435761)&0xffff for i in range(0,126)]
+runner.bench_func('bootloader_write_page', write_page)
+runner.bench_func('bootloader_write_page_ext', write_page_ext)
+runner.bench_func('bootloader_write_page_addr32', write_page_addr32)
+runner.bench_func('common_data', common_data_values)
+runner.bench_func('common_data_encode', common_data_encode)
+
+# COMMON_DATA sample blocks into a ring buffer
+cmd = TxCmd(protocol.COMMON_DATA_OPCODE, HWID, MSGID, SRC, DST)
+common_data.encode(cmd, imu_vals)
+ring = common_data.SampleRing(RING_SAMPLES)
+payload = common_data.payload(cmd.data)
+runner.bench_func('common_data_decode', common_data.decode, cmd.data)
+runner.bench_func('sample_ring_append', ring.append_payload, payload)
+
+# RxCmdBuff.append_byte over a long stream of write page commands with noise
+stream = bytearray()
+for i in range(0,STREAM_FRAMES):
+  cmd = TxCmd(protocol.BOOTLOADER_WRITE_PAGE_OPCODE, HWID, i, SRC, DST)
+  cmd.bootloader_write_page(page_number=i, page_data=pages[i])
+  stream += frame_bytes(cmd)+b'\x00\x22\x00'
+runner.bench_func('rx_cmd_buff_stream', decode_stream, bytes(stream))
+
+# cmd_bytes_to_str formatting
+cmd = TxCmd(protocol.BOOTLOADER_WRITE_PAGE_OPCODE, HWID, MSGID, SRC, DST)
+cmd.bootloader_write_page(page_number=1, page_data=page)
+runner.bench_func('str_write_page', protocol.cmd_bytes_to_str, cmd.data)
+cmd = TxCmd(protocol.APP_TELEM_OPCODE, HWID, MSGID, SRC, DST)
+cmd.app_telem(list(range(0,78)))
+runner.bench_func('str_app_telem', protocol.cmd_bytes_to_str, cmd.data)
+cmd = TxCmd(protocol.COMMON_ASCII_OPCODE, HWID, MSGID, SRC, DST)
+cmd.common_ascii(TLE)
+runner.bench_func('str_common_ascii_tle', protocol.cmd_bytes_to_str, cmd.data)
+
+# TLE uplink frames, built from scratch and from the cache
+flock = tle.Tle('FLOCK 3K-5', TLE[27:96], TLE[96:165])
+def tle_frame_build(flock):
+  cmd = TxCmd(protocol.COMMON_ASCII_OPCODE, HWID, MSGID, SRC, DST)
+  cmd.common_ascii(flock.ascii())
+  return frame_bytes(cmd)
+uplink = tle.Uplink(None, HWID, SRC, DST)
+runner.bench_func('tle_frame_build', tle_frame_build, flock)
+runner.bench_func('tle_frame_cached', uplink.frame, flock, MSGID)
+
+# SGP4 for one TLE at one time, and for 100 TLEs at each minute of a day
+elements = sgp4.Elements([flock])
+runner.bench_func('sgp4_propagate_1x1', elements.propagate, [0.0])
+elements = sgp4.Elements([flock]*100)
+tsince = numpy.arange(0.0, 1440.0)
+runner.bench_func('sgp4_propagate_100x1440', elements.propagate, tsince)
+
+# APP_TELEM decoding, one payload at a time and as a block
+schema = telem.Schema(telem.DEFAULT_FIELDS)
+payload = bytes(range(0,telem.TELEM_LEN))
+def telem_store_block(payloads):
+  store = telem.TelemStore(schema, len(payloads)//telem.TELEM_LEN)
+  store.append_block(payloads, 0.0, HWID)
+runner.bench_func('telem_decode', schema.decode, payload)
+runner.bench_func('telem_store_block_1024', telem_store_block, payload*1024)
+
+# Intel HEX page building
+runner.bench_func('hex_read_pages_flight_401', hexfile.read_pages, FLIGHT_HEX)
+
+# Full round trip through transact against an in-memory serial port
+port = fake_serial.FakeSerial(ack_reply)
+runner.bench_func('transact_write_page', round_trip, port, page)
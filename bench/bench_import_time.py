@@ -0,0 +1,120 @@
+# Usage: python3 bench_import_time.py [runs]
+# Parameters:
+#  runs: number of times each entry point is started (default 20)
+# Output:
+#  Median wall time, import time and largest imports of each entry point
+
+# import Python modules
+import os         # paths and environment
+import statistics # median
+import subprocess # starting entry points
+import sys        # accessing script arguments and the interpreter path
+import time       # perf_counter
+
+################################################################################
+
+# "constants"
+
+## Defaults
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR,'..')
+DEFAULT_RUNS = 20
+
+## Largest imports listed per entry point
+TOP_IMPORTS = 5
+
+## Entry points as (directory, script, arguments); scripts that need a board
+## are started without arguments so they only parse argv and print their usage
+ENTRY_POINTS = (
+ ('demo',      'demo.py',                  ['sample.hex', '/tmp/']),
+ ('expt',      'test_expt.py',             []),
+ ('expt-chad', 'blink_demo_jump.py',       []),
+ ('expt-chad', 'test_expt_data.py',        []),
+ ('expt-chad', 'upload_program.py',        []),
+ ('expt-chad', 'upload_program_addr32.py', []),
+ ('expt-chad', 'upload_program_ext.py',    []),
+ ('expt-chad', 'upload_program_lz.py',     []),
+ ('poll',      'poll_telem.py',            []),
+ ('poll',      'track_drift.py',           []),
+ ('router',    'route_frames.py',          []),
+ ('router',    'serve_gateway.py',         []),
+ ('test-ctrl', 'test_ctrl.py',             []),
+ ('test-expt', 'test_expt.py',             []),
+ ('tle',       'check_gmst.py',            []),
+ ('tle',       'check_positions.py',       []),
+ ('tle',       'plan_passes.py',           []),
+ ('tle',       'uplink_tle.py',            [])
+)
+
+# helper functions
+
+## Parses -X importtime output into a list of (cumulative us, module) for the
+## imports made directly by the script, i.e. excluding nested imports
+def parse_importtime(stderr):
+  imports = []
+  for line in stderr.splitlines():
+    if not line.startswith('import time:') or 'self [us]' in line:
+      continue
+    fields = line[len('import time:'):].split('|')
+    name = fields[2].rstrip()
+    if name.startswith(' '*3):
+      continue
+    imports.append((int(fields[1]), name.strip()))
+  return imports
+
+## Starts an entry point once and returns (wall seconds, imports)
+def run_once(directory, script, args, env):
+  t_wall = time.perf_counter()
+  result = subprocess.run(\
+   [sys.executable, '-X', 'importtime', script]+args,\
+   cwd=os.path.join(REPO_DIR,directory), env=env,\
+   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True\
+  )
+  t_wall = time.perf_counter()-t_wall
+  return t_wall, parse_importtime(result.stderr)
+
+## Starts an entry point repeatedly and prints its statistics
+def bench_entry_point(directory, script, args, runs, env):
+  walls = []
+  totals = []
+  by_module = {}
+  for i in range(0,runs):
+    t_wall, imports = run_once(directory, script, args, env)
+    walls.append(t_wall)
+    totals.append(sum(us for us, name in imports))
+    for us, name in imports:
+      by_module.setdefault(name,[]).append(us)
+  print('{:>36s}: {:7.1f} ms wall, {:7.1f} ms imports'.format(\
+   directory+'/'+script, statistics.median(walls)*1e3,\
+   statistics.median(totals)/1e3\
+  ))
+  largest = sorted(\
+   ((statistics.median(us), name) for name, us in by_module.items()),\
+   reverse=True\
+  )
+  for us, name in largest[0:TOP_IMPORTS]:
+    print('{:>36s}  {:7.1f} ms {:s}'.format('', us/1e3, name))
+
+################################################################################
+
+# initialize script arguments
+runs = DEFAULT_RUNS
+
+# parse script arguments
+if len(sys.argv) > 2:
+  print(\
+   'Usage: '\
+   'python3 bench_import_time.py '\
+   '[runs]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  runs = int(sys.argv[1])
+
+# allow cached bytecode so only import work is measured, not compilation
+env = dict(os.environ)
+env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+print('{:d} runs per entry point, medians shown'.format(runs))
+for directory, script, args in ENTRY_POINTS:
+  bench_entry_point(directory, script, args, runs, env)
@@ -0,0 +1,137 @@
+# Usage: python3 bench_raw_serial.py [commands] [baud] [delay]
+# Parameters:
+#  commands: bootloader_ping round trips per backend and path (default 1000)
+#  baud:     emulated link baud rate (default 115200)
+#  delay:    emulated board processing time per command in seconds (default 0)
+# Output:
+#  Round trip time distribution and syscalls per command of the pyserial and
+#  raw termios (rawserial.RawSerial) backends, through transport.transact
+#  (byte at a time) and transport.exchange (whole frame), against the
+#  emulator on a pty
+
+# import Python modules
+import collections # syscall counters
+import os          # paths
+import sys         # accessing script arguments and profiling
+import time        # perf_counter_ns
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import bootloader_emulator # emulated EXPT board on a pty
+from taolst import device     # serial devices
+from taolst import trace      # latency histograms
+from taolst import transport  # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_COMMANDS = 1000
+
+## Command fields used by the EXPT test scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+## Seconds to wait for a reply
+REPLY_TIMEOUT = 1.0
+
+## Round trips counted for syscalls, with a profiler that slows them down
+PROFILED_COMMANDS = 100
+
+## Modules whose functions are system calls (os is posix)
+SYSCALL_MODULES = ('posix', 'fcntl', 'select', 'termios')
+
+# helper functions
+
+## Sends a bootloader_ping over serial_port by path (transact or exchange);
+## returns False if the reply is missing
+def ping(serial_port, path, msg_id):
+  cmd = TxCmd(BOOTLOADER_PING_OPCODE, HWID, msg_id&0xffff, SRC, DST)
+  rx_cmd_buff = RxCmdBuff()
+  if path == 'transact':
+    return transport.transact(serial_port, cmd, rx_cmd_buff, None,\
+                              REPLY_TIMEOUT)
+  return transport.exchange(serial_port, cmd.to_bytes(), rx_cmd_buff,\
+                            REPLY_TIMEOUT)
+
+## Returns a sys.setprofile function counting the calls to system call
+## functions in counts, by function name
+def syscall_counter(counts):
+  def profile(frame, event, arg):
+    if event != 'c_call':
+      return
+    module = getattr(arg, '__module__', None)
+    if module is None: # methods, e.g. of select.epoll
+      module = type(getattr(arg, '__self__', None)).__module__
+    if module in SYSCALL_MODULES:
+      counts[arg.__name__] += 1
+  return profile
+
+## Times commands round trips over dev by path, then counts the syscalls of
+## PROFILED_COMMANDS more; prints the distribution and syscalls per command
+def bench_backend(dev, path, commands, baud):
+  serial_port = device.open_serial(dev, baud)
+  round_trip = trace.LatencyHistogram()
+  missing = 0
+  t_cpu = time.process_time()
+  for i in range(0,commands):
+    t_sent = time.perf_counter_ns()
+    if ping(serial_port, path, i):
+      round_trip.add(time.perf_counter_ns()-t_sent)
+    else:
+      missing += 1
+  t_cpu = time.process_time()-t_cpu
+  counts = collections.Counter()
+  sys.setprofile(syscall_counter(counts))
+  for i in range(0,PROFILED_COMMANDS):
+    ping(serial_port, path, i)
+  sys.setprofile(None)
+  serial_port.close()
+  print('{:>8s} {:>8s}: p50 < {:d} us, p99 < {:d} us, {:s}, {:.1f} us '\
+   'CPU, {:d} missing'.format(\
+    'raw' if dev.startswith('raw://') else 'pyserial', path,\
+    round_trip.quantile_us(0.5), round_trip.quantile_us(0.99),\
+    str(round_trip), t_cpu/commands*1e6, missing\
+  ))
+  print('{:>19s}{:.1f} syscalls per command ({:s})'.format(\
+   '', sum(counts.values())/PROFILED_COMMANDS,\
+   ', '.join('{:s} {:.1f}'.format(name, n/PROFILED_COMMANDS) \
+             for name, n in counts.most_common())\
+  ))
+
+################################################################################
+
+# initialize script arguments
+commands = DEFAULT_COMMANDS
+baud = bootloader_emulator.DEFAULT_BAUD
+delay = bootloader_emulator.DEFAULT_DELAY
+
+# parse script arguments
+if len(sys.argv) > 4:
+  print(\
+   'Usage: '\
+   'python3 bench_raw_serial.py '\
+   '[commands] [baud] [delay]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  commands = int(sys.argv[1])
+if len(sys.argv) > 2:
+  baud = int(sys.argv[2])
+if len(sys.argv) > 3:
+  delay = float(sys.argv[3])
+
+print('{:d} round trips, {:d} baud, {:.6f} s delay'.format(\
+ commands, baud, delay\
+))
+process, slave_fd, dev = bootloader_emulator.start(baud, delay)
+for path in ('transact', 'exchange'):
+  for backend_dev in (dev, 'raw://'+dev):
+    bench_backend(backend_dev, path, commands, baud)
+os.close(slave_fd)
+process.join(1.0)
+process.terminate()
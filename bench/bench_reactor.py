@@ -0,0 +1,210 @@
+# Usage: python3 bench_reactor.py [ports] [pings] [period]
+# Parameters:
+#  ports:  emulated boards, one pty each (default 32)
+#  pings:  bootloader_pings sent to each board (default 200)
+#  period: seconds between pings to a board (default 0.01)
+# Output:
+#  Round trip time distribution, missing replies and ground CPU use with one
+#  process per port spinning on in_waiting (as one test script per board
+#  does) and with every port served by one reactor.Reactor
+
+# import Python modules
+import heapq           # ping schedule
+import multiprocessing # board and ground processes
+import os              # pty file descriptors
+import sys             # accessing script arguments
+import time            # perf_counter_ns, process_time
+import tty             # raw mode
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+from taolst import device     # serial devices
+from taolst import reactor    # many-port event loop
+from taolst import responder  # templated replies
+from taolst import trace      # latency histograms
+from taolst import transport  # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_PORTS  = 32
+DEFAULT_PINGS  = 200
+DEFAULT_PERIOD = 0.01
+
+## Command fields used by the EXPT test scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+## Seconds to wait for a reply
+REPLY_TIMEOUT = 1.0
+
+# helper functions
+
+## Answers bootloader_pings on every pty master in master_fds from one
+## reactor, as a rack of EXPT boards in their bootloader. Each board has its
+## own Responder, as the boards share HWID and message IDs and a Responder
+## answers each message ID once
+def boards(master_fds):
+  board_reactor = reactor.Reactor()
+  for i, fd in enumerate(master_fds):
+    ack = responder.Responder(DST)
+    ack.add_template(BOOTLOADER_PING_OPCODE, BOOTLOADER_ACK_OPCODE,\
+                     [BOOTLOADER_ACK_REASON_PONG])
+    board_reactor.add(reactor.Port(\
+     'board-{:d}'.format(i), fd,\
+     lambda port, frame, t_read, ack=ack: \
+      ack.respond(frame, port.write, t_read)\
+    ))
+  board_reactor.run()
+
+## Returns the ping to send as msg_id
+def ping_frame(msg_id):
+  return TxCmd(BOOTLOADER_PING_OPCODE, HWID, msg_id, SRC, DST).to_bytes()
+
+## Ground process for one port: pings the board on dev every period seconds
+## from t_start (perf_counter) with transport.transact, and sends the round
+## trip LatencyHistogram, missing replies and CPU seconds through pipe
+def ping_one(dev, pings, period, t_start, pipe):
+  serial_port = device.open_serial(dev)
+  round_trip = trace.LatencyHistogram()
+  missing = 0
+  t_cpu = time.process_time()
+  rx_cmd_buff = RxCmdBuff()
+  for msg_id in range(0,pings):
+    time.sleep(max(0.0, t_start+msg_id*period-time.perf_counter()))
+    cmd = TxCmd(BOOTLOADER_PING_OPCODE, HWID, msg_id, SRC, DST)
+    rx_cmd_buff.clear()
+    t_sent = time.perf_counter_ns()
+    if transport.transact(serial_port, cmd, rx_cmd_buff, None,\
+                          REPLY_TIMEOUT):
+      round_trip.add(time.perf_counter_ns()-t_sent)
+    else:
+      missing += 1
+  pipe.send((round_trip, missing, time.process_time()-t_cpu))
+  serial_port.close()
+
+## Ground process for every port: pings the board on each of fds every
+## period seconds from t_start, staggered as ping_one is, from one reactor,
+## and sends the results through pipe as ping_one does
+def ping_all(fds, pings, period, t_start, pipe):
+  round_trip = trace.LatencyHistogram()
+  t_sent = {} # (port, msg_id) -> perf_counter_ns of the pings in flight
+  def on_frame(port, frame, t_read):
+    t = t_sent.pop(\
+     (port, frame[MSG_ID_LSB_INDEX]|(frame[MSG_ID_MSB_INDEX]<<8)), None\
+    )
+    if t is not None:
+      round_trip.add(t_read-t)
+  t_cpu = time.process_time()
+  ground_reactor = reactor.Reactor()
+  schedule = []
+  for i, fd in enumerate(fds):
+    port = reactor.Port('port-{:d}'.format(i), fd, on_frame)
+    ground_reactor.add(port)
+    schedule.append((t_start+i*period/len(fds), i, 0, port))
+  heapq.heapify(schedule)
+  while schedule:
+    t_due, i, msg_id, port = schedule[0]
+    wait = t_due-time.perf_counter()
+    if wait > 0:
+      ground_reactor.poll(wait)
+      continue
+    heapq.heappop(schedule)
+    t_sent[(port, msg_id)] = time.perf_counter_ns()
+    port.write(ping_frame(msg_id))
+    if msg_id+1 < pings:
+      heapq.heappush(schedule, (t_due+period, i, msg_id+1, port))
+  t_deadline = time.perf_counter()+REPLY_TIMEOUT
+  while t_sent and time.perf_counter() < t_deadline:
+    ground_reactor.poll(t_deadline-time.perf_counter())
+  missing = len(t_sent)
+  pipe.send((round_trip, missing, time.process_time()-t_cpu))
+
+## Runs the boards on ports new ptys and pings them with one ground process
+## per port or one reactor; prints the merged round trip distribution, the
+## missing replies and the ground CPU use
+def bench_ground(ports, pings, period, use_reactor):
+  context = multiprocessing.get_context('fork')
+  master_fds = []
+  slave_fds = []
+  for i in range(0,ports):
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(slave_fd)
+    master_fds.append(master_fd)
+    slave_fds.append(slave_fd)
+  board_process = context.Process(target=boards, args=(master_fds,),\
+                                  daemon=True)
+  board_process.start()
+  for fd in master_fds:
+    os.close(fd)
+  t_start = time.perf_counter()+0.1
+  receiver, sender = multiprocessing.Pipe(False)
+  if use_reactor:
+    processes = [context.Process(\
+     target=ping_all, args=(slave_fds, pings, period, t_start, sender),\
+     daemon=True\
+    )]
+  else:
+    processes = [context.Process(\
+     target=ping_one,\
+     args=(os.ttyname(fd), pings, period, t_start+i*period/ports, sender),\
+     daemon=True\
+    ) for i, fd in enumerate(slave_fds)]
+  for process in processes:
+    process.start()
+  round_trip = trace.LatencyHistogram()
+  missing = 0
+  t_cpu = 0.0
+  for process in processes:
+    histogram, process_missing, process_cpu = receiver.recv()
+    round_trip.merge(histogram)
+    missing += process_missing
+    t_cpu += process_cpu
+  t_wall = time.perf_counter()-t_start
+  for process in processes:
+    process.join()
+  for fd in slave_fds:
+    os.close(fd)
+  board_process.join(1.0)
+  board_process.terminate()
+  print('{:>18s}: p50 < {:d} us, p99 < {:d} us, {:s}'.format(\
+   'reactor' if use_reactor else 'process per port',\
+   round_trip.quantile_us(0.5), round_trip.quantile_us(0.99), str(round_trip)\
+  ))
+  print('{:>18s}  {:d} missing, ground CPU {:.2f} s in {:.2f} s '\
+   '({:.0f}% of a core)'.format(\
+    '', missing, t_cpu, t_wall, t_cpu/t_wall*100\
+  ))
+
+################################################################################
+
+# initialize script arguments
+ports = DEFAULT_PORTS
+pings = DEFAULT_PINGS
+period = DEFAULT_PERIOD
+
+# parse script arguments
+if len(sys.argv) > 4:
+  print(\
+   'Usage: '\
+   'python3 bench_reactor.py '\
+   '[ports] [pings] [period]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  ports = int(sys.argv[1])
+if len(sys.argv) > 2:
+  pings = int(sys.argv[2])
+if len(sys.argv) > 3:
+  period = float(sys.argv[3])
+
+print('{:d} ports, {:d} pings each, {:.6f} s apart'.format(\
+ ports, pings, period\
+))
+for use_reactor in (False, True):
+  bench_ground(ports, pings, period, use_reactor)
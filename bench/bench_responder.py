@@ -0,0 +1,136 @@
+# Usage: python3 bench_responder.py [frames] [period] [crc] [switch_ms]
+# Parameters:
+#  frames:    common_acks sent by the emulated COMM per run (default 1000)
+#  period:    seconds between common_acks (default 0.002)
+#  crc:       CRC trailer width in bits: 0 (none, the default), 16 or 32
+#  switch_ms: interpreter thread switch interval in ms (default 5, Python's)
+# Output:
+#  Response time distribution of a ResponderThread answering common_acks
+#  from COMM on a pty, with the main thread idle and with it busy running
+#  Python code, as measured by the responder and by COMM
+
+# import Python modules
+import multiprocessing # emulated COMM process
+import os              # pty file descriptors
+import select          # waiting for replies
+import sys             # accessing script arguments and the switch interval
+import time            # perf_counter_ns
+import tty             # raw mode
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+from taolst import device     # serial devices
+from taolst import responder  # common_ack responder
+from taolst import trace      # latency histograms
+from taolst.protocol import * # TAOLST constants and TxCmd
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_FRAMES = 1000
+DEFAULT_PERIOD = 0.002
+
+## HWID used by the common_acks
+HWID = 0x5441
+
+## Seconds COMM waits for a reply before counting it missing
+REPLY_TIMEOUT = 0.1
+
+# helper functions
+
+## Keeps the interpreter busy while process runs, as an application thread
+## running Python code would
+def busy_while(process):
+  x = 0
+  while process.is_alive():
+    for i in range(0,1000):
+      x += i
+  return x
+
+## Emulated COMM: sends frames common_acks to TERM on fd, period seconds
+## apart or as soon as the reply to the last one arrives, and sends the round
+## trip LatencyHistogram and the number of missing replies through pipe
+def comm(fd, frames, period, crc, pipe):
+  round_trip = trace.LatencyHistogram()
+  missing = 0
+  for i in range(0,frames):
+    frame = TxCmd(COMMON_ACK_OPCODE, HWID, i&0xffff, DEST_COMM, DEST_TERM).\
+            to_bytes(crc)
+    t_sent = time.perf_counter_ns()
+    t_next = t_sent+int(period*1e9)
+    os.write(fd, frame)
+    reply = b''
+    while len(reply) < len(frame) and \
+          select.select([fd], [], [], REPLY_TIMEOUT)[0]:
+      reply += os.read(fd, len(frame)-len(reply))
+    if len(reply) == len(frame) and reply[MSG_ID_LSB_INDEX] == i&0xff:
+      round_trip.add(time.perf_counter_ns()-t_sent)
+    else:
+      missing += 1
+    time.sleep(max(0.0, (t_next-time.perf_counter_ns())/1e9))
+  pipe.send((round_trip, missing))
+
+## Runs a ResponderThread on a pty against an emulated COMM in another
+## process, with the main thread idle or busy, and prints the response times
+## seen by the responder and by COMM
+def bench_responder(frames, period, crc, busy):
+  master_fd, slave_fd = os.openpty()
+  tty.setraw(slave_fd)
+  serial_port = device.open_serial(os.ttyname(slave_fd))
+  ack_responder = responder.Responder(DEST_TERM, crc)
+  thread = responder.ResponderThread(serial_port, ack_responder)
+  thread.start()
+  receiver, sender = multiprocessing.Pipe(False)
+  process = multiprocessing.get_context('fork').Process(\
+   target=comm, args=(master_fd, frames, period, crc, sender), daemon=True\
+  )
+  process.start()
+  if busy:
+    busy_while(process)
+  round_trip, missing = receiver.recv()
+  process.join()
+  thread.stop()
+  serial_port.close()
+  os.close(slave_fd)
+  os.close(master_fd)
+  print('{:s} main thread, {:d} missing'.format(\
+   'busy' if busy else 'idle', missing\
+  ))
+  print('  responder: '+str(ack_responder))
+  print('  COMM:      p50 < {:d} us, p99 < {:d} us, {:s}'.format(\
+   round_trip.quantile_us(0.5), round_trip.quantile_us(0.99),\
+   str(round_trip)\
+  ))
+
+################################################################################
+
+# initialize script arguments
+frames = DEFAULT_FRAMES
+period = DEFAULT_PERIOD
+crc = 0
+
+# parse script arguments
+if len(sys.argv) > 5:
+  print(\
+   'Usage: '\
+   'python3 bench_responder.py '\
+   '[frames] [period] [crc] [switch_ms]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  frames = int(sys.argv[1])
+if len(sys.argv) > 2:
+  period = float(sys.argv[2])
+if len(sys.argv) > 3:
+  crc = int(sys.argv[3])
+if len(sys.argv) > 4:
+  sys.setswitchinterval(float(sys.argv[4])/1e3)
+
+print('{:d} common_acks, {:.6f} s apart, {:d}-bit CRC, {:.1f} ms switch '\
+ 'interval'.format(frames, period, crc, sys.getswitchinterval()*1e3)\
+)
+for busy in (False, True):
+  bench_responder(frames, period, CRC_BY_BITS[crc], busy)
@@ -0,0 +1,128 @@
+# Usage: python3 bench_retransmit.py [commands] [baud] [delay] [timeout]
+# Parameters:
+#  commands: APP_GET_TELEM commands sent (default 200)
+#  baud:     emulated link baud rate (default 115200)
+#  delay:    emulated board processing time per command in seconds
+#            (default 0.02)
+#  timeout:  seconds to wait for a reply before retransmitting (default 0.015)
+# Output:
+#  For each combination of ground duplicate filter and emulator reply cache,
+#  the tries, replies matched to the wrong command, duplicates dropped and
+#  times the board executed a command
+
+# import Python modules
+import os   # paths
+import sys  # accessing script arguments
+import time # perf_counter
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import bootloader_emulator # emulated EXPT board on a pty
+from taolst import device     # serial devices
+from taolst import replycache # duplicate filter and reply cache
+from taolst import transport  # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_COMMANDS = 200
+DEFAULT_DELAY    = 0.02
+DEFAULT_TIMEOUT  = 0.015
+
+## Command fields used by the EXPT test scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+## Tries per command
+TRIES = 4
+
+## Emulator reply cache capacity when enabled
+CACHE = replycache.DEFAULT_CAPACITY
+
+# helper functions
+
+## Sends commands APP_GET_TELEM commands to a fresh emulator, retransmitting
+## each on timeout, and prints the tries, mismatched replies, duplicates
+## dropped and board executions (the emulator counts them in its APP_TELEM
+## payload)
+def bench_link(commands, baud, delay, timeout, filtered, cache):
+  process, slave_fd, dev = bootloader_emulator.start(\
+   baud, delay, 0.0, CRC_NONE, cache\
+  )
+  serial_port = device.open_serial(dev, baud)
+  duplicates = replycache.DuplicateFilter() if filtered else None
+  rx_cmd_buff = RxCmdBuff()
+  tries = 0
+  mismatched = 0
+  failed = 0
+  executions = 0
+  t_start = time.perf_counter()
+  for msg_id in range(0,commands):
+    cmd = TxCmd(APP_GET_TELEM_OPCODE, HWID, msg_id, SRC, DST)
+    for i in range(0,TRIES):
+      rx_cmd_buff.clear()
+      tries += 1
+      if transport.transact(\
+       serial_port, cmd, rx_cmd_buff, None, timeout, duplicates\
+      ):
+        break
+    else:
+      failed += 1
+      continue
+    data = rx_cmd_buff.data
+    if (data[MSG_ID_MSB_INDEX]<<8)|data[MSG_ID_LSB_INDEX] != msg_id:
+      mismatched += 1
+    if data[OPCODE_INDEX] == APP_TELEM_OPCODE:
+      executions = max(executions,\
+       (data[DATA_START_INDEX+1]<<8)|data[DATA_START_INDEX]\
+      )
+  t_wall = time.perf_counter()-t_start
+  serial_port.close()
+  os.close(slave_fd)
+  process.join(1.0)
+  process.terminate()
+  print('{:>6s} {:>6s} {:6d} {:10d} {:6d} {:10d} {:10d} {:8.3f} s'.format(\
+   'on' if filtered else 'off', 'on' if cache else 'off', tries, mismatched,\
+   failed, duplicates.hits if filtered else 0, executions, t_wall\
+  ))
+
+################################################################################
+
+# initialize script arguments
+commands = DEFAULT_COMMANDS
+baud = bootloader_emulator.DEFAULT_BAUD
+delay = DEFAULT_DELAY
+timeout = DEFAULT_TIMEOUT
+
+# parse script arguments
+if len(sys.argv) > 5:
+  print(\
+   'Usage: '\
+   'python3 bench_retransmit.py '\
+   '[commands] [baud] [delay] [timeout]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  commands = int(sys.argv[1])
+if len(sys.argv) > 2:
+  baud = int(sys.argv[2])
+if len(sys.argv) > 3:
+  delay = float(sys.argv[3])
+if len(sys.argv) > 4:
+  timeout = float(sys.argv[4])
+
+print('{:d} commands, {:d} baud, {:.6f} s delay, {:.6f} s timeout'.format(\
+ commands, baud, delay, timeout\
+))
+print('{:>6s} {:>6s} {:>6s} {:>10s} {:>6s} {:>10s} {:>10s} {:>10s}'.format(\
+ 'filter', 'cache', 'tries', 'mismatched', 'failed', 'duplicates',\
+ 'executions', 'wall'\
+))
+for filtered in (False, True):
+  for cache in (0, CACHE):
+    bench_link(commands, baud, delay, timeout, filtered, cache)
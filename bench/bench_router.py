@@ -0,0 +1,170 @@
+# Usage: python3 bench_router.py [frames] [chunk] [trips] [baud] [delay]
+# Parameters:
+#  frames: commands in the stream split into frames (default 10000)
+#  chunk:  bytes per read when splitting the stream (default 4096)
+#  trips:  bootloader_ping round trips to the emulator (default 500)
+#  baud:   emulated link baud rate (default 115200)
+#  delay:  emulated board processing time per command in seconds (default 0)
+# Output:
+#  Frames found and MB/s of router.FrameScanner and RxCmdBuff on a noisy
+#  stream, then the round trip time to the emulator directly and through a
+#  router
+
+# import Python modules
+import multiprocessing # router process
+import os              # paths
+import random          # stream contents
+import sys             # accessing script arguments
+import time            # perf_counter
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import bootloader_emulator # emulated EXPT board on a pty
+from taolst import device     # serial devices
+from taolst import router     # frame router
+from taolst import transport  # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_FRAMES = 10000
+DEFAULT_CHUNK  = 4096
+DEFAULT_TRIPS  = 500
+
+## Command fields used by the EXPT test scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+# helper functions
+
+## Returns a stream of frames (write_page_ext, app_set_time and common_ack)
+## with random bytes before about half of them, and the frames
+def noisy_stream(frames):
+  rng = random.Random(frames)
+  stream = bytearray()
+  sent = []
+  for i in range(0,frames):
+    kind = rng.randrange(0,3)
+    if kind == 0:
+      cmd = TxCmd(BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, i&0xffff, SRC, DST)
+      cmd.bootloader_write_page_ext(\
+       page_number=rng.randrange(0,1024), page_data=rng.randbytes(128)\
+      )
+    elif kind == 1:
+      cmd = TxCmd(APP_SET_TIME_OPCODE, HWID, i&0xffff, SRC, DST)
+      cmd.app_set_time(sec=rng.randrange(0,1<<32), ns=rng.randrange(0,10**9))
+    else:
+      cmd = TxCmd(COMMON_ACK_OPCODE, HWID, i&0xffff, SRC, DST)
+    if rng.random() < 0.5:
+      stream += rng.randbytes(rng.randrange(1,17))
+    sent.append(cmd.to_bytes())
+    stream += sent[-1]
+  return bytes(stream), sent
+
+## Splits stream with a FrameScanner, chunk bytes at a time, and with
+## RxCmdBuff; prints the frames each finds and its throughput
+def bench_split(stream, sent, chunk):
+  scanner = router.FrameScanner()
+  found = []
+  t_scan = time.perf_counter()
+  for i in range(0,len(stream),chunk):
+    found += [bytes(frame) for frame in scanner.feed(stream[i:i+chunk])]
+  t_scan = time.perf_counter()-t_scan
+  rx_cmd_buff = RxCmdBuff()
+  parsed = []
+  t_parse = time.perf_counter()
+  for b in stream:
+    rx_cmd_buff.append_byte(b)
+    while rx_cmd_buff.state == RxCmdBuffState.COMPLETE:
+      parsed.append(cmd_bytes_to_frame(rx_cmd_buff.data))
+      rx_cmd_buff.clear()
+  t_parse = time.perf_counter()-t_parse
+  sent = set(sent)
+  for name, frames, t in (('FrameScanner', found, t_scan),\
+                          ('RxCmdBuff', parsed, t_parse)):
+    print('{:>12s}: {:d} frames, {:d} sent, {:8.2f} MB/s'.format(\
+     name, len(frames), len([f for f in frames if f in sent]),\
+     len(stream)/t/1e6\
+    ))
+
+## Returns the mean bootloader_ping round trip time in seconds over
+## serial_port, or None if a reply is missing
+def ping_time(serial_port, trips):
+  rx_cmd_buff = RxCmdBuff()
+  t_start = time.perf_counter()
+  for i in range(0,trips):
+    cmd = TxCmd(BOOTLOADER_PING_OPCODE, HWID, i&0xffff, SRC, DST)
+    rx_cmd_buff.clear()
+    if not transport.transact(serial_port, cmd, rx_cmd_buff, None, 1.0):
+      return None
+  return (time.perf_counter()-t_start)/trips
+
+## Times round trips to a fresh emulator directly, then through a router in
+## another process with the emulator as EXPT and a pty as TERM
+def bench_route(trips, baud, delay):
+  process, slave_fd, dev = bootloader_emulator.start(baud, delay)
+  serial_port = device.open_serial(dev, baud)
+  t_direct = ping_time(serial_port, trips)
+  serial_port.close()
+  frame_router = router.Router()
+  frame_router.add(router.SerialEndpoint('expt', dev, baud), [DEST_EXPT])
+  term = router.PtyEndpoint('term')
+  frame_router.add(term, [DEST_TERM])
+  router_process = multiprocessing.get_context('fork').Process(\
+   target=frame_router.run, daemon=True\
+  )
+  router_process.start()
+  serial_port = device.open_serial(term.path, baud)
+  t_routed = ping_time(serial_port, trips)
+  serial_port.close()
+  router_process.terminate()
+  router_process.join(1.0)
+  frame_router.close()
+  os.close(slave_fd)
+  process.join(1.0)
+  process.terminate()
+  for name, t in (('direct', t_direct), ('routed', t_routed)):
+    print('{:>12s}: {:s}'.format(\
+     name, 'FAILED' if t is None else '{:8.1f} us per round trip'.format(t*1e6)\
+    ))
+
+################################################################################
+
+# initialize script arguments
+frames = DEFAULT_FRAMES
+chunk = DEFAULT_CHUNK
+trips = DEFAULT_TRIPS
+baud = bootloader_emulator.DEFAULT_BAUD
+delay = bootloader_emulator.DEFAULT_DELAY
+
+# parse script arguments
+if len(sys.argv) > 6:
+  print(\
+   'Usage: '\
+   'python3 bench_router.py '\
+   '[frames] [chunk] [trips] [baud] [delay]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  frames = int(sys.argv[1])
+if len(sys.argv) > 2:
+  chunk = int(sys.argv[2])
+if len(sys.argv) > 3:
+  trips = int(sys.argv[3])
+if len(sys.argv) > 4:
+  baud = int(sys.argv[4])
+if len(sys.argv) > 5:
+  delay = float(sys.argv[5])
+
+stream, sent = noisy_stream(frames)
+print('{:d} frames, {:d} bytes, {:d}-byte reads'.format(\
+ frames, len(stream), chunk\
+))
+bench_split(stream, sent, chunk)
+print('{:d} round trips, {:d} baud, {:.6f} s delay'.format(trips, baud, delay))
+bench_route(trips, baud, delay)
@@ -0,0 +1,132 @@
+# Usage: python3 bench_upload.py [/path/to/program.hex] [baud] [delay]
+# Parameters:
+#  /path/to/program.hex: program to upload (default ../expt-chad/flight-401-usr.hex)
+#  baud:  emulated link baud rate (default 115200)
+#  delay: emulated board processing time per command in seconds (default 0)
+# Output:
+#  Wall time, frames/sec and ground process CPU time of each upload path
+
+# import Python modules
+import os       # paths
+import resource # ground process CPU time
+import sys      # accessing script arguments
+import time     # perf_counter
+
+# import benchmark support modules
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(BENCH_DIR,'..'))
+import bootloader_emulator # emulated EXPT bootloader on a pty
+from taolst import device    # serial devices
+from taolst import hexfile   # Intel HEX pages
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_HEX = os.path.join(BENCH_DIR,'..','expt-chad','flight-401-usr.hex')
+
+## Command fields used by the upload scripts
+HWID = 0x5441
+SRC  = 0x00
+DST  = 0x02
+
+## Flash address of page 0 for bootloader_write_page_addr32
+START_ADDR = 0x8008000
+
+## Upload paths and the largest page count each can address
+PATHS = (
+ ('write_page',        0xff),
+ ('write_page_ext',    0xffff),
+ ('write_page_addr32', 0xffffffff)
+)
+
+# helper functions
+
+## Returns the CPU seconds (user+system) used by this process so far
+def cpu_time():
+  usage = resource.getrusage(resource.RUSAGE_SELF)
+  return usage.ru_utime+usage.ru_stime
+
+## Uploads pages with the given path's command followed by a bootloader jump,
+## as the upload scripts do; returns the number of frames sent
+def upload(serial_port, path, pages):
+  rx_cmd_buff = RxCmdBuff()
+  msgid = 0x0000
+  for page_number, page_data in enumerate(pages):
+    if path == 'write_page':
+      cmd = TxCmd(BOOTLOADER_WRITE_PAGE_OPCODE, HWID, msgid, SRC, DST)
+      cmd.bootloader_write_page(page_number=page_number, page_data=page_data)
+    elif path == 'write_page_ext':
+      cmd = TxCmd(\
+       BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, msgid, SRC, DST\
+      )
+      cmd.bootloader_write_page_ext(\
+       page_number=page_number, page_data=page_data\
+      )
+    else:
+      cmd = TxCmd(\
+       BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE, HWID, msgid, SRC, DST\
+      )
+      cmd.bootloader_write_page_addr32(\
+       addr=START_ADDR+page_number*hexfile.BYTES_PER_PAGE, page_data=page_data\
+      )
+    transport.transact(serial_port, cmd, rx_cmd_buff)
+    str(cmd)
+    str(rx_cmd_buff)
+    rx_cmd_buff.clear()
+    msgid += 1
+  cmd = TxCmd(BOOTLOADER_JUMP_OPCODE, HWID, msgid, SRC, DST)
+  transport.transact(serial_port, cmd, rx_cmd_buff)
+  return len(pages)+1
+
+## Runs one upload path against a fresh emulator and prints its statistics
+def bench_path(path, pages, baud, delay):
+  process, slave_fd, dev = bootloader_emulator.start(baud, delay)
+  serial_port = device.open_serial(dev, baud)
+  t_wall = time.perf_counter()
+  t_cpu = cpu_time()
+  frames = upload(serial_port, path, pages)
+  t_cpu = cpu_time()-t_cpu
+  t_wall = time.perf_counter()-t_wall
+  serial_port.close()
+  os.close(slave_fd)
+  process.join(1.0)
+  process.terminate()
+  print('{:>18s}: {:9.3f} s wall, {:9.1f} frames/s, {:9.3f} s cpu'.format(\
+   path, t_wall, frames/t_wall, t_cpu\
+  ))
+
+################################################################################
+
+# initialize script arguments
+hex_path = DEFAULT_HEX
+baud = bootloader_emulator.DEFAULT_BAUD
+delay = bootloader_emulator.DEFAULT_DELAY
+
+# parse script arguments
+if len(sys.argv) > 4:
+  print(\
+   'Usage: '\
+   'python3 bench_upload.py '\
+   '[/path/to/program.hex] [baud] [delay]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  hex_path = sys.argv[1]
+if len(sys.argv) > 2:
+  baud = int(sys.argv[2])
+if len(sys.argv) > 3:
+  delay = float(sys.argv[3])
+
+pages = hexfile.read_pages(hex_path)
+print('{:s}: {:d} pages, {:d} baud, {:.6f} s delay'.format(\
+ os.path.basename(hex_path), len(pages), baud, delay\
+))
+for path, max_pages in PATHS:
+  if len(pages) > max_pages+1:
+    print('{:>18s}: skipped ({:d} pages do not fit)'.format(path, len(pages)))
+  else:
+    bench_path(path, pages, baud, delay)
@@ -0,0 +1,296 @@
+# Usage: python3 bootloader_emulator.py [baud] [delay] [drift_ppm] [crc]
+#                                      [cache]
+# Parameters:
+#  baud:      emulated link baud rate (default 115200)
+#  delay:     emulated board processing time per command in seconds (default 0)
+#  drift_ppm: emulated board clock drift in parts per million (default 0)
+#  crc:       CRC trailer width in bits: 0 (none, the default), 16 or 32
+#  cache:     replies cached for retransmitted commands (default 0, none)
+# Output:
+#  Prints the pty path to pass to the upload scripts, then serves until
+#  killed; with a cache, prints its hit and miss counters on Ctrl-C
+
+# import Python modules
+import multiprocessing # emulator process
+import os              # pty file descriptors
+import select          # waiting for commands or the next reply byte
+import sys             # accessing script arguments
+import time            # perf_counter
+import tty             # raw mode
+from collections import deque # reply bytes queued for sending
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import fragment   # COMMON_DATA fragment reassembly
+from taolst import lzss       # compressed program images
+from taolst import replycache # replies to retransmitted commands
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_BAUD      = 115200
+DEFAULT_DELAY     = 0.0
+DEFAULT_DRIFT_PPM = 0.0
+
+## Bits on the wire per byte with 8N1 framing
+BITS_PER_BYTE = 10
+
+## Bytes of program data per write page command
+BYTES_PER_PAGE = 128
+
+# classes
+
+## Emulated EXPT board serving the master side of a pty: bootloader commands,
+## APP_GET_TELEM with a counting payload, a board clock for APP_GET_TIME and
+## APP_SET_TIME, and acknowledged COMMON_DATA and COMMON_ASCII TLE uplinks.
+## A COMMON_DATA block holding an lzss image is written into flash; the last
+## fragment gets a common_nack if the image fails its CRC.
+## With a crc mode, commands must carry a CRC trailer, replies get one, and a
+## command failing its CRC is dropped unanswered.
+## With a cache capacity, a command identical to a recent one (a
+## retransmission) is answered with the cached reply and not executed again
+class BootloaderEmulator:
+  def __init__(self, fd, baud=DEFAULT_BAUD, delay=DEFAULT_DELAY,\
+               drift_ppm=DEFAULT_DRIFT_PPM, crc=CRC_NONE, cache=0):
+    self.fd = fd
+    self.byte_time = BITS_PER_BYTE/baud
+    self.delay = delay
+    self.flash = {}
+    self.reassembler = fragment.Reassembler()
+    self.telem_count = 0
+    self.clock_base = None # board J2000 ns at perf_counter 0 once set
+    self.clock_rate = 1.0+drift_ppm*1e-6 # board seconds per ground second
+    self.tle = None # last uplinked TLE
+    self.rx_cmd_buff = RxCmdBuff(crc)
+    self.reply_cache = replycache.ReplyCache(cache) if cache else None
+    self.t_rx = 0.0         # time the last received byte finished arriving
+    self.t_tx = 0.0         # time the last queued reply byte finishes sending
+    self.tx_queue = deque() # (due time, byte)
+
+  ## Stores page data at its flash offset and returns the bootloader_ack data
+  def write_page(self, data):
+    opcode = data[OPCODE_INDEX]
+    start = DATA_START_INDEX
+    if opcode == BOOTLOADER_WRITE_PAGE_OPCODE:
+      offset = data[start]*BYTES_PER_PAGE
+      page = data[start+1:start+1+BYTES_PER_PAGE]
+      reason = data[start]
+    elif opcode == BOOTLOADER_WRITE_PAGE_EXT_OPCODE:
+      offset = ((data[start]<<8)|data[start+1])*BYTES_PER_PAGE
+      page = data[start+2:start+2+BYTES_PER_PAGE]
+      reason = data[start+1]
+    else:
+      offset = (data[start]<<24)|(data[start+1]<<16)|\
+               (data[start+2]<<8)|data[start+3]
+      page = data[start+4:start+4+BYTES_PER_PAGE]
+      reason = 0x00
+    if data[MSG_LEN_INDEX]+0x03 > start+len(page):
+      self.flash[offset] = bytes(page)
+    return reason
+
+  ## Writes the program of a received lzss image into flash page by page and
+  ## starts a new block; returns False if the image fails its CRC. Blocks
+  ## that are not images are left alone
+  def load_image(self):
+    try:
+      image = lzss.unpack_image(self.reassembler.block())
+    except ValueError:
+      return False
+    if image is not None:
+      first_page, program = image
+      for i in range(0,len(program),BYTES_PER_PAGE):
+        self.flash[first_page*BYTES_PER_PAGE+i] = program[i:i+BYTES_PER_PAGE]
+      self.reassembler.clear()
+    return True
+
+  ## Returns the reply frame to a complete command
+  def reply(self, data):
+    opcode = data[OPCODE_INDEX]
+    reply = [0x00]*0x0a
+    reply[START_BYTE_0_INDEX] = START_BYTE_0
+    reply[START_BYTE_1_INDEX] = START_BYTE_1
+    for index in (HWID_LSB_INDEX, HWID_MSB_INDEX,\
+                  MSG_ID_LSB_INDEX, MSG_ID_MSB_INDEX):
+      reply[index] = data[index]
+    reply[DEST_ID_INDEX] = \
+     (0x0f & data[DEST_ID_INDEX]) << 4 | \
+     (0xf0 & data[DEST_ID_INDEX]) >> 4
+    reply[MSG_LEN_INDEX] = 0x07
+    reply[OPCODE_INDEX] = BOOTLOADER_ACK_OPCODE
+    if opcode == BOOTLOADER_PING_OPCODE:
+      reply[DATA_START_INDEX] = BOOTLOADER_ACK_REASON_PONG
+    elif opcode == BOOTLOADER_ERASE_OPCODE:
+      self.flash.clear()
+      reply[DATA_START_INDEX] = BOOTLOADER_ACK_REASON_ERASED
+    elif opcode == BOOTLOADER_JUMP_OPCODE:
+      reply[DATA_START_INDEX] = BOOTLOADER_ACK_REASON_JUMP
+    elif opcode in (BOOTLOADER_WRITE_PAGE_OPCODE,\
+                    BOOTLOADER_WRITE_PAGE_EXT_OPCODE,\
+                    BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE):
+      reply[DATA_START_INDEX] = self.write_page(data)
+    elif opcode == COMMON_ACK_OPCODE:
+      reply[MSG_LEN_INDEX] = 0x06
+      reply[OPCODE_INDEX] = COMMON_ACK_OPCODE
+    elif opcode == APP_GET_TELEM_OPCODE:
+      reply += [0x00]*(0x54+0x03-len(reply))
+      reply[MSG_LEN_INDEX] = 0x54
+      reply[OPCODE_INDEX] = APP_TELEM_OPCODE
+      self.telem_count += 1
+      for i in range(0,0x54-0x06,2):
+        reply[DATA_START_INDEX+i] = (self.telem_count+i)&0xff
+        reply[DATA_START_INDEX+i+1] = ((self.telem_count+i)>>8)&0xff
+    elif opcode == APP_GET_TIME_OPCODE:
+      if self.clock_base is None:
+        reply[MSG_LEN_INDEX] = 0x06
+        reply[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      else:
+        reply += [0x00]*(0x0e+0x03-len(reply))
+        reply[MSG_LEN_INDEX] = 0x0e
+        reply[OPCODE_INDEX] = APP_SET_TIME_OPCODE
+        t = self.clock_base+int((self.t_rx+self.delay)*1e9*self.clock_rate)
+        sec = t//1000000000
+        ns = t%1000000000
+        for i in range(0,4):
+          reply[DATA_START_INDEX+i] = (sec>>(8*i))&0xff
+          reply[DATA_START_INDEX+4+i] = (ns>>(8*i))&0xff
+    elif opcode == APP_SET_TIME_OPCODE:
+      sec = 0
+      ns = 0
+      for i in range(0,4):
+        sec |= data[DATA_START_INDEX+i]<<(8*i)
+        ns |= data[DATA_START_INDEX+4+i]<<(8*i)
+      self.clock_base = sec*1000000000+ns-int(self.t_rx*1e9*self.clock_rate)
+      reply[MSG_LEN_INDEX] = 0x06
+      reply[OPCODE_INDEX] = COMMON_ACK_OPCODE
+    elif opcode == COMMON_ASCII_OPCODE and \
+         bytes(data[DATA_START_INDEX:DATA_START_INDEX+3]) == b'TLE':
+      self.tle = bytes(\
+       data[DATA_START_INDEX:DATA_START_INDEX+data[MSG_LEN_INDEX]-0x06]\
+      ).decode('ascii')
+      reply[MSG_LEN_INDEX] = 0x06
+      reply[OPCODE_INDEX] = COMMON_ACK_OPCODE
+    elif opcode == COMMON_DATA_OPCODE:
+      complete = self.reassembler.add_payload(\
+       bytes(data[DATA_START_INDEX:DATA_START_INDEX+data[MSG_LEN_INDEX]-0x06])\
+      )
+      reply[MSG_LEN_INDEX] = 0x06
+      reply[OPCODE_INDEX] = COMMON_ACK_OPCODE
+      if complete and not self.load_image():
+        reply[OPCODE_INDEX] = COMMON_NACK_OPCODE
+    else:
+      reply[MSG_LEN_INDEX] = 0x06
+      reply[OPCODE_INDEX] = COMMON_NACK_OPCODE
+    return reply[0:reply[MSG_LEN_INDEX]+0x03]
+
+  ## Returns the reply frame to a complete command, from the reply cache if
+  ## the command is a retransmission
+  def reply_frame(self, data):
+    if self.reply_cache is not None:
+      frame = self.reply_cache.get(data)
+      if frame is not None:
+        return frame
+    frame = cmd_bytes_to_frame(self.reply(data), self.rx_cmd_buff.crc)
+    if self.reply_cache is not None:
+      self.reply_cache.put(data, frame)
+    return frame
+
+  ## Queues each reply byte for the time the link would have delivered it
+  def send(self, frame, t_ready):
+    for b in frame:
+      self.t_tx = max(self.t_tx, t_ready)+self.byte_time
+      self.tx_queue.append((self.t_tx, b))
+
+  ## Writes every queued reply byte that is due
+  def flush(self):
+    t_now = time.perf_counter()
+    due = bytearray()
+    while self.tx_queue and self.tx_queue[0][0] <= t_now:
+      due.append(self.tx_queue.popleft()[1])
+    if due:
+      os.write(self.fd, bytes(due))
+
+  ## Serves commands until the pty is closed; receiving and replying overlap
+  ## as on a full-duplex UART, so pipelined commands hide the delay
+  def serve(self):
+    while True:
+      timeout = None
+      if self.tx_queue:
+        timeout = max(0.0, self.tx_queue[0][0]-time.perf_counter())
+      readable = select.select([self.fd], [], [], timeout)[0]
+      if readable:
+        try:
+          rx_bytes = os.read(self.fd, 4096)
+        except OSError:
+          return
+        if not rx_bytes:
+          return
+        t_read = time.perf_counter()
+        for b in rx_bytes:
+          self.t_rx = max(self.t_rx, t_read)+self.byte_time
+          self.rx_cmd_buff.append_byte(b)
+          while self.rx_cmd_buff.state == RxCmdBuffState.COMPLETE:
+            frame = self.reply_frame(self.rx_cmd_buff.data)
+            self.rx_cmd_buff.clear()
+            self.send(frame, self.t_rx+self.delay)
+      self.flush()
+
+# helper functions
+
+## Runs a BootloaderEmulator on a new pty in a child process; returns the
+## process, the pty slave fd (close it to stop the emulator) and its path to
+## open as a serial port
+def start(baud=DEFAULT_BAUD, delay=DEFAULT_DELAY,\
+          drift_ppm=DEFAULT_DRIFT_PPM, crc=CRC_NONE, cache=0):
+  master_fd, slave_fd = os.openpty()
+  tty.setraw(slave_fd)
+  process = multiprocessing.get_context('fork').Process(\
+   target=_serve,\
+   args=(master_fd, slave_fd, baud, delay, drift_ppm, crc, cache),\
+   daemon=True\
+  )
+  process.start()
+  os.close(master_fd)
+  return process, slave_fd, os.ttyname(slave_fd)
+
+def _serve(master_fd, slave_fd, baud, delay, drift_ppm, crc, cache):
+  os.close(slave_fd)
+  BootloaderEmulator(master_fd, baud, delay, drift_ppm, crc, cache).serve()
+
+################################################################################
+
+if __name__ == '__main__':
+  baud = DEFAULT_BAUD
+  delay = DEFAULT_DELAY
+  drift_ppm = DEFAULT_DRIFT_PPM
+  crc = CRC_NONE
+  cache = 0
+  if len(sys.argv) > 6:
+    print(\
+     'Usage: '\
+     'python3 bootloader_emulator.py '\
+     '[baud] [delay] [drift_ppm] [crc] [cache]'\
+    )
+    exit()
+  if len(sys.argv) > 1:
+    baud = int(sys.argv[1])
+  if len(sys.argv) > 2:
+    delay = float(sys.argv[2])
+  if len(sys.argv) > 3:
+    drift_ppm = float(sys.argv[3])
+  if len(sys.argv) > 4:
+    crc = CRC_BY_BITS[int(sys.argv[4])]
+  if len(sys.argv) > 5:
+    cache = int(sys.argv[5])
+  master_fd, slave_fd = os.openpty()
+  tty.setraw(slave_fd)
+  print(os.ttyname(slave_fd))
+  sys.stdout.flush()
+  emulator = BootloaderEmulator(master_fd, baud, delay, drift_ppm, crc, cache)
+  try:
+    emulator.serve()
+  except KeyboardInterrupt:
+    if emulator.reply_cache is not None:
+      print('reply cache: '+str(emulator.reply_cache))
@@ -0,0 +1,36 @@
+# fake_serial.py
+# In-memory stand-in for serial.Serial that answers each written frame
+
+# import Python modules
+import collections # deque
+
+# "constants"
+
+## TAOLST Command Indices
+MSG_LEN_INDEX = 2
+
+# classes
+
+## Serial port whose replies are produced by reply_for_frame(frame_bytes)
+class FakeSerial:
+  def __init__(self, reply_for_frame):
+    self.reply_for_frame = reply_for_frame
+    self.tx = bytearray()
+    self.rx = collections.deque()
+    self.frames_written = 0
+
+  @property
+  def in_waiting(self):
+    return len(self.rx)
+
+  def write(self, data):
+    self.tx += data
+    if len(self.tx) > MSG_LEN_INDEX and \
+       len(self.tx) >= self.tx[MSG_LEN_INDEX]+0x03:
+      self.rx.extend(self.reply_for_frame(bytes(self.tx)))
+      self.tx.clear()
+      self.frames_written += 1
+    return len(data)
+
+  def read(self, size=1):
+    return bytes(self.rx.popleft() for _ in range(min(size, len(self.rx))))
@@ -0,0 +1,154 @@
+# Usage: python3 fuzz_rx_cmd_buff.py [frames] [seed] [flip_rate] [crc]
+# Parameters:
+#  frames:    number of commands in the fuzzed stream (default 10000)
+#  seed:      random seed (default 1)
+#  flip_rate: fraction of commands with one corrupted byte (default 0.01)
+#  crc:       CRC trailer width in bits: 0 (none, the default), 16 or 32
+# Output:
+#  How many commands RxCmdBuff recovers from a stream with noise between
+#  them, how many corrupted commands it accepts, its resync, discarded byte
+#  and CRC error counters, and parsing throughput
+
+# import Python modules
+import os     # path to the shared taolst package
+import random # noise
+import sys    # accessing script arguments
+import time   # perf_counter
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# "constants"
+
+## Defaults
+DEFAULT_FRAMES = 10000
+DEFAULT_SEED = 1
+DEFAULT_FLIP_RATE = 0.01
+
+## Command fields used throughout
+HWID = 0x5441
+SRC = 0x00
+DST = 0x02
+
+# helper functions
+
+## Returns a random valid command frame with message ID msg_id and the CRC
+## trailer of crc
+def random_frame(rng, msg_id, crc=CRC_NONE):
+  kind = rng.randrange(0,6)
+  if kind == 0:
+    cmd = TxCmd(BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, msg_id, SRC, DST)
+    cmd.bootloader_write_page_ext(\
+     page_number=rng.randrange(0,1024), page_data=rng.randbytes(128)\
+    )
+  elif kind == 1:
+    cmd = TxCmd(COMMON_DATA_OPCODE, HWID, msg_id, SRC, DST)
+    cmd.common_data_bytes(rng.randbytes(rng.randrange(0,DATA_MAX_LEN+1)))
+  elif kind == 2:
+    cmd = TxCmd(APP_SET_TIME_OPCODE, HWID, msg_id, SRC, DST)
+    cmd.app_set_time(sec=rng.randrange(0,1<<32), ns=rng.randrange(0,10**9))
+  elif kind == 3:
+    cmd = TxCmd(APP_TELEM_OPCODE, HWID, msg_id, SRC, DST)
+    cmd.app_telem(list(rng.randbytes(78)))
+  elif kind == 4:
+    cmd = TxCmd(COMMON_ASCII_OPCODE, HWID, msg_id, SRC, DST)
+    cmd.common_ascii(''.join(chr(rng.randrange(0x20,0x7f))\
+                             for i in range(0,rng.randrange(0,64))))
+  else:
+    cmd = TxCmd(COMMON_ACK_OPCODE, HWID, msg_id, SRC, DST)
+  return cmd.to_bytes(crc)
+
+## Returns noise that RxCmdBuff must reject without losing what follows:
+## random bytes, a lone start byte, a header with a bad length or opcode, or
+## the header of a command cut off before its opcode
+def random_noise(rng):
+  kind = rng.randrange(0,5)
+  if kind == 0:
+    return rng.randbytes(rng.randrange(1,17))
+  elif kind == 1:
+    return bytes([START_BYTE_0])
+  elif kind == 2:
+    return bytes([START_BYTE_0, START_BYTE_1, rng.randrange(0,0x06)])
+  elif kind == 3:
+    opcode = rng.choice([op for op in range(0,0x100)\
+                         if op not in MSG_LEN_BY_OPCODE])
+    return bytes([START_BYTE_0, START_BYTE_1, 0x06])+rng.randbytes(5)+\
+           bytes([opcode])
+  else:
+    return random_frame(rng, 0xffff)[0:rng.randrange(1,OPCODE_INDEX+1)]
+
+################################################################################
+
+# initialize script arguments
+frames = DEFAULT_FRAMES
+seed = DEFAULT_SEED
+flip_rate = DEFAULT_FLIP_RATE
+crc = 0
+
+# parse script arguments
+if len(sys.argv) > 5:
+  print(\
+   'Usage: '\
+   'python3 fuzz_rx_cmd_buff.py '\
+   '[frames] [seed] [flip_rate] [crc]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  frames = int(sys.argv[1])
+if len(sys.argv) > 2:
+  seed = int(sys.argv[2])
+if len(sys.argv) > 3:
+  flip_rate = float(sys.argv[3])
+if len(sys.argv) > 4:
+  crc = int(sys.argv[4])
+
+# Build the stream: noise before about half of the commands, and one byte
+# of a few commands corrupted
+rng = random.Random(seed)
+stream = bytearray()
+sent = {}
+flipped = set()
+for i in range(0,frames):
+  msg_id = i&0x7fff
+  frame = bytearray(random_frame(rng, msg_id, CRC_BY_BITS[crc]))
+  if rng.random() < 0.5:
+    stream += random_noise(rng)
+  if rng.random() < flip_rate:
+    frame[rng.randrange(0,len(frame))] ^= 1<<rng.randrange(0,8)
+    flipped.add(i)
+  else:
+    sent[msg_id] = bytes(frame)
+  stream += frame
+
+# Parse it; a complete command that matches no sent command is a corrupted
+# command accepted
+rx_cmd_buff = RxCmdBuff(CRC_BY_BITS[crc])
+recovered = 0
+accepted = 0
+t_parse = time.perf_counter()
+for b in stream:
+  rx_cmd_buff.append_byte(b)
+  while rx_cmd_buff.state == RxCmdBuffState.COMPLETE:
+    data = rx_cmd_buff.data
+    msg_id = (data[MSG_ID_MSB_INDEX]<<8)|data[MSG_ID_LSB_INDEX]
+    if cmd_bytes_to_frame(data, rx_cmd_buff.crc) == sent.get(msg_id):
+      recovered += 1
+    else:
+      accepted += 1
+    rx_cmd_buff.clear()
+t_parse = time.perf_counter()-t_parse
+
+print('{:d} commands, {:d} corrupted, {:d} bytes'.format(\
+ frames, len(flipped), len(stream)\
+))
+print('{:d} of {:d} intact commands recovered ({:.2f}%)'.format(\
+ recovered, len(sent), 100.0*recovered/max(1,len(sent))\
+))
+print('{:d} corrupted or spurious commands accepted'.format(accepted))
+print('{:d} resyncs, {:d} bytes discarded, {:d} CRC errors'.format(\
+ rx_cmd_buff.resyncs, rx_cmd_buff.discarded, rx_cmd_buff.crc_errors\
+))
+print('{:.2f} MB/s'.format(len(stream)/t_parse/1e6))
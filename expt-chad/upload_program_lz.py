@@ -0,0 +1,100 @@
+# Usage: python3 upload_program_lz.py /path/to/program.hex /path/to/dev
+#                                     [window_bits] [lookahead_bits]
+# Parameters:
+#  /path/to/program.hex: program to upload
+#  /path/to/dev:         serial device
+#  window_bits:          LZSS window size in bits (default 8); 0 sends the
+#                        program uncompressed
+#  lookahead_bits:       LZSS longest match in bits (default 4)
+# Output:
+#  Compression ratio and transfer statistics of the image, then the reply to
+#  the bootloader jump
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+import time # perf_counter and sleep
+
+# initialize script arguments
+usr_prog = ''       # program
+dev = ''            # serial device
+window_bits = 8     # LZSS window
+lookahead_bits = 4  # LZSS longest match
+
+# parse script arguments
+if 3<=len(sys.argv)<=5:
+  usr_prog = sys.argv[1]
+  dev = sys.argv[2]
+  if len(sys.argv) > 3:
+    window_bits = int(sys.argv[3])
+  if len(sys.argv) > 4:
+    lookahead_bits = int(sys.argv[4])
+else:
+  print(\
+   'Usage: '\
+   'python3 upload_program_lz.py '\
+   '/path/to/program.hex /path/to/dev [window_bits] [lookahead_bits]'\
+  )
+  exit()
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import device    # serial devices
+from taolst import fragment  # COMMON_DATA fragments and send window
+from taolst import hexfile   # Intel HEX pages
+from taolst import lzss      # compressed program images
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# Special values for testing the EXPT board
+
+HWID  = 0x5441
+msgid = 0x0000
+SRC   = 0x00
+DST   = 0x02
+
+# Create serial object
+
+try:
+  serial_port = device.open_serial(dev)
+except:
+  print('Serial port object creation failed:')
+  print('  '+dev)
+  exit()
+
+###############################################################################
+
+# Compress the program pages into one image, written from page 0 on
+program = b''.join(hexfile.read_pages(usr_prog))
+t_compress = time.perf_counter()
+image = lzss.pack_image(program, 0, window_bits, lookahead_bits)
+t_compress = time.perf_counter()-t_compress
+print('{:d} pages, {:d} bytes, image {:d} bytes (ratio {:.2f}), '\
+ 'compressed in {:.3f} s'.format(\
+  len(program)//hexfile.BYTES_PER_PAGE, len(program), len(image),\
+  len(program)/len(image), t_compress\
+ )\
+)
+
+# Send the image as COMMON_DATA fragments; the board writes it to flash once
+# complete and acknowledges the last fragment only if it passes its CRC
+cmds = fragment.fragment_cmds(image, HWID, msgid, SRC, DST)
+sender = fragment.WindowedSender(serial_port)
+ok = sender.send(cmds)
+print(('sent: ' if ok else 'FAILED: ')+str(sender))
+msgid += len(cmds)
+if not ok:
+  exit()
+
+# Bootloader jump
+rx_cmd_buff = RxCmdBuff()
+cmd = TxCmd(BOOTLOADER_JUMP_OPCODE, HWID, msgid, SRC, DST)
+transport.transact(serial_port, cmd, rx_cmd_buff)
+print('txcmd: '+str(cmd))
+print('reply: '+str(rx_cmd_buff)+'\n')
+cmd.clear()
+rx_cmd_buff.clear()
+msgid += 1
+time.sleep(1.0)
@@ -0,0 +1,144 @@
+# Usage: python3 poll_telem.py /path/to/dev /path/to/out.csv [hours] [window]
+#                              [expt_hz] [ctrl_hz] [/path/to/state]
+# Parameters:
+#  /path/to/dev:     path to device, e.g. /dev/ttyUSB0
+#  /path/to/out.csv: output file for window summaries
+#  hours:            how long to poll (default 24)
+#  window:           seconds of samples per summary window (default 60)
+#  expt_hz:          APP_GET_TELEM queries per second to EXPT (default 1, 0 off)
+#  ctrl_hz:          COMMON_ASCII telemetry queries per second to CTRL
+#                    (default 1, 0 off)
+#  /path/to/state:   directory of the persisted message IDs (default .)
+# Output:
+#  out.csv: one line per value per window with its min, max and mean; the
+#  file size depends on the run time and window, not on the polling rates;
+#  msgid-HWID.json in the state directory holds the next message IDs
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+
+# initialize script arguments
+dev = ''      # serial device
+out = ''      # output file
+hours = 24.0  # run time
+window = 60.0 # summary window length
+expt_hz = 1.0 # EXPT polling rate
+ctrl_hz = 1.0 # CTRL polling rate
+state = '.'   # message ID directory
+
+# parse script arguments
+if 3<=len(sys.argv)<=8:
+  dev = sys.argv[1]
+  out = sys.argv[2]
+  if len(sys.argv) > 3:
+    hours = float(sys.argv[3])
+  if len(sys.argv) > 4:
+    window = float(sys.argv[4])
+  if len(sys.argv) > 5:
+    expt_hz = float(sys.argv[5])
+  if len(sys.argv) > 6:
+    ctrl_hz = float(sys.argv[6])
+  if len(sys.argv) > 7:
+    state = sys.argv[7]
+else:
+  print(\
+   'Usage: '\
+   'python3 poll_telem.py '\
+   '/path/to/dev /path/to/out.csv [hours] [window] [expt_hz] [ctrl_hz] '\
+   '[/path/to/state]'\
+  )
+  exit()
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import device # serial devices
+from taolst import msgid  # persisted message IDs
+from taolst import poll   # telemetry poller
+from taolst import telem  # APP_TELEM schema
+from taolst import trace  # per-frame timing
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+################################################################################
+
+# Special values for the flatsat boards
+
+HWID = 0x5441
+SRC  = 0x00
+
+# Create serial object
+try:
+  serial_port = device.open_serial(dev)
+except:
+  print('Serial port object creation failed:')
+  print('  '+dev)
+  exit()
+
+################################################################################
+
+# Query builders and decoders
+
+schema = telem.Schema(telem.DEFAULT_FIELDS)
+
+def expt_cmd(msg_id):
+  return TxCmd(APP_GET_TELEM_OPCODE, HWID, msg_id, SRC, DEST_EXPT)
+
+## Decodes a full APP_TELEM reply; the board also replies APP_TELEM with no
+## payload, which has no sample
+def expt_decode(data):
+  if data[MSG_LEN_INDEX]-0x06 != telem.TELEM_LEN:
+    return None
+  return schema.decode(bytes(\
+   data[DATA_START_INDEX:DATA_START_INDEX+telem.TELEM_LEN]\
+  ))
+
+def ctrl_cmd(msg_id):
+  cmd = TxCmd(COMMON_ASCII_OPCODE, HWID, msg_id, SRC, DEST_CTRL)
+  cmd.common_ascii(poll.CTRL_QUERY_TELEM)
+  return cmd
+
+## Writes one line per value of a closed window
+def write_summary(target, summary):
+  for i in range(0,len(summary.means)):
+    outfile.write('{:.3f},{:s},{:s},{:d},{:.3f},{:g},{:g},{:g}\n'.format(\
+     summary.t_start, target.name, target.value_name(i), summary.count,\
+     summary.rtt_mean*1e3, summary.mins[i], summary.maxs[i], summary.means[i]\
+    ))
+  outfile.flush()
+
+# Set up the targets; message IDs continue from the last run, so replies to
+# an earlier session cannot match new commands
+allocator = msgid.MsgIdAllocator(HWID, msgid.state_path(state, HWID))
+targets = []
+if expt_hz > 0:
+  targets.append(poll.Target(\
+   'expt', serial_port, expt_cmd, expt_decode, APP_TELEM_OPCODE,\
+   1.0/expt_hz, window, names=schema.names, allocator=allocator,\
+   dst=DEST_EXPT\
+  ))
+if ctrl_hz > 0:
+  targets.append(poll.Target(\
+   'ctrl', serial_port, ctrl_cmd, poll.ascii_numbers, COMMON_ASCII_OPCODE,\
+   1.0/ctrl_hz, window, allocator=allocator, dst=DEST_CTRL\
+  ))
+
+# Poll until done or interrupted
+with open(out, 'w') as outfile:
+  outfile.write('t_start,target,value,samples,rtt_ms,min,max,mean\n')
+  poller = poll.Poller(\
+   targets, tracer=trace.from_env(), on_summary=write_summary\
+  )
+  try:
+    poller.run(hours*3600.0)
+  except KeyboardInterrupt:
+    for target in targets:
+      closed = target.rolling.close()
+      if closed is not None:
+        write_summary(target, closed)
+allocator.save(release=True)
+for target in targets:
+  print('{:s}: {:d} polls, {:d} missed, {:d} timeouts, {:d} stale, {:d} '\
+   'rejected'.format(\
+    target.name, target.polls, target.missed, target.timeouts, target.stale,\
+    target.rejected\
+  ))
@@ -0,0 +1,109 @@
+# Usage: python3 track_drift.py /path/to/dev [hours] [period] [threshold_us]
+#                               [/path/to/state]
+# Parameters:
+#  /path/to/dev:   path to device, e.g. /dev/ttyUSB0
+#  hours:          how long to track (default 24)
+#  period:         seconds between board time samples (default 60)
+#  threshold_us:   predicted error that triggers APP_SET_TIME (default 1000)
+#  /path/to/state: directory of the per-HWID drift models (default .)
+# Output:
+#  One line per sample with the board offset, fitted drift and predicted
+#  error; drift-HWID.json in the state directory holds the drift model and
+#  msgid-HWID.json the next message ID
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+import time # perf_counter, sleep
+
+# initialize script arguments
+dev = ''            # serial device
+hours = 24.0        # run time
+period = 60.0       # seconds between samples
+threshold_us = 1e3  # re-set threshold
+state = '.'         # drift model directory
+
+# parse script arguments
+if 2<=len(sys.argv)<=6:
+  dev = sys.argv[1]
+  if len(sys.argv) > 2:
+    hours = float(sys.argv[2])
+  if len(sys.argv) > 3:
+    period = float(sys.argv[3])
+  if len(sys.argv) > 4:
+    threshold_us = float(sys.argv[4])
+  if len(sys.argv) > 5:
+    state = sys.argv[5]
+else:
+  print(\
+   'Usage: '\
+   'python3 track_drift.py '\
+   '/path/to/dev [hours] [period] [threshold_us] [/path/to/state]'\
+  )
+  exit()
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import device   # serial devices
+from taolst import drift    # board clock drift tracking
+from taolst import msgid    # persisted message IDs
+from taolst import timesync # board clock synchronization
+from taolst.protocol import * # TAOLST constants
+
+################################################################################
+
+# Special values for the EXPT board
+
+HWID = 0x5441
+SRC  = 0x00
+
+# Create serial object
+try:
+  serial_port = device.open_serial(dev)
+except:
+  print('Serial port object creation failed:')
+  print('  '+dev)
+  exit()
+
+################################################################################
+
+allocator = msgid.MsgIdAllocator(HWID, msgid.state_path(state, HWID))
+sync = timesync.TimeSync(\
+ serial_port, HWID, SRC, DEST_EXPT, allocator=allocator\
+)
+tracker = drift.DriftTracker(\
+ sync, drift.model_path(state, HWID), threshold_ns=int(threshold_us*1e3)\
+)
+
+# Set the board time first if it is not set
+if sync.sample() is None:
+  offset_ns, latency_ns, residual_ns = sync.sync()
+  tracker.sets += 1
+  print('set time: residual offset {:s} us'.format(\
+   '?' if residual_ns is None else '{:.1f}'.format(residual_ns/1e3)\
+  ))
+
+# Sample on a fixed schedule, re-setting only when needed
+t_begin = time.perf_counter()
+steps = 0
+try:
+  while steps*period < hours*3600.0:
+    wait = t_begin+steps*period-time.perf_counter()
+    if wait > 0:
+      time.sleep(wait)
+    steps += 1
+    t_next_ns = sync.clock.now_ns()+int(period*1e9)
+    sample, predicted_ns, was_set = tracker.step(t_next_ns)
+    if sample is None:
+      print('no reply')
+      continue
+    ppm = '?' if tracker.drift is None else '{:.3f}'.format(tracker.drift*1e6)
+    print('offset: {:10.1f} us drift: {:>7s} ppm predicted: {:10.1f} us{:s}'.\
+     format(\
+      sample.offset_ns()/1e3, ppm, predicted_ns/1e3, ' SET' if was_set else ''\
+     )\
+    )
+except KeyboardInterrupt:
+  pass
+allocator.save(release=True)
+print('{:d} samples, {:d} sets'.format(steps, tracker.sets))
@@ -0,0 +1,77 @@
+# Usage: python3 route_frames.py nodes=endpoint [nodes=endpoint ...] [crc=bits]
+# Parameters:
+#  nodes:    comma-separated destinations the endpoint serves: comm, ctrl,
+#            expt, term or a destination ID number
+#  endpoint: serial device (/dev/ttyUSB0, or /dev/ttyUSB0@baud), pty (a new
+#            pty for a ground tool) or tcp:port (a TCP port on localhost)
+#  crc:      CRC trailer width in bits carried by every frame: 0 (none, the
+#            default), 16 or 32
+# Output:
+#  The pty path of each pty endpoint, then routes frames until interrupted
+#  and prints frame counters and forwarding latency per route
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+
+# initialize script arguments
+specs = [] # (destination names, endpoint)
+crc = 0    # CRC trailer width
+
+# parse script arguments
+for arg in sys.argv[1:]:
+  if '=' not in arg:
+    specs = []
+    break
+  key, value = arg.split('=', 1)
+  if key == 'crc':
+    crc = int(value)
+  else:
+    specs.append((key.split(','), value))
+if not specs:
+  print(\
+   'Usage: '\
+   'python3 route_frames.py '\
+   'nodes=endpoint [nodes=endpoint ...] [crc=bits]'\
+  )
+  exit()
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import router # frame router
+from taolst.protocol import * # TAOLST constants
+
+################################################################################
+
+# Open the endpoints
+frame_router = router.Router(CRC_BY_BITS[crc])
+for names, spec in specs:
+  name = '/'.join(names)
+  try:
+    if spec == 'pty':
+      endpoint = router.PtyEndpoint(name)
+      print('{:s}: {:s}'.format(name, endpoint.path))
+    elif spec.startswith('tcp:'):
+      endpoint = router.TcpEndpoint(name, int(spec[len('tcp:'):]))
+    elif '@' in spec:
+      dev, baudrate = spec.split('@', 1)
+      endpoint = router.SerialEndpoint(name, dev, int(baudrate))
+    else:
+      endpoint = router.SerialEndpoint(name, spec)
+    frame_router.add(endpoint, [router.node_id(n) for n in names])
+  except Exception as e:
+    print('Endpoint creation failed:')
+    print('  '+spec+': '+str(e))
+    frame_router.close()
+    exit()
+sys.stdout.flush()
+
+################################################################################
+
+# Route until interrupted
+try:
+  frame_router.run()
+except KeyboardInterrupt:
+  pass
+print(str(frame_router), end='')
+frame_router.close()
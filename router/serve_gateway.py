@@ -0,0 +1,109 @@
+# Usage: python3 serve_gateway.py /path/to/dev role=endpoint [role=endpoint ...]
+#                                 [baud=rate] [hwid=HWID] [crc=bits] [ack=node]
+# Parameters:
+#  /path/to/dev: serial device of the board, e.g. /dev/ttyUSB0
+#  role:         clients (send commands and get their replies) or subscribers
+#                (also get every frame that answers no command)
+#  endpoint:     tcp:port (a TCP port on localhost), unix:/path/to/socket or
+#                pty (a new pty for a ground tool)
+#  baud:         serial baud rate (default 115200)
+#  hwid:         HWID of the board (default 0x5441)
+#  crc:          CRC trailer width in bits carried by every frame: 0 (none,
+#                the default), 16 or 32
+#  ack:          answer common_acks addressed to node (e.g. term) that no
+#                client sent a command for (default off)
+# Output:
+#  The path of each pty, then serves until interrupted and prints frame
+#  counters, reply latency per client and the common_ack response times
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+
+# initialize script arguments
+dev = ''       # serial device
+specs = []     # (subscribe, endpoint)
+baud = 115200  # serial baud rate
+hwid = 0x5441  # board HWID
+crc = 0        # CRC trailer width
+ack = ''       # node answering common_acks
+
+# parse script arguments
+for arg in sys.argv[2:]:
+  key, sep, value = arg.partition('=')
+  if key in ('clients', 'subscribers') and value:
+    specs.append((key == 'subscribers', value))
+  elif key == 'baud' and value:
+    baud = int(value)
+  elif key == 'hwid' and value:
+    hwid = int(value, 0)
+  elif key == 'crc' and value:
+    crc = int(value)
+  elif key == 'ack' and value:
+    ack = value
+  else:
+    specs = []
+    break
+if len(sys.argv) > 1 and specs:
+  dev = sys.argv[1]
+else:
+  print(\
+   'Usage: '\
+   'python3 serve_gateway.py '\
+   '/path/to/dev role=endpoint [role=endpoint ...] '\
+   '[baud=rate] [hwid=HWID] [crc=bits] [ack=node]'\
+  )
+  exit()
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import gateway   # board gateway
+from taolst import responder # common_ack responder
+from taolst import router    # serial endpoint
+from taolst.protocol import * # TAOLST constants
+
+################################################################################
+
+# Open the board link
+try:
+  link = router.SerialEndpoint('link', dev, baud)
+except:
+  print('Serial port object creation failed:')
+  print('  '+dev)
+  exit()
+
+# Open the client endpoints
+ack_responder = None
+if ack:
+  ack_responder = responder.Responder(router.node_id(ack), CRC_BY_BITS[crc])
+board_gateway = gateway.Gateway(\
+ link, hwid, CRC_BY_BITS[crc], responder=ack_responder\
+)
+for i, (subscribe, spec) in enumerate(specs):
+  try:
+    if spec == 'pty':
+      client = gateway.PtyClient('pty-{:d}'.format(i), subscribe)
+      board_gateway.add(client)
+      print('pty-{:d}: {:s}'.format(i, client.path))
+    elif spec.startswith('tcp:'):
+      board_gateway.listen_tcp(int(spec[len('tcp:'):]), subscribe=subscribe)
+    elif spec.startswith('unix:'):
+      board_gateway.listen_unix(spec[len('unix:'):], subscribe)
+    else:
+      raise ValueError('unknown endpoint')
+  except Exception as e:
+    print('Endpoint creation failed:')
+    print('  '+spec+': '+str(e))
+    board_gateway.close()
+    exit()
+sys.stdout.flush()
+
+################################################################################
+
+# Serve until interrupted
+try:
+  board_gateway.run()
+except KeyboardInterrupt:
+  pass
+print(str(board_gateway), end='')
+board_gateway.close()
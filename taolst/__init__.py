@@ -0,0 +1,2 @@
+# taolst
+# Shared ground software for the TAOLST protocol
@@ -0,0 +1,101 @@
+# common_data.py
+# COMMON_DATA sample block codec and streaming ring buffer (requires NumPy)
+
+# import Python modules
+import numpy # frombuffer and tobytes over whole sample blocks
+
+# import shared TAOLST modules
+from taolst.protocol import * # TAOLST constants and TxCmd
+
+# "constants"
+
+## Sample layout, as in the imu_vals of expt-chad/test_expt_data.py
+CHANNELS      = 9
+UNSIGNED      = '<u2'
+SIGNED        = '<i2'
+SAMPLE_BYTES  = CHANNELS*2
+FRAME_SAMPLES = DATA_MAX_LEN//SAMPLE_BYTES
+
+# helper functions
+
+## Packs samples (a flat sequence or an array of shape (n,CHANNELS)) into
+## little-endian payload bytes
+def pack(samples, dtype=UNSIGNED):
+  return numpy.asarray(samples, dtype=dtype).reshape(-1,CHANNELS).tobytes()
+
+## Unpacks payload bytes into a read-only (n,CHANNELS) array viewing payload
+def unpack(payload, dtype=UNSIGNED):
+  return numpy.frombuffer(payload, dtype=dtype).reshape(-1,CHANNELS)
+
+## Returns the payload bytes of a COMMON_DATA command's data list
+def payload(data):
+  return bytes(data[DATA_START_INDEX:DATA_START_INDEX+data[MSG_LEN_INDEX]-0x06])
+
+## Fills a COMMON_DATA TxCmd with at most FRAME_SAMPLES samples; returns the
+## number of samples packed
+def encode(cmd, samples, dtype=UNSIGNED):
+  block = numpy.asarray(samples, dtype=dtype).reshape(-1,CHANNELS)
+  block = block[0:FRAME_SAMPLES]
+  cmd.common_data_bytes(block.tobytes())
+  return len(block)
+
+## Unpacks the samples of a received COMMON_DATA command
+def decode(data, dtype=UNSIGNED):
+  return unpack(payload(data), dtype)
+
+# classes
+
+## Preallocated ring of the most recent samples; payloads are copied in with
+## at most two slice assignments and never become per-sample Python objects.
+## Payload bytes that end mid-sample are held until the next append.
+class SampleRing:
+  def __init__(self, capacity, dtype=UNSIGNED):
+    self.capacity = capacity
+    self.dtype = numpy.dtype(dtype)
+    self.samples = numpy.zeros((capacity,CHANNELS), dtype=self.dtype)
+    self.head = 0  # index of the next sample written
+    self.count = 0 # samples appended since the last clear
+    self.partial = b''
+
+  def append_payload(self, payload):
+    if len(self.partial)>0:
+      payload = self.partial+bytes(payload)
+    whole = len(payload)-len(payload)%SAMPLE_BYTES
+    self.partial = bytes(payload[whole:])
+    block = numpy.frombuffer(payload, dtype=self.dtype, count=whole//2)
+    self.append_samples(block.reshape(-1,CHANNELS))
+
+  def append_samples(self, block):
+    n = len(block)
+    if n>=self.capacity:
+      self.samples[:] = block[n-self.capacity:]
+      self.head = 0
+    else:
+      first = min(n,self.capacity-self.head)
+      self.samples[self.head:self.head+first] = block[0:first]
+      self.samples[0:n-first] = block[first:n]
+      self.head = (self.head+n)%self.capacity
+    self.count += n
+
+  def append_cmd(self, rx_cmd_buff):
+    if rx_cmd_buff.state == RxCmdBuffState.COMPLETE and \
+       rx_cmd_buff.data[OPCODE_INDEX] == COMMON_DATA_OPCODE:
+      self.append_payload(payload(rx_cmd_buff.data))
+
+  def __len__(self):
+    return min(self.count,self.capacity)
+
+  ## Returns the held samples oldest first; a view when they do not wrap
+  def ordered(self):
+    if self.count<self.capacity:
+      return self.samples[0:self.count]
+    if self.head==0:
+      return self.samples
+    return numpy.concatenate(\
+     (self.samples[self.head:],self.samples[0:self.head])\
+    )
+
+  def clear(self):
+    self.head = 0
+    self.count = 0
+    self.partial = b''
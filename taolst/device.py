@@ -0,0 +1,35 @@
+# device.py
+# Opens the serial device attached to a board; pyserial is imported only when
+# a device is actually opened so offline tools never pay for it. A pyserial
+# URL such as socket://localhost:5000 (a gateway) opens a network link, and
+# raw:///dev/ttyUSB0 opens the tty with termios instead of pyserial
+
+# "constants"
+
+## Serial link settings
+BAUDRATE = 115200
+
+# helper functions
+
+## Returns a serial.Serial for the device path or URL, or a
+## rawserial.RawSerial for raw:// followed by a tty path; raises if it cannot
+## be opened. Scripts write commands a byte at a time, so socket:// links send
+## each byte at once instead of waiting for the last one to be acknowledged
+def open_serial(dev, baudrate=BAUDRATE):
+  if dev.startswith('raw://'):
+    from taolst import rawserial # termios serial link
+    return rawserial.RawSerial(dev[len('raw://'):], baudrate)
+  import serial # serial
+  if dev.startswith('socket://'):
+    import socket # TCP_NODELAY
+    serial_port = serial.serial_for_url(dev, baudrate=baudrate)
+    # pyserial has no option for this, so set it on the private socket of
+    # its socket:// handler; a pyserial without one works, only with Nagle
+    # delays (the gateway sets TCP_NODELAY on its side either way)
+    sock = getattr(serial_port, '_socket', None)
+    if sock is not None:
+      sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return serial_port
+  if '://' in dev:
+    return serial.serial_for_url(dev, baudrate=baudrate)
+  return serial.Serial(port=dev, baudrate=baudrate)
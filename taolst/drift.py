@@ -0,0 +1,122 @@
+# drift.py
+# Board clock drift tracking: least-squares offset and drift rate over a
+# sliding window of samples, re-setting the board only when needed
+
+# import Python modules
+import collections # deque
+import json        # persisted drift models
+import os          # model paths
+
+# "constants"
+
+## Defaults
+DEFAULT_WINDOW    = 32      # samples in the least-squares fit
+DEFAULT_THRESHOLD = 1000000 # predicted error (ns) that triggers a re-set
+
+## Persisted model file name for a HWID
+MODEL_FILE = 'drift-{:04x}.json'
+
+# helper functions
+
+## Returns (offset_ns at t_ref, drift in ns per ns) fitting samples of
+## (t_ns, offset_ns) by least squares; drift is None with fewer than 2 samples
+def fit(samples, t_ref):
+  n = len(samples)
+  if n == 0:
+    return None, None
+  mean_t = sum(s[0]-t_ref for s in samples)/n
+  mean_o = sum(s[1] for s in samples)/n
+  s_tt = sum((s[0]-t_ref-mean_t)**2 for s in samples)
+  if n < 2 or s_tt == 0:
+    return mean_o, None
+  s_to = sum((s[0]-t_ref-mean_t)*(s[1]-mean_o) for s in samples)
+  drift = s_to/s_tt
+  return mean_o-drift*mean_t, drift
+
+## Returns the persisted model path for a HWID in directory
+def model_path(directory, hw_id):
+  return os.path.join(directory, MODEL_FILE.format(hw_id))
+
+# classes
+
+## Tracks one board's clock: samples offsets with TimeSync, fits offset and
+## drift over the last window samples and re-sets the board time only when
+## the error predicted for the next sample exceeds threshold_ns. The fitted
+## drift rate and the error of past sets survive a re-set and are persisted
+## to path, so a new session predicts from its first sample. Samples are not
+## persisted: the board clock may have been reset in between.
+class DriftTracker:
+  def __init__(self, sync, path=None, window=DEFAULT_WINDOW,\
+               threshold_ns=DEFAULT_THRESHOLD):
+    self.sync = sync
+    self.path = path
+    self.threshold_ns = threshold_ns
+    self.samples = collections.deque(maxlen=window) # (t_ns, offset_ns)
+    self.drift = None     # ns per ns of the last defined fit
+    self.set_error_ns = 0 # offset the last sets left the board at
+    self.t_set = None     # ground time of a set not yet followed by a sample
+    self.sets = 0
+    self.load()
+
+  def load(self):
+    if self.path is not None and os.path.exists(self.path):
+      with open(self.path, 'r') as infile:
+        model = json.load(infile)
+      self.drift = model['drift']
+      self.set_error_ns = model['set_error_ns']
+
+  def save(self):
+    if self.path is not None:
+      with open(self.path, 'w') as outfile:
+        json.dump({\
+         'hw_id': self.sync.hw_id, 'drift': self.drift,\
+         'set_error_ns': self.set_error_ns\
+        }, outfile)
+
+  ## Returns the predicted board minus ground offset at ground time t_ns, or
+  ## None without samples
+  def predict(self, t_ns):
+    if len(self.samples) == 0:
+      return None
+    t_ref = self.samples[-1][0]
+    offset, drift = fit(self.samples, t_ref)
+    if drift is None:
+      drift = self.drift if self.drift is not None else 0.0
+    return offset+drift*(t_ns-t_ref)
+
+  ## Takes one sample; returns it, or None if the board did not answer
+  def sample(self):
+    sample = self.sync.measure()
+    if sample is None:
+      return None
+    self.samples.append(((sample.t0+sample.t3)//2, sample.offset_ns()))
+    drift = fit(self.samples, self.samples[-1][0])[1]
+    if drift is not None: # keep the last model while the fit is undefined
+      self.drift = drift
+    self.save()
+    return sample
+
+  ## Samples, then re-sets the board time if the error predicted at ground
+  ## time t_next_ns (e.g. the next scheduled step) exceeds the threshold;
+  ## returns (sample, predicted error in ns, whether the board was set)
+  def step(self, t_next_ns):
+    sample = self.sample()
+    if sample is None:
+      return None, None, False
+    if self.t_set is not None:
+      # the first offset after a set shows how far off the set itself was
+      self.set_error_ns += sample.offset_ns()-\
+       int((self.drift or 0.0)*((sample.t0+sample.t3)//2-self.t_set))
+      self.t_set = None
+      self.save()
+    predicted = self.predict(t_next_ns)
+    if abs(predicted) <= self.threshold_ns:
+      return sample, predicted, False
+    t_set = self.sync.clock.now_ns()
+    if not self.sync.set_time(sample.rtt_ns()//2-self.set_error_ns):
+      return sample, predicted, False
+    self.sets += 1
+    self.t_set = t_set
+    self.samples.clear()
+    self.save()
+    return sample, predicted, True
@@ -0,0 +1,231 @@
+# fec.py
+# Reed-Solomon forward error correction over GF(256) for streams of TAOLST
+# frames, vectorized over codewords (requires NumPy)
+
+# import Python modules
+import numpy # GF(256) lookup tables and codeword arrays
+
+# import shared TAOLST modules
+from taolst.protocol import * # TAOLST constants
+
+# "constants"
+
+## GF(256) with primitive polynomial x^8+x^4+x^3+x^2+1 and generator 2, as in
+## CCSDS and most radio Reed-Solomon codes
+PRIMITIVE_POLY = 0x11d
+
+## Longest codeword over GF(256)
+CODEWORD_MAX_LEN = 255
+
+## Defaults: RS(255,223) corrects up to 16 byte errors per codeword; with 4
+## codewords interleaved, a burst of up to 64 bytes is corrected
+DEFAULT_NSYM  = 32
+DEFAULT_DEPTH = 4
+
+# helper functions
+
+## Returns the GF(256) exponent table (doubled, so sums of two logarithms
+## need no modulo), logarithm table and full multiplication table
+def gf_tables():
+  exp = numpy.zeros(2*CODEWORD_MAX_LEN, dtype=numpy.uint8)
+  log = numpy.zeros(256, dtype=numpy.int32)
+  x = 1
+  for i in range(0,CODEWORD_MAX_LEN):
+    exp[i] = x
+    log[x] = i
+    x <<= 1
+    if x & 0x100:
+      x ^= PRIMITIVE_POLY
+  exp[CODEWORD_MAX_LEN:] = exp[0:CODEWORD_MAX_LEN]
+  mul = exp[log[:,None]+log[None,:]]
+  mul[0,:] = 0
+  mul[:,0] = 0
+  return exp, log, mul
+
+EXP, LOG, MUL = gf_tables()
+
+## Returns the inverse of a nonzero GF(256) element
+def gf_inv(a):
+  return int(EXP[CODEWORD_MAX_LEN-LOG[a]])
+
+## Returns the generator polynomial prod(x-2^i), i < nsym, highest degree
+## first
+def generator(nsym):
+  g = [1]
+  for i in range(0,nsym):
+    g = [int(c) for c in numpy.append(g, 0)^numpy.append(0, MUL[g, EXP[i]])]
+  return numpy.array(g, dtype=numpy.uint8)
+
+## Solves the square GF(256) linear system a x = b by Gaussian elimination;
+## returns x, or None if a is singular
+def gf_solve(a, b):
+  n = len(b)
+  rows = [list(a[i])+[b[i]] for i in range(0,n)]
+  for col in range(0,n):
+    pivot = next((r for r in range(col,n) if rows[r][col]), None)
+    if pivot is None:
+      return None
+    rows[col], rows[pivot] = rows[pivot], rows[col]
+    inv = gf_inv(rows[col][col])
+    rows[col] = [int(MUL[inv,v]) for v in rows[col]]
+    for r in range(0,n):
+      if r != col and rows[r][col]:
+        f = rows[r][col]
+        rows[r] = [v^int(MUL[f,w]) for v, w in zip(rows[r], rows[col])]
+  return [rows[i][n] for i in range(0,n)]
+
+# classes
+
+## Systematic Reed-Solomon code with nsym parity bytes per codeword of n
+## bytes (shortened when n < 255), correcting up to nsym//2 byte errors in
+## each. Codewords are rows of uint8 arrays; encoding and syndromes run over
+## all rows at once, and only rows with errors are decoded one at a time
+class ReedSolomon:
+  def __init__(self, nsym=DEFAULT_NSYM, n=CODEWORD_MAX_LEN):
+    if not 0 < nsym < n <= CODEWORD_MAX_LEN:
+      raise ValueError('need 0 < nsym < n <= 255')
+    self.nsym = nsym
+    self.n = n
+    self.k = n-nsym
+    self.gen = generator(nsym)
+    self.gen_mul = MUL[:,self.gen[1:]]          # feedback byte -> parity
+    self.syn_mul = MUL[:,EXP[0:nsym]]           # syndrome Horner step
+    self.columns = numpy.arange(nsym)
+
+  ## Returns the codewords of messages, an array of shape (rows,k)
+  def encode_blocks(self, msgs):
+    msgs = numpy.asarray(msgs, dtype=numpy.uint8)
+    parity = numpy.zeros((len(msgs),self.nsym), dtype=numpy.uint8)
+    for i in range(0,self.k):
+      feedback = msgs[:,i]^parity[:,0]
+      parity[:,0:-1] = parity[:,1:]
+      parity[:,-1] = 0
+      parity ^= self.gen_mul[feedback]
+    return numpy.concatenate((msgs, parity), axis=1)
+
+  ## Returns the syndromes of codewords, shape (rows,nsym); all zero for a
+  ## valid codeword
+  def syndromes(self, codewords):
+    synd = numpy.zeros((len(codewords),self.nsym), dtype=numpy.uint8)
+    for i in range(0,self.n):
+      synd = self.syn_mul[synd,self.columns]^codewords[:,i,None]
+    return synd
+
+  ## Corrects one codeword in place from its nonzero syndromes; returns the
+  ## number of corrected bytes, or -1 if there are too many errors
+  def correct(self, codeword, synd):
+    # Berlekamp-Massey: error locator c, lowest degree first
+    synd = [int(s) for s in synd]
+    c = [1]
+    b = [1]
+    errs = 0
+    shift = 1
+    last = 1
+    for i in range(0,self.nsym):
+      d = synd[i]
+      for j in range(1,errs+1):
+        d ^= int(MUL[c[j],synd[i-j]])
+      if d == 0:
+        shift += 1
+        continue
+      f = int(MUL[d,gf_inv(last)])
+      t = list(c)
+      c += [0]*(len(b)+shift-len(c))
+      for j in range(0,len(b)):
+        c[j+shift] ^= int(MUL[f,b[j]])
+      if 2*errs <= i:
+        errs = i+1-errs
+        b = t
+        last = d
+        shift = 1
+      else:
+        shift += 1
+    if 2*errs > self.nsym:
+      return -1
+    # Chien search over every position at once: byte p is the coefficient of
+    # x^(n-1-p), and is in error where c(2^-(n-1-p)) is 0
+    x_inv = EXP[(CODEWORD_MAX_LEN-(self.n-1-numpy.arange(self.n)))%\
+                CODEWORD_MAX_LEN]
+    y = numpy.zeros(self.n, dtype=numpy.uint8)
+    for coef in reversed(c[0:errs+1]):
+      y = MUL[y,x_inv]^coef
+    positions = numpy.flatnonzero(y == 0)
+    if len(positions) != errs:
+      return -1
+    # Error values from the first errs syndromes: S_j = sum Y X^j
+    x = [int(EXP[self.n-1-p]) for p in positions]
+    a = [[int(EXP[(LOG[xk]*j)%CODEWORD_MAX_LEN]) for xk in x]\
+         for j in range(0,errs)]
+    values = gf_solve(a, synd[0:errs])
+    if values is None:
+      return -1
+    codeword[positions] ^= numpy.array(values, dtype=numpy.uint8)
+    return errs
+
+  ## Decodes codewords, an array of shape (rows,n); returns the messages,
+  ## shape (rows,k), and per row the number of corrected bytes or -1 for a
+  ## row with too many errors, left as received
+  def decode_blocks(self, codewords):
+    codewords = numpy.array(codewords, dtype=numpy.uint8)
+    corrected = numpy.zeros(len(codewords), dtype=numpy.int32)
+    synd = self.syndromes(codewords)
+    for row in numpy.flatnonzero(synd.any(axis=1)):
+      fixed = codewords[row].copy()
+      count = self.correct(fixed, synd[row])
+      if count >= 0 and not self.syndromes(fixed[None,:]).any():
+        codewords[row] = fixed
+      else:
+        count = -1
+      corrected[row] = count
+    return codewords[:,0:self.k], corrected
+
+## Wraps a byte stream, such as serialized TxCmd frames, in Reed-Solomon
+## codewords interleaved depth deep, so that a burst of errors is spread over
+## depth codewords. The stream is zero-padded to whole groups of depth
+## codewords; RxCmdBuff discards the padding as noise between frames
+class FecCodec:
+  def __init__(self, nsym=DEFAULT_NSYM, depth=DEFAULT_DEPTH,\
+               n=CODEWORD_MAX_LEN):
+    self.rs = ReedSolomon(nsym, n)
+    self.depth = depth
+    self.blocks = 0
+    self.corrected = 0
+    self.failed = 0
+
+  ## Returns the number of wire bytes carrying length stream bytes
+  def encoded_len(self, length):
+    group = self.rs.k*self.depth
+    return -(-length//group)*self.rs.n*self.depth
+
+  ## Returns the wire bytes of a stream
+  def encode(self, stream):
+    stream = numpy.frombuffer(bytes(stream), dtype=numpy.uint8)
+    group = self.rs.k*self.depth
+    msgs = numpy.zeros(-(-len(stream)//group)*group, dtype=numpy.uint8)
+    msgs[0:len(stream)] = stream
+    codewords = self.rs.encode_blocks(msgs.reshape(-1,self.rs.k))
+    return codewords.reshape(-1,self.depth,self.rs.n).transpose(0,2,1).\
+           tobytes()
+
+  ## Returns the stream carried by wire bytes (a whole number of interleaved
+  ## groups, as from encode) after correcting what it can; counts decoded,
+  ## corrected and failed codewords
+  def decode(self, wire):
+    wire = numpy.frombuffer(bytes(wire), dtype=numpy.uint8)
+    codewords = wire.reshape(-1,self.rs.n,self.depth).transpose(0,2,1).\
+                reshape(-1,self.rs.n)
+    msgs, corrected = self.rs.decode_blocks(codewords)
+    self.blocks += len(corrected)
+    self.corrected += int(corrected[corrected > 0].sum())
+    self.failed += int((corrected < 0).sum())
+    return msgs.tobytes()
+
+  ## Returns the wire bytes of TxCmds, each serialized with the CRC trailer
+  ## of crc
+  def encode_cmds(self, cmds, crc=CRC_NONE):
+    return self.encode(b''.join(cmd.to_bytes(crc) for cmd in cmds))
+
+  def __str__(self):
+    return '{:d} codewords, {:d} bytes corrected, {:d} uncorrectable'.format(\
+     self.blocks, self.corrected, self.failed\
+    )
@@ -0,0 +1,213 @@
+# fragment.py
+# Splits data blocks larger than one frame into sequence-numbered COMMON_DATA
+# fragments, streams them with a send window and reassembles them on receive
+
+# import Python modules
+import time # perf_counter
+
+# import shared TAOLST modules
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+# "constants"
+
+## Fragment layout: a 6-byte header (sequence number, last sequence number
+## and block ID, all little-endian) followed by FRAG_DATA_LEN data bytes, or
+## up to FRAG_DATA_LEN in the last fragment
+FRAG_HEADER_LEN = 6
+FRAG_DATA_LEN   = DATA_MAX_LEN-FRAG_HEADER_LEN
+MAX_FRAGMENTS   = 0x10000
+MAX_BLOCK_LEN   = MAX_FRAGMENTS*FRAG_DATA_LEN
+
+## Fragments a Reassembler accepts in one block by default (about 1 MB), so
+## a payload that is not a fragment cannot make it allocate 16 MB
+DEFAULT_MAX_FRAGMENTS = 0x1000
+
+## Send window defaults
+DEFAULT_WINDOW  = 4
+DEFAULT_TIMEOUT = 1.0 # seconds before an unacknowledged fragment is resent
+DEFAULT_RETRIES = 3   # resends of one fragment before giving up
+
+# helper functions
+
+## Splits a data block into fragment payloads carrying block_id (16 bits)
+def split(block, block_id=0):
+  block = memoryview(bytes(block))
+  count = max(1,(len(block)+FRAG_DATA_LEN-1)//FRAG_DATA_LEN)
+  if count > MAX_FRAGMENTS:
+    raise ValueError('block of {:d} bytes exceeds {:d}'.format(\
+     len(block), MAX_BLOCK_LEN\
+    ))
+  last = count-1
+  payloads = []
+  for seq in range(0,count):
+    header = bytes([\
+     seq&0xff, (seq>>8)&0xff, last&0xff, (last>>8)&0xff,\
+     block_id&0xff, (block_id>>8)&0xff\
+    ])
+    payloads.append(\
+     header+block[seq*FRAG_DATA_LEN:(seq+1)*FRAG_DATA_LEN]\
+    )
+  return payloads
+
+## Returns one COMMON_DATA TxCmd per fragment of block, with consecutive
+## message IDs starting at msg_id, which is also the block ID
+def fragment_cmds(block, hw_id, msg_id, src, dst):
+  cmds = []
+  for i, payload in enumerate(split(block, msg_id&0xffff)):
+    cmd = TxCmd(COMMON_DATA_OPCODE, hw_id, (msg_id+i)&0xffff, src, dst)
+    cmd.common_data_bytes(payload)
+    cmds.append(cmd)
+  return cmds
+
+# classes
+
+## Collects fragments in any order into one contiguous buffer; a fragment with
+## a different block ID or last sequence number starts a new block, so a
+## block needs no clear() after the one before, and a fragment of the block
+## already delivered is a duplicate. A payload whose sequence number is past
+## its last, whose block would have more than max_fragments fragments, or
+## that is not the last and holds other than FRAG_DATA_LEN bytes (or is the
+## last and holds more) is not a fragment: it is counted in malformed and
+## leaves the block being collected alone
+class Reassembler:
+  def __init__(self, max_fragments=DEFAULT_MAX_FRAGMENTS):
+    self.max_fragments = max_fragments
+    self.malformed = 0
+    self.clear()
+
+  ## Adds one fragment payload; returns True if it completed its block
+  def add_payload(self, payload):
+    if len(payload) < FRAG_HEADER_LEN:
+      self.malformed += 1
+      return False
+    seq      = payload[0]|(payload[1]<<8)
+    last     = payload[2]|(payload[3]<<8)
+    block_id = payload[4]|(payload[5]<<8)
+    data_len = len(payload)-FRAG_HEADER_LEN
+    if seq > last or last >= self.max_fragments or \
+       data_len > FRAG_DATA_LEN or (seq < last and data_len < FRAG_DATA_LEN):
+      self.malformed += 1
+      return False
+    if block_id != self.block_id or last != self.last:
+      self.start(block_id, last)
+    if self.received[seq]:
+      return False
+    offset = seq*FRAG_DATA_LEN
+    self.buffer[offset:offset+data_len] = payload[FRAG_HEADER_LEN:]
+    self.received[seq] = 1
+    self.missing -= 1
+    if seq == last:
+      self.length = offset+data_len
+    return self.missing == 0
+
+  def add_cmd(self, rx_cmd_buff):
+    if rx_cmd_buff.state == RxCmdBuffState.COMPLETE and \
+       rx_cmd_buff.data[OPCODE_INDEX] == COMMON_DATA_OPCODE:
+      start = DATA_START_INDEX
+      end = start+rx_cmd_buff.data[MSG_LEN_INDEX]-0x06
+      return self.add_payload(bytes(rx_cmd_buff.data[start:end]))
+    return False
+
+  def start(self, block_id, last):
+    self.block_id = block_id
+    self.last = last
+    self.buffer = bytearray((last+1)*FRAG_DATA_LEN)
+    self.received = bytearray(last+1)
+    self.missing = last+1
+    self.length = 0
+
+  def complete(self):
+    return self.last >= 0 and self.missing == 0
+
+  ## Returns the reassembled block once complete, otherwise None
+  def block(self):
+    if self.complete():
+      return memoryview(self.buffer)[0:self.length]
+    return None
+
+  def clear(self):
+    self.block_id = -1
+    self.last = -1
+    self.buffer = bytearray()
+    self.received = bytearray()
+    self.missing = 0
+    self.length = 0
+
+## Streams fragment commands with up to window of them awaiting a reply;
+## a common_ack reply with a matching message ID frees a slot, a common_nack
+## or a timeout resends the fragment. With a crc mode, each frame carries a
+## CRC trailer, so a fragment corrupted on the way is dropped by the board
+## and resent on its own after the timeout
+class WindowedSender:
+  def __init__(self, serial_port, window=DEFAULT_WINDOW,\
+               timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,\
+               crc=CRC_NONE):
+    self.serial_port = serial_port
+    self.window = window
+    self.timeout = timeout
+    self.retries = retries
+    self.rx_cmd_buff = RxCmdBuff(crc)
+    self.frames_sent = 0
+    self.resent = 0
+    self.payload_bytes = 0
+    self.seconds = 0.0
+
+  ## Sends every command; returns True once all are acknowledged or False
+  ## when a fragment runs out of retries
+  def send(self, cmds):
+    frames = [cmd.to_bytes(self.rx_cmd_buff.crc) for cmd in cmds]
+    msg_ids = [\
+     (cmd.data[MSG_ID_MSB_INDEX]<<8)|cmd.data[MSG_ID_LSB_INDEX] for cmd in cmds\
+    ]
+    tries = [0]*len(frames)
+    pending = list(range(len(frames)-1,-1,-1)) # popped from the end
+    in_flight = {}                             # msg_id: [index, t_sent]
+    t_start = time.perf_counter()
+    while pending or in_flight:
+      while pending and len(in_flight) < self.window:
+        i = pending.pop()
+        if tries[i] > self.retries:
+          self.seconds += time.perf_counter()-t_start
+          return False
+        if tries[i] > 0:
+          self.resent += 1
+        self.serial_port.write(frames[i])
+        in_flight[msg_ids[i]] = [i, time.perf_counter()]
+        tries[i] += 1
+        self.frames_sent += 1
+      if self.serial_port.in_waiting > 0:
+        for b in self.serial_port.read(self.serial_port.in_waiting):
+          self.rx_cmd_buff.append_byte(b)
+          while self.rx_cmd_buff.state == RxCmdBuffState.COMPLETE:
+            data = self.rx_cmd_buff.data
+            msg_id = (data[MSG_ID_MSB_INDEX]<<8)|data[MSG_ID_LSB_INDEX]
+            if msg_id in in_flight:
+              if data[OPCODE_INDEX] == COMMON_ACK_OPCODE:
+                i = in_flight.pop(msg_id)[0]
+                self.payload_bytes += \
+                 cmds[i].data[MSG_LEN_INDEX]-0x06-FRAG_HEADER_LEN
+              elif data[OPCODE_INDEX] == COMMON_NACK_OPCODE:
+                pending.append(in_flight.pop(msg_id)[0])
+            self.rx_cmd_buff.clear()
+      else:
+        t_now = time.perf_counter()
+        for msg_id, entry in list(in_flight.items()):
+          if t_now-entry[1] > self.timeout:
+            del in_flight[msg_id]
+            pending.append(entry[0])
+    self.seconds += time.perf_counter()-t_start
+    return True
+
+  ## Returns the effective payload throughput in bytes per second
+  def throughput(self):
+    if self.seconds > 0.0:
+      return self.payload_bytes/self.seconds
+    return 0.0
+
+  def __str__(self):
+    return \
+     '{:d} payload bytes in {:d} frames ({:d} resent), {:.3f} s, '\
+     '{:.1f} B/s'.format(\
+      self.payload_bytes, self.frames_sent, self.resent, self.seconds,\
+      self.throughput()\
+     )
@@ -0,0 +1,261 @@
+# gateway.py
+# Shares one serial-attached board among many local clients: commands from
+# TCP, Unix socket and pty clients are multiplexed onto the link and replies
+# are routed back by message ID
+
+# import Python modules
+import os     # Unix socket paths
+import select # waiting for the link, clients and listeners
+import time   # perf_counter
+
+# import shared TAOLST modules
+from taolst import msgid      # link message IDs and the in-flight table
+from taolst import router     # frame splitting and endpoints
+from taolst import trace      # latency histograms
+from taolst.protocol import * # TAOLST constants
+
+# "constants"
+
+## Seconds a command waits for its reply before its message ID is freed; a
+## later reply is broadcast as unsolicited
+DEFAULT_TIMEOUT = 10.0
+
+## Seconds between checks for expired commands
+EXPIRE_PERIOD = 1.0
+
+# helper functions
+
+## Returns a copy of frame (bytes-like, with the CRC trailer of crc) with its
+## message ID replaced and its CRC trailer recomputed
+def patch_msg_id(frame, msg_id, crc=CRC_NONE):
+  patched = bytearray(frame)
+  patched[MSG_ID_LSB_INDEX] = (msg_id>>0)&0xff
+  patched[MSG_ID_MSB_INDEX] = (msg_id>>8)&0xff
+  if crc:
+    patched[-crc:] = crc_trailer(memoryview(patched)[0:-crc], crc)
+  return patched
+
+## Returns True if frame (bytes-like) ends in a valid CRC trailer of crc, or
+## if crc is CRC_NONE
+def crc_ok(frame, crc=CRC_NONE):
+  return not crc or crc_trailer(frame[0:-crc], crc) == frame[-crc:]
+
+# classes
+
+## A connected client socket
+class Client(router.Endpoint):
+  def __init__(self, name, connection, subscribe=False):
+    super().__init__(name, connection.fileno())
+    self.connection = connection
+    self.subscribe = subscribe # receives unsolicited frames
+    self.latency = trace.LatencyHistogram()
+
+  def read(self):
+    try:
+      return self.connection.recv(router.READ_SIZE)
+    except BlockingIOError:
+      return None
+    except OSError:
+      return b''
+
+  def send(self, data):
+    return self.connection.send(data)
+
+  def close(self):
+    self.queue.clear()
+    self.queued = 0
+    if self.connection is not None:
+      self.connection.close()
+      self.connection = None
+      self.fd = None
+
+## A pty client: a ground tool opens path as its serial device. The gateway
+## keeps the pty open, so a tool closing it leaves it for the next one; a
+## pty that fails is closed and removed like a socket client
+class PtyClient(router.PtyEndpoint):
+  def __init__(self, name, subscribe=False):
+    super().__init__(name)
+    self.subscribe = subscribe
+    self.latency = trace.LatencyHistogram()
+
+## Owns the link to one board (HWID) and serves clients on TCP ports, Unix
+## sockets and ptys. Each command from a client is sent with a message ID
+## from a msgid.MsgIdAllocator, so clients that use the same message IDs do
+## not collide; its reply is sent back to the client with the client's
+## message ID. Frames from the board that answer no command in flight are
+## broadcast to subscribing clients. Frames are split by router.FrameScanner
+## from whole reads, and only the two message ID bytes (and the CRC trailer)
+## of each frame are rewritten; frames failing their CRC are dropped. With a
+## responder.Responder, frames that answer no command and expect an automatic
+## reply (e.g. a common_ack from COMM) are answered by the gateway itself,
+## except late replies to expired commands, whose message IDs are suppressed
+class Gateway:
+  def __init__(self, link, hw_id, crc=CRC_NONE, timeout=DEFAULT_TIMEOUT,\
+               allocator=None, responder=None):
+    self.link = link
+    self.link.scanner = router.FrameScanner(crc)
+    self.crc = crc
+    self.timeout = timeout
+    if allocator is None:
+      allocator = msgid.MsgIdAllocator(hw_id)
+    self.allocator = allocator
+    self.responder = responder
+    self.listeners = {} # socket -> True if its clients subscribe
+    self.paths = []     # Unix socket paths to remove at close
+    self.clients = []
+    self.connections = 0
+    self.commands = 0
+    self.replies = 0
+    self.unsolicited = 0
+    self.broadcasts = 0
+    self.crc_errors = 0
+    self.t_expire = time.perf_counter()
+
+  ## Listens on a TCP port on host for clients
+  def listen_tcp(self, port, host='127.0.0.1', subscribe=False):
+    import socket # listening socket
+    listener = socket.create_server((host, port))
+    listener.setblocking(False)
+    self.listeners[listener] = subscribe
+
+  ## Listens on a Unix socket at path for clients, replacing a stale socket
+  def listen_unix(self, path, subscribe=False):
+    import socket # listening socket
+    if os.path.exists(path):
+      os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    listener.setblocking(False)
+    self.listeners[listener] = subscribe
+    self.paths.append(path)
+
+  ## Adds a client, e.g. a PtyClient
+  def add(self, client):
+    client.scanner = router.FrameScanner(self.crc)
+    self.clients.append(client)
+
+  def accept(self, listener):
+    import socket # socket options
+    try:
+      connection = listener.accept()[0]
+    except OSError:
+      return
+    connection.setblocking(False)
+    if connection.family != socket.AF_UNIX:
+      connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    self.connections += 1
+    self.add(Client(\
+     'client-{:d}'.format(self.connections), connection,\
+     self.listeners[listener]\
+    ))
+
+  ## Sends the frames a client wrote to the link with link message IDs
+  def from_client(self, client, chunk):
+    for frame in client.scanner.feed(chunk):
+      client.frames_in += 1
+      if not crc_ok(frame, self.crc):
+        self.crc_errors += 1
+        continue
+      link_msg_id = self.allocator.allocate(\
+       frame[DEST_ID_INDEX]&0x0f, (client, msgid.cmd_msg_id(frame))\
+      )
+      self.link.write(patch_msg_id(frame, link_msg_id, self.crc))
+      self.commands += 1
+
+  ## Sends the frames the link wrote to the clients whose commands they
+  ## answer, or else to the subscribers
+  def from_link(self, chunk):
+    t_read = time.perf_counter()
+    t_read_ns = time.perf_counter_ns()
+    for frame in self.link.scanner.feed(chunk):
+      self.link.frames_in += 1
+      if not crc_ok(frame, self.crc):
+        self.crc_errors += 1
+        continue
+      entry = self.allocator.match(frame)
+      if entry is not None:
+        (client, client_msg_id), t_sent = entry
+        client.write(patch_msg_id(frame, client_msg_id, self.crc))
+        client.latency.add(int((t_read-t_sent)*1e9))
+        self.replies += 1
+        continue
+      self.unsolicited += 1
+      if self.responder is not None:
+        self.responder.respond(frame, self.link.write, t_read_ns)
+      for client in self.clients:
+        if client.subscribe and client.fd is not None:
+          client.write(frame)
+          self.broadcasts += 1
+
+  ## Waits up to timeout seconds (None: until the next expiry check) for the
+  ## link, clients or listeners, forwards what they sent and drains the write
+  ## queues of the link and clients that can take more
+  def poll(self, timeout=None):
+    if timeout is None:
+      timeout = EXPIRE_PERIOD
+    clients = [c for c in self.clients if c.fd is not None]
+    writers = [e for e in [self.link]+clients if e.queue]
+    readable, writable = select.select(\
+     [self.link]+clients+list(self.listeners), writers, [], timeout\
+    )[0:2]
+    for w in writable:
+      w.drain()
+    if self.link.fd is None:
+      return
+    for r in readable:
+      if r in self.listeners:
+        self.accept(r)
+        continue
+      if r.fd is None:
+        continue
+      chunk = r.read()
+      if chunk is None:
+        continue
+      if r is self.link:
+        if chunk:
+          self.from_link(chunk)
+        else:
+          r.disconnect()
+          return
+      elif chunk:
+        self.from_client(r, chunk)
+      else:
+        r.disconnect()
+    self.clients = [c for c in self.clients if c.fd is not None]
+    t_now = time.perf_counter()
+    if t_now-self.t_expire >= EXPIRE_PERIOD:
+      for dst, msg_id, request in self.allocator.expire(self.timeout):
+        if self.responder is not None:
+          self.responder.suppress(self.allocator.hw_id, msg_id)
+      self.t_expire = t_now
+
+  ## Serves until interrupted or the link is closed
+  def run(self):
+    while self.link.fd is not None:
+      self.poll()
+
+  def close(self):
+    for client in self.clients:
+      client.close()
+    for listener in self.listeners:
+      listener.close()
+    for path in self.paths:
+      if os.path.exists(path):
+        os.unlink(path)
+    self.link.close()
+
+  def __str__(self):
+    s = '{:d} commands, {:d} replies, {:d} unsolicited ({:d} sent to '\
+        'subscribers), {:d} CRC errors, {:d} connections\n'.format(\
+         self.commands, self.replies, self.unsolicited, self.broadcasts,\
+         self.crc_errors, self.connections\
+        )
+    s += 'message IDs: '+str(self.allocator)+'\n'
+    if self.responder is not None:
+      s += 'responder: '+str(self.responder)+'\n'
+    for client in self.clients:
+      s += '{:s}: {:d} frames in, {:d} out, reply latency {:s}\n'.format(\
+       client.name, client.frames_in, client.frames_out, str(client.latency)\
+      )
+    return s
@@ -0,0 +1,42 @@
+# hexfile.py
+# Converts Intel HEX programs into pages for bootloader write page commands
+
+# "constants"
+
+## Bytes of program data carried by one bootloader write page command
+BYTES_PER_PAGE = 128
+
+## Value of unprogrammed flash, used to pad the last page
+PAGE_FILL = 0xff
+
+## Intel HEX record type for data records
+DATA_RECORD = '00'
+
+# helper functions
+
+## Returns the data bytes of every data record in the Intel HEX lines,
+## concatenated in file order (record addresses are not used)
+def hex_lines_to_bytes(lines):
+  total_data = []
+  for line in lines:
+    if line[7:9] == DATA_RECORD:
+      num_byte = int(line[1:3], 16)
+      total_data.append(line[9:(9+(num_byte*2))])
+  return bytes.fromhex(''.join(total_data))
+
+## Splits program bytes into BYTES_PER_PAGE-byte pages, padding the last page
+## with PAGE_FILL; an empty program yields one blank page
+def bytes_to_pages(program):
+  pages = []
+  for i in range(0, len(program), BYTES_PER_PAGE):
+    pages.append(program[i:i+BYTES_PER_PAGE])
+  if not pages:
+    pages.append(b'')
+  pages[-1] = pages[-1] + bytes([PAGE_FILL])*(BYTES_PER_PAGE-len(pages[-1]))
+  return pages
+
+## Reads an Intel HEX file and returns its pages as a list of bytes objects;
+## page i is written with page number i
+def read_pages(path):
+  with open(path, 'r') as f:
+    return bytes_to_pages(hex_lines_to_bytes(f.readlines()))
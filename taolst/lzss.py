@@ -0,0 +1,135 @@
+# lzss.py
+# Heatshrink-style LZSS compression of program images for compressed uploads
+
+# "constants"
+
+## Window and lookahead sizes in bits: a 256-byte window and matches of up to
+## 16 bytes, small enough for the board to decompress in place of a page
+## buffer
+DEFAULT_WINDOW_BITS    = 8
+DEFAULT_LOOKAHEAD_BITS = 4
+
+## Window bits of an image stored without compression
+STORED = 0
+
+## Shortest match worth a back-reference: a back-reference takes 1+window
+## bits+lookahead bits, a literal 9 bits
+MIN_MATCH = 2
+
+## Image header: MAGIC, window bits, lookahead bits, first page number (16
+## bits), program length and CRC-32 of the program (32 bits each), all
+## little-endian, followed by the (compressed) program
+MAGIC      = b'LZSS'
+HEADER_LEN = 16
+
+# helper functions
+
+## Returns data compressed as a bit stream, most significant bit first: a 1
+## bit and 8 bits for a literal byte, or a 0 bit, the distance back minus 1
+## (window_bits) and the length minus 1 (lookahead_bits) for a match. The
+## last byte is padded with 0 bits, too few to form a match
+def compress(data, window_bits=DEFAULT_WINDOW_BITS,\
+             lookahead_bits=DEFAULT_LOOKAHEAD_BITS):
+  data = bytes(data)
+  window = 1<<window_bits
+  max_len = 1<<lookahead_bits
+  out = bytearray()
+  acc = 0
+  nbits = 0
+  i = 0
+  while i < len(data):
+    lo = max(0,i-window)
+    best_len = 0
+    best_dist = 0
+    length = MIN_MATCH
+    while length <= max_len and i+length <= len(data):
+      j = data.rfind(data[i:i+length], lo, i+length-1)
+      if j < 0:
+        break
+      best_len = length
+      best_dist = i-j
+      length += 1
+    if best_len:
+      acc = (((acc<<(1+window_bits))|(best_dist-1))<<lookahead_bits)|\
+            (best_len-1)
+      nbits += 1+window_bits+lookahead_bits
+      i += best_len
+    else:
+      acc = (acc<<9)|0x100|data[i]
+      nbits += 9
+      i += 1
+    while nbits >= 8:
+      nbits -= 8
+      out.append((acc>>nbits)&0xff)
+    acc &= (1<<nbits)-1
+  if nbits:
+    out.append((acc<<(8-nbits))&0xff)
+  return bytes(out)
+
+## Returns the data of a compress() bit stream; stops at length bytes if
+## given, otherwise when too few bits are left for another literal or match
+def decompress(stream, window_bits=DEFAULT_WINDOW_BITS,\
+               lookahead_bits=DEFAULT_LOOKAHEAD_BITS, length=None):
+  out = bytearray()
+  total = 8*len(stream)
+  pos = 0
+  def bits(count):
+    nonlocal pos
+    value = 0
+    for k in range(pos,pos+count):
+      value = (value<<1)|((stream[k>>3]>>(7-(k&7)))&1)
+    pos += count
+    return value
+  while length is None or len(out) < length:
+    if pos >= total:
+      break
+    if bits(1):
+      if pos+8 > total:
+        break
+      out.append(bits(8))
+    else:
+      if pos+window_bits+lookahead_bits > total:
+        break
+      dist = bits(window_bits)+1
+      count = bits(lookahead_bits)+1
+      if dist > len(out):
+        raise ValueError('match before the start of the data')
+      for k in range(0,count):
+        out.append(out[-dist])
+  return bytes(out)
+
+## Returns the image of a program to be written from page first_page on:
+## header and program, compressed unless window_bits is STORED
+def pack_image(program, first_page=0, window_bits=DEFAULT_WINDOW_BITS,\
+               lookahead_bits=DEFAULT_LOOKAHEAD_BITS):
+  import zlib # crc32
+  program = bytes(program)
+  header = MAGIC+bytes([window_bits, lookahead_bits])+\
+           first_page.to_bytes(2,'little')+\
+           len(program).to_bytes(4,'little')+\
+           zlib.crc32(program).to_bytes(4,'little')
+  if window_bits == STORED:
+    return header+program
+  return header+compress(program, window_bits, lookahead_bits)
+
+## Returns (first page, program) from an image, or None if block is not an
+## image; raises ValueError if the program fails its length or CRC
+def unpack_image(block):
+  import zlib # crc32
+  block = bytes(block)
+  if len(block) < HEADER_LEN or block[0:len(MAGIC)] != MAGIC:
+    return None
+  window_bits = block[4]
+  lookahead_bits = block[5]
+  first_page = int.from_bytes(block[6:8],'little')
+  length = int.from_bytes(block[8:12],'little')
+  crc = int.from_bytes(block[12:16],'little')
+  if window_bits == STORED:
+    program = block[HEADER_LEN:HEADER_LEN+length]
+  else:
+    program = decompress(\
+     block[HEADER_LEN:], window_bits, lookahead_bits, length\
+    )
+  if len(program) != length or zlib.crc32(program) != crc:
+    raise ValueError('image program fails its length or CRC')
+  return first_page, program
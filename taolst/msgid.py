@@ -0,0 +1,147 @@
+# msgid.py
+# Message ID allocation per destination, persisted across runs, and the
+# table of commands awaiting a reply
+
+# import Python modules
+import json # persisted next message IDs
+import os   # state paths
+import time # perf_counter
+
+# import shared TAOLST modules
+from taolst.protocol import * # TAOLST constants
+
+# "constants"
+
+## Message IDs are 16 bits and wrap around
+MSG_ID_MASK = 0xffff
+
+## Message IDs leased per write of the state file: the persisted next ID runs
+## up to LEASE ahead of the last one handed out, so the file is written once
+## per LEASE allocations and a run that ends without save() still never
+## lets the next run reuse its IDs
+LEASE = 256
+
+## Persisted next message IDs file name for a HWID
+STATE_FILE = 'msgid-{:04x}.json'
+
+# helper functions
+
+## Returns the persisted next message IDs path for a HWID in directory
+def state_path(directory, hw_id):
+  return os.path.join(directory, STATE_FILE.format(hw_id))
+
+## Returns the message ID in a list of command bytes
+def cmd_msg_id(data):
+  return (data[MSG_ID_MSB_INDEX]<<8)|data[MSG_ID_LSB_INDEX]
+
+# classes
+
+## Hands out message IDs for commands to one board (HWID), one 16-bit
+## sequence per destination ID, wrapping around and skipping IDs still in
+## flight. The next ID of each destination is persisted to path. Commands
+## allocated with a request are kept in the in-flight table, keyed by
+## (destination, message ID), until their reply is matched or they expire;
+## allocating, matching and releasing are O(1)
+class MsgIdAllocator:
+  def __init__(self, hw_id, path=None, lease=LEASE):
+    self.hw_id = hw_id
+    self.path = path
+    self.lease = lease
+    self.next = {}      # destination -> next message ID
+    self.leased = {}    # destination -> IDs left past next before a save
+    self.in_flight = {} # (destination, message ID) -> (request, t_sent)
+    self.allocated = 0
+    self.matched = 0
+    self.unmatched = 0  # replies matching no command in flight
+    self.expired = 0
+    self.load()
+
+  def load(self):
+    if self.path is not None and os.path.exists(self.path):
+      with open(self.path, 'r') as infile:
+        model = json.load(infile)
+      self.next = {int(dst): msg_id for dst, msg_id in model['next'].items()}
+
+  ## Persists the next IDs plus what is left of each lease, or exactly the
+  ## next IDs if release is True (e.g. at the end of a run)
+  def save(self, release=False):
+    if self.path is None:
+      return
+    persisted = {}
+    for dst, msg_id in self.next.items():
+      if not release:
+        msg_id = (msg_id+self.leased.get(dst, 0))&MSG_ID_MASK
+      persisted[dst] = msg_id
+    with open(self.path, 'w') as outfile:
+      json.dump({'hw_id': self.hw_id, 'next': persisted}, outfile)
+    if release:
+      self.leased.clear()
+
+  ## Returns the next message ID for dst, recording request and the send
+  ## time as in flight unless request is None; raises RuntimeError if every
+  ## message ID to dst is in flight
+  def allocate(self, dst, request=None):
+    start = self.next.get(dst, 0)
+    msg_id = start
+    while (dst, msg_id) in self.in_flight:
+      msg_id = (msg_id+1)&MSG_ID_MASK
+      if msg_id == start:
+        raise RuntimeError(\
+         'every message ID to destination {:d} is in flight'.format(dst)\
+        )
+    self.next[dst] = (msg_id+1)&MSG_ID_MASK
+    left = self.leased.get(dst, 0)-((msg_id-start)&MSG_ID_MASK)-1
+    if left < 0:
+      self.leased[dst] = self.lease
+      self.save()
+    else:
+      self.leased[dst] = left
+    self.allocated += 1
+    if request is not None:
+      self.in_flight[(dst, msg_id)] = (request, time.perf_counter())
+    return msg_id
+
+  ## Removes and returns the (request, t_sent) of a command in flight, or
+  ## None
+  def release(self, dst, msg_id):
+    return self.in_flight.pop((dst, msg_id), None)
+
+  ## Returns the (request, t_sent) that a reply (a list of command bytes)
+  ## answers, removing it from the table; None for a reply from another
+  ## board or to no command in flight, such as a duplicate
+  def match(self, data):
+    entry = None
+    if (data[HWID_MSB_INDEX]<<8)|data[HWID_LSB_INDEX] == self.hw_id:
+      entry = self.in_flight.pop(\
+       ((data[DEST_ID_INDEX]>>4)&0x0f, cmd_msg_id(data)), None\
+      )
+    if entry is None:
+      self.unmatched += 1
+    else:
+      self.matched += 1
+    return entry
+
+  ## Removes the commands in flight for more than timeout seconds and
+  ## returns them as (destination, message ID, request); the table is in
+  ## send order, so only expired entries are visited
+  def expire(self, timeout):
+    t_cutoff = time.perf_counter()-timeout
+    expired = []
+    for key, entry in self.in_flight.items():
+      if entry[1] > t_cutoff:
+        break
+      expired.append((key[0], key[1], entry[0]))
+    for dst, msg_id, request in expired:
+      del self.in_flight[(dst, msg_id)]
+    self.expired += len(expired)
+    return expired
+
+  def __len__(self):
+    return len(self.in_flight)
+
+  def __str__(self):
+    return '{:d} allocated, {:d} in flight, {:d} matched, {:d} unmatched, '\
+           '{:d} expired'.format(\
+            self.allocated, len(self.in_flight), self.matched,\
+            self.unmatched, self.expired\
+           )
@@ -0,0 +1,211 @@
+# poll.py
+# Long-running telemetry poller: queries each board at its own rate on a
+# drift-free schedule and downsamples replies into rolling min/max/mean windows
+
+# import Python modules
+import collections # deque
+import heapq       # earliest next poll
+import time        # perf_counter, sleep, time
+
+# import shared TAOLST modules
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+# "constants"
+
+## Defaults
+DEFAULT_WINDOW  = 60.0 # seconds of samples summarized per window
+DEFAULT_HISTORY = 1440 # window summaries kept in memory per target
+DEFAULT_TIMEOUT = 1.0  # seconds to wait for each reply
+
+## CTRL COMMON_ASCII queries used by test-ctrl/test_ctrl.py
+CTRL_QUERY_TELEM = chr(0xC8)
+CTRL_QUERY_DATA  = chr(0xC5)
+
+# helper functions
+
+## Returns the numbers in a COMMON_ASCII reply, separated by spaces or commas
+def ascii_numbers(data):
+  text = bytes(\
+   data[DATA_START_INDEX:DATA_START_INDEX+data[MSG_LEN_INDEX]-0x06]\
+  ).decode('latin-1')
+  values = []
+  for token in text.replace(',',' ').split():
+    try:
+      values.append(float(token))
+    except ValueError:
+      pass
+  return values
+
+# classes
+
+## Summary of one window of samples; mins, maxs and means hold one entry per
+## value of a sample
+class WindowSummary:
+  def __init__(self, t_start, count, mins, maxs, means, rtt_mean):
+    self.t_start = t_start
+    self.count = count
+    self.mins = mins
+    self.maxs = maxs
+    self.means = means
+    self.rtt_mean = rtt_mean
+
+## Accumulates samples into consecutive windows of fixed length aligned to
+## multiples of window seconds; only the last history summaries are kept, so
+## memory does not grow with the polling rate or run time
+class Rolling:
+  def __init__(self, window=DEFAULT_WINDOW, history=DEFAULT_HISTORY):
+    self.window = window
+    self.summaries = collections.deque(maxlen=history)
+    self.t_start = None
+    self.reset(0)
+
+  def reset(self, width):
+    self.count = 0
+    self.rtt_sum = 0.0
+    self.sums = [0.0]*width
+    self.mins = [float('inf')]*width
+    self.maxs = [float('-inf')]*width
+
+  ## Adds the values of one sample taken at time t (seconds); returns the
+  ## summary of the window this sample closed, if any
+  def add(self, t, values, rtt=0.0):
+    closed = None
+    if self.t_start is None:
+      self.t_start = t-t%self.window
+    if t >= self.t_start+self.window:
+      closed = self.close()
+      self.t_start = t-t%self.window
+    if len(values) != len(self.sums):
+      if self.count > 0:
+        closed = self.close()
+      self.reset(len(values))
+    self.count += 1
+    self.rtt_sum += rtt
+    for i, value in enumerate(values):
+      self.sums[i] += value
+      if value < self.mins[i]:
+        self.mins[i] = value
+      if value > self.maxs[i]:
+        self.maxs[i] = value
+    return closed
+
+  ## Summarizes the current window, if it has samples, and starts a new one
+  def close(self):
+    summary = None
+    if self.count > 0:
+      summary = WindowSummary(\
+       self.t_start, self.count, self.mins, self.maxs,\
+       [value/self.count for value in self.sums], self.rtt_sum/self.count\
+      )
+      self.summaries.append(summary)
+    self.reset(len(self.sums))
+    return summary
+
+## One periodic query: make_cmd(msg_id) returns the TxCmd to send and
+## decode(data) returns the sample values of a complete reply with opcode
+## reply_opcode, or None if the reply is malformed (e.g. too short); other
+## replies, e.g. COMMON_NACK, and malformed ones are counted, not sampled;
+## names label the values (value_0, value_1... if None). Message IDs count up
+## from 0, or come from allocator (a msgid.MsgIdAllocator) for destination
+## dst if given
+class Target:
+  def __init__(self, name, serial_port, make_cmd, decode, reply_opcode,\
+               period, window=DEFAULT_WINDOW, history=DEFAULT_HISTORY,\
+               names=None, allocator=None, dst=DEST_EXPT):
+    self.name = name
+    self.names = names
+    self.serial_port = serial_port
+    self.make_cmd = make_cmd
+    self.decode = decode
+    self.reply_opcode = reply_opcode
+    self.period = period
+    self.rolling = Rolling(window, history)
+    self.rx_cmd_buff = RxCmdBuff()
+    self.msg_id = 0x0000
+    self.allocator = allocator
+    self.dst = dst
+    self.polls = 0
+    self.missed = 0   # scheduled polls skipped because the previous overran
+    self.timeouts = 0
+    self.stale = 0    # replies whose message ID did not match the query
+    self.rejected = 0 # replies with another opcode or that decode rejected
+
+  def value_name(self, i):
+    if self.names is not None and i < len(self.names):
+      return self.names[i]
+    return 'value_{:d}'.format(i)
+
+  def next_msg_id(self):
+    if self.allocator is not None:
+      return self.allocator.allocate(self.dst)
+    msg_id = self.msg_id
+    self.msg_id = (self.msg_id+1)&0xffff
+    return msg_id
+
+## Polls every target at its own period. Poll times are absolute multiples
+## of the period from the start, so round-trip time does not accumulate into
+## drift; a poll that overruns skips the slots it covered instead of
+## bursting. Each sample is stamped at the midpoint of its round trip.
+class Poller:
+  def __init__(self, targets, timeout=DEFAULT_TIMEOUT, tracer=None,\
+               on_summary=None):
+    self.targets = targets
+    self.timeout = timeout
+    self.tracer = tracer
+    self.on_summary = on_summary # called with (target, summary)
+
+  def poll(self, target):
+    cmd = target.make_cmd(target.next_msg_id())
+    while target.serial_port.in_waiting > 0: # drop replies that came too late
+      target.serial_port.read(target.serial_port.in_waiting)
+    target.rx_cmd_buff.clear()
+    t_sent = time.perf_counter()
+    ok = transport.transact(\
+     target.serial_port, cmd, target.rx_cmd_buff, self.tracer, self.timeout\
+    )
+    rtt = time.perf_counter()-t_sent
+    target.polls += 1
+    data = target.rx_cmd_buff.data
+    if not ok:
+      target.timeouts += 1
+    elif data[MSG_ID_LSB_INDEX] != cmd.data[MSG_ID_LSB_INDEX] or \
+         data[MSG_ID_MSB_INDEX] != cmd.data[MSG_ID_MSB_INDEX]:
+      target.stale += 1
+    elif data[OPCODE_INDEX] != target.reply_opcode:
+      target.rejected += 1
+    else:
+      values = target.decode(data)
+      if values is None:
+        target.rejected += 1
+        return
+      closed = target.rolling.add(time.time()-rtt/2, values, rtt)
+      if closed is not None and self.on_summary is not None:
+        self.on_summary(target, closed)
+
+  ## Polls until duration seconds have passed (forever if None), then closes
+  ## the open windows
+  def run(self, duration=None):
+    t_begin = time.perf_counter()
+    queue = [(t_begin, i) for i in range(0,len(self.targets))]
+    heapq.heapify(queue)
+    while queue:
+      t_due, i = heapq.heappop(queue)
+      if duration is not None and t_due-t_begin >= duration:
+        break
+      wait = t_due-time.perf_counter()
+      if wait > 0:
+        time.sleep(wait)
+      target = self.targets[i]
+      self.poll(target)
+      t_next = t_due+target.period
+      t_now = time.perf_counter()
+      if t_next < t_now:
+        skipped = int((t_now-t_next)/target.period)+1
+        target.missed += skipped
+        t_next += skipped*target.period
+      heapq.heappush(queue, (t_next, i))
+    for target in self.targets:
+      closed = target.rolling.close()
+      if closed is not None and self.on_summary is not None:
+        self.on_summary(target, closed)
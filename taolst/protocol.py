@@ -0,0 +1,595 @@
+# protocol.py
+# TAOLST protocol constants, command formatting, TxCmd and RxCmdBuff
+
+# "constants"
+
+## TAOLST General Constants
+CMD_MAX_LEN  = 258
+DATA_MAX_LEN = 249
+START_BYTE_0 = 0x22
+START_BYTE_1 = 0x69
+DEST_COMM    = 0x01
+DEST_CTRL    = 0x0a
+DEST_EXPT    = 0x02
+DEST_TERM    = 0x00
+
+## TAOLST Command Op Codes
+APP_GET_TELEM_OPCODE                = 0x17
+APP_GET_TIME_OPCODE                 = 0x13
+APP_REBOOT_OPCODE                   = 0x12
+APP_SET_TIME_OPCODE                 = 0x14
+APP_TELEM_OPCODE                    = 0x18
+BOOTLOADER_ACK_OPCODE               = 0x01
+BOOTLOADER_ERASE_OPCODE             = 0x0c
+BOOTLOADER_JUMP_OPCODE              = 0x0b
+BOOTLOADER_NACK_OPCODE              = 0x0f
+BOOTLOADER_PING_OPCODE              = 0x00
+BOOTLOADER_WRITE_PAGE_OPCODE        = 0x02
+BOOTLOADER_WRITE_PAGE_EXT_OPCODE    = 0x03
+BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE = 0x20
+COMMON_ACK_OPCODE                   = 0x10
+COMMON_ASCII_OPCODE                 = 0x11
+COMMON_DATA_OPCODE                  = 0x16
+COMMON_NACK_OPCODE                  = 0xff
+
+## TAOLST Command Enum Parameters
+BOOTLOADER_ACK_REASON_PONG   = 0x00
+BOOTLOADER_ACK_REASON_ERASED = 0x01
+BOOTLOADER_ACK_REASON_JUMP   = 0xff
+
+## TAOLST Command Indices
+START_BYTE_0_INDEX = 0
+START_BYTE_1_INDEX = 1
+MSG_LEN_INDEX      = 2
+HWID_LSB_INDEX     = 3
+HWID_MSB_INDEX     = 4
+MSG_ID_LSB_INDEX   = 5
+MSG_ID_MSB_INDEX   = 6
+DEST_ID_INDEX      = 7
+OPCODE_INDEX       = 8
+DATA_START_INDEX   = 9
+
+## Valid MSG_LEN values of each opcode: every length TxCmd (through its
+## constructor and setters such as bootloader_erase(status)), reply.TxCmdBuff
+## (the demo board, whose telemetry reply is empty) and the boards send.
+## RxCmdBuff rejects a frame whose opcode is not listed or whose length does
+## not match, so one corrupted length byte cannot swallow good traffic
+MSG_LEN_BY_OPCODE = {
+ APP_GET_TELEM_OPCODE:                (0x06,),
+ APP_GET_TIME_OPCODE:                 (0x06,),
+ APP_REBOOT_OPCODE:                   (0x06, 0x0a),
+ APP_SET_TIME_OPCODE:                 (0x0e,),
+ APP_TELEM_OPCODE:                    (0x06, 0x54),
+ BOOTLOADER_ACK_OPCODE:               (0x06, 0x07),
+ BOOTLOADER_ERASE_OPCODE:             (0x06, 0x07),
+ BOOTLOADER_JUMP_OPCODE:              (0x06,),
+ BOOTLOADER_NACK_OPCODE:              (0x06, 0x07),
+ BOOTLOADER_PING_OPCODE:              (0x06,),
+ BOOTLOADER_WRITE_PAGE_OPCODE:        (0x07, 0x87),
+ BOOTLOADER_WRITE_PAGE_EXT_OPCODE:    (0x07, 0x08, 0x88),
+ BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE: (0x07, 0x0a, 0x8a),
+ COMMON_ACK_OPCODE:                   (0x06,),
+ COMMON_ASCII_OPCODE:                 range(0x06, 0x06+DATA_MAX_LEN+1),
+ COMMON_DATA_OPCODE:                  range(0x06, 0x06+DATA_MAX_LEN+1),
+ COMMON_NACK_OPCODE:                  (0x06,)
+}
+
+## Optional CRC trailer modes, valued by the trailer length in bytes. The
+## trailer follows the last DATA byte, is not counted in MSG_LEN and holds the
+## CRC of every frame byte from START_BYTE_0, little-endian. Both ends of a
+## link must use the same mode
+CRC_NONE = 0
+CRC_16   = 2 # CRC-16/CCITT-FALSE (binascii.crc_hqx from 0xffff)
+CRC_32   = 4 # CRC-32 (zlib.crc32)
+
+## CRC modes by their width in bits, as given on script command lines
+CRC_BY_BITS = {0: CRC_NONE, 16: CRC_16, 32: CRC_32}
+
+## Space time epoch J2000 in nanoseconds since the Unix epoch
+J2000_UNIX_NS = 946727935816000000
+
+# enums
+
+## Plain int constants rather than enum.Enum: importing enum is the largest
+## part of this module's import time and int compares keep append_byte fast
+class RxCmdBuffState:
+  START_BYTE_0 = 0x00
+  START_BYTE_1 = 0x01
+  MSG_LEN      = 0x02
+  HWID_LSB     = 0x03
+  HWID_MSB     = 0x04
+  MSG_ID_LSB   = 0x05
+  MSG_ID_MSB   = 0x06
+  DEST_ID      = 0x07
+  OPCODE       = 0x08
+  DATA         = 0x09
+  COMPLETE     = 0x0a
+  CRC          = 0x0b
+
+# helper functions
+
+## Builds module attributes on first use (PEP 562): J2000, the space time
+## epoch as a datetime, so that importing this module does not import
+## datetime
+def __getattr__(name):
+  if name == 'J2000':
+    import datetime # datetime
+    global J2000
+    J2000 = datetime.datetime(\
+     2000, 1, 1,11,58,55,816000,\
+     tzinfo=datetime.timezone.utc\
+    )
+    return J2000
+  raise AttributeError('module '+repr(__name__)+' has no attribute '+repr(name))
+
+## Returns the CRC trailer of a frame (bytes-like, e.g. a memoryview) for a
+## CRC mode; binascii and zlib are only imported by links that use one
+def crc_trailer(frame, crc):
+  if crc == CRC_16:
+    import binascii # crc_hqx
+    return binascii.crc_hqx(frame, 0xffff).to_bytes(CRC_16, 'little')
+  elif crc == CRC_32:
+    import zlib # crc32
+    return zlib.crc32(frame).to_bytes(CRC_32, 'little')
+  return b''
+
+## Returns the frame in a list of command bytes (ints) as bytes, followed by
+## its CRC trailer unless crc is CRC_NONE
+def cmd_bytes_to_frame(data, crc=CRC_NONE):
+  frame = bytes(data[0:data[MSG_LEN_INDEX]+0x03])
+  if crc:
+    frame += crc_trailer(frame, crc)
+  return frame
+
+## Converts DEST_ID to string
+def dest_id_to_str(dest_id):
+  if dest_id==DEST_COMM:
+    return 'comm'
+  elif dest_id==DEST_CTRL:
+    return 'ctrl'
+  elif dest_id==DEST_EXPT:
+    return 'expt'
+  elif dest_id==DEST_TERM:
+    return 'term'
+  else:
+    return '?'
+
+## Converts BOOTLOADER_ACK_REASON to string
+def bootloader_ack_reason_to_str(bootloader_ack_reason):
+  if bootloader_ack_reason==BOOTLOADER_ACK_REASON_PONG:
+    return 'pong'
+  elif bootloader_ack_reason==BOOTLOADER_ACK_REASON_ERASED:
+    return 'erased'
+  elif bootloader_ack_reason==BOOTLOADER_ACK_REASON_JUMP:
+    return 'jump'
+  else:
+    return '?'
+
+## Converts a list of command bytes (ints) to a human-readable string
+def cmd_bytes_to_str(data):
+  s = ''
+  extra = ''
+  if data[OPCODE_INDEX] == APP_GET_TELEM_OPCODE:
+    s += 'app_get_telem'
+  elif data[OPCODE_INDEX] == APP_GET_TIME_OPCODE:
+    s += 'app_get_time'
+  elif data[OPCODE_INDEX] == APP_REBOOT_OPCODE:
+    s += 'app_reboot'
+    if data[MSG_LEN_INDEX] == 0x0a:
+      extra = ' delay:'+str(\
+       (data[DATA_START_INDEX+3]<<24) | \
+       (data[DATA_START_INDEX+2]<<16) | \
+       (data[DATA_START_INDEX+1]<< 8) | \
+       (data[DATA_START_INDEX+0]<< 0)   \
+      )
+  elif data[OPCODE_INDEX] == APP_SET_TIME_OPCODE:
+    s += 'app_set_time'
+    extra = \
+     ' sec:' + str(\
+      data[DATA_START_INDEX+3]<<24 | \
+      data[DATA_START_INDEX+2]<<16 | \
+      data[DATA_START_INDEX+1]<< 8 | \
+      data[DATA_START_INDEX+0]<< 0   \
+     ) + \
+     ' ns:'  + str(\
+      data[DATA_START_INDEX+7]<<24 | \
+      data[DATA_START_INDEX+6]<<16 | \
+      data[DATA_START_INDEX+5]<< 8 | \
+      data[DATA_START_INDEX+4]<< 0   \
+     )
+  elif data[OPCODE_INDEX] == APP_TELEM_OPCODE:
+    s += 'app_telem'
+    extra = ' hex_telem:'+bytes(\
+     data[DATA_START_INDEX:DATA_START_INDEX+data[MSG_LEN_INDEX]-0x06]\
+    ).hex()
+  elif data[OPCODE_INDEX] == BOOTLOADER_ACK_OPCODE:
+    s += 'bootloader_ack'
+    if data[MSG_LEN_INDEX] == 0x07:
+      extra = ' reason:'+'0x{:02x}'.format(data[DATA_START_INDEX])+\
+       '('+bootloader_ack_reason_to_str(data[DATA_START_INDEX])+')'
+  elif data[OPCODE_INDEX] == BOOTLOADER_ERASE_OPCODE:
+    s += 'bootloader_erase'
+    if data[MSG_LEN_INDEX] == 0x07:
+      extra = ' status:'+'0x{:02x}'.format(data[DATA_START_INDEX])
+  elif data[OPCODE_INDEX] == BOOTLOADER_JUMP_OPCODE:
+    s += 'bootloader_jump'
+  elif data[OPCODE_INDEX] == BOOTLOADER_NACK_OPCODE:
+    s += 'bootloader_nack'
+  elif data[OPCODE_INDEX] == BOOTLOADER_PING_OPCODE:
+    s += 'bootloader_ping'
+  elif data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_OPCODE:
+    s += 'bootloader_write_page'
+    extra = ' subpage_id:'+str(data[DATA_START_INDEX])
+    if data[MSG_LEN_INDEX] == 0x87:
+      extra += ' hex_data:'
+      for i in range(0,data[MSG_LEN_INDEX]-0x07):
+        extra += '{:02x}'.format(data[DATA_START_INDEX+1+i])
+  elif data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_EXT_OPCODE:
+    s += 'bootloader_write_page_ext'
+    page_num = ((data[DATA_START_INDEX]) << 8) + data[DATA_START_INDEX+1]
+    extra = ' subpage_id:'+str(page_num)
+    if data[MSG_LEN_INDEX] == 0x88:
+      extra += ' hex_data:'
+      for i in range(0,data[MSG_LEN_INDEX]-0x07):
+        extra += '{:02x}'.format(data[DATA_START_INDEX+2+i])
+  elif data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE:
+    s += 'bootloader_write_page_addr32'
+    addr = ((data[DATA_START_INDEX]) << 24) + \
+           ((data[DATA_START_INDEX+1]) << 16) + \
+           ((data[DATA_START_INDEX+2]) << 8) + \
+           data[DATA_START_INDEX+3]
+    extra = ' Address: 0x{:08x}'.format(addr)
+    if data[MSG_LEN_INDEX] == 0x8a:
+      extra += ' hex_data:'
+      for i in range(0,data[MSG_LEN_INDEX]-0x07):
+        extra += '{:02x}'.format(data[DATA_START_INDEX+4+i])
+  elif data[OPCODE_INDEX] == COMMON_ACK_OPCODE:
+    s += 'common_ack'
+  elif data[OPCODE_INDEX] == COMMON_ASCII_OPCODE:
+    s += 'common_ascii'
+    extra = ' "'
+    for i in range(0,data[MSG_LEN_INDEX]-0x06):
+      extra += chr(data[DATA_START_INDEX+i])
+    extra += '"'
+  elif data[OPCODE_INDEX] == COMMON_DATA_OPCODE:
+    s += 'common_data'
+    extra += ' hex_payload: '
+    payload = bytes(\
+     data[DATA_START_INDEX:DATA_START_INDEX+data[MSG_LEN_INDEX]-0x06]\
+    )
+    if len(payload)>0:
+      extra += payload.hex(' ')+' '
+  elif data[OPCODE_INDEX] == COMMON_NACK_OPCODE:
+    s += 'common_nack'
+  s += ' hw_id:0x{:04x}'.format(\
+   (data[HWID_MSB_INDEX]<<8)|(data[HWID_LSB_INDEX]<<0)\
+  )
+  s += ' msg_id:0x{:04x}'.format(\
+   (data[MSG_ID_MSB_INDEX]<<8)|(data[MSG_ID_LSB_INDEX]<<0)\
+  )
+  s += ' src_id:0x{:01x}'.format((data[DEST_ID_INDEX]>>4)&0x0f)
+  s += '('+dest_id_to_str((data[DEST_ID_INDEX]>>4)&0x0f)+')'
+  s += ' dst_id:0x{:01x}'.format((data[DEST_ID_INDEX]>>0)&0x0f)
+  s += '('+dest_id_to_str((data[DEST_ID_INDEX]>>0)&0x0f)+')'
+  s += extra
+  return s
+
+# classes
+
+## Command for transmitting
+# TODO: a "valid" state variable that indicates whether data is a valid command
+class TxCmd:
+  def __init__(self, opcode, hw_id, msg_id, src, dst):
+    self.data = [0x00]*CMD_MAX_LEN
+    self.data[START_BYTE_0_INDEX] = START_BYTE_0
+    self.data[START_BYTE_1_INDEX] = START_BYTE_1
+    self.data[HWID_LSB_INDEX]     = (hw_id  >> 0) & 0xff
+    self.data[HWID_MSB_INDEX]     = (hw_id  >> 8) & 0xff
+    self.data[MSG_ID_LSB_INDEX]   = (msg_id >> 0) & 0xff
+    self.data[MSG_ID_MSB_INDEX]   = (msg_id >> 8) & 0xff
+    self.data[DEST_ID_INDEX]      = (src << 4) | (dst << 0)
+    self.data[OPCODE_INDEX]       = opcode
+    if self.data[OPCODE_INDEX] == APP_GET_TELEM_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == APP_GET_TIME_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == APP_REBOOT_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == APP_SET_TIME_OPCODE:
+      self.data[MSG_LEN_INDEX]      = 0x0e
+      self.data[DATA_START_INDEX+0] = 0x00
+      self.data[DATA_START_INDEX+1] = 0x00
+      self.data[DATA_START_INDEX+2] = 0x00
+      self.data[DATA_START_INDEX+3] = 0x00
+      self.data[DATA_START_INDEX+4] = 0x00
+      self.data[DATA_START_INDEX+5] = 0x00
+      self.data[DATA_START_INDEX+6] = 0x00
+      self.data[DATA_START_INDEX+7] = 0x00
+    elif self.data[OPCODE_INDEX] == APP_TELEM_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x54
+      for i in range(0,0x54-0x06):
+        self.data[DATA_START_INDEX+i] = 0x00
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_ACK_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_ERASE_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_JUMP_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_NACK_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_PING_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_OPCODE:
+      self.data[MSG_LEN_INDEX]    = 0x07
+      self.data[DATA_START_INDEX] = 0x00
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_EXT_OPCODE:
+      self.data[MSG_LEN_INDEX]    = 0x07
+      self.data[DATA_START_INDEX] = 0x00
+    elif self.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE:
+      self.data[MSG_LEN_INDEX]    = 0x07
+      self.data[DATA_START_INDEX] = 0x00
+    elif self.data[OPCODE_INDEX] == COMMON_ACK_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == COMMON_ASCII_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == COMMON_DATA_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    elif self.data[OPCODE_INDEX] == COMMON_NACK_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x06
+    else:
+      self.data[MSG_LEN_INDEX] = 0x06
+
+  def app_reboot(self, delay):
+    if self.data[OPCODE_INDEX] == APP_REBOOT_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x0a
+      b0 = (delay >>  0) & 0xff # LSB
+      b1 = (delay >>  8) & 0xff
+      b2 = (delay >> 16) & 0xff
+      b3 = (delay >> 24) & 0xff # MSB
+      self.data[DATA_START_INDEX+0] = b0
+      self.data[DATA_START_INDEX+1] = b1
+      self.data[DATA_START_INDEX+2] = b2
+      self.data[DATA_START_INDEX+3] = b3
+
+  def app_set_time(self, sec, ns):
+    if self.data[OPCODE_INDEX] == APP_SET_TIME_OPCODE:
+      s0 = (sec >>  0) & 0xff # LSB
+      s1 = (sec >>  8) & 0xff
+      s2 = (sec >> 16) & 0xff
+      s3 = (sec >> 24) & 0xff # MSB
+      n0 = ( ns >>  0) & 0xff # LSB
+      n1 = ( ns >>  8) & 0xff
+      n2 = ( ns >> 16) & 0xff
+      n3 = ( ns >> 24) & 0xff # MSB
+      self.data[DATA_START_INDEX+0] = s0
+      self.data[DATA_START_INDEX+1] = s1
+      self.data[DATA_START_INDEX+2] = s2
+      self.data[DATA_START_INDEX+3] = s3
+      self.data[DATA_START_INDEX+4] = n0
+      self.data[DATA_START_INDEX+5] = n1
+      self.data[DATA_START_INDEX+6] = n2
+      self.data[DATA_START_INDEX+7] = n3
+
+  def app_telem(self, telem):
+    if self.data[OPCODE_INDEX] == APP_TELEM_OPCODE and len(telem)==78:
+      for i in range(0,len(telem)):
+        self.data[DATA_START_INDEX+i] = telem[i]
+
+  def bootloader_ack(self, reason):
+    if self.data[OPCODE_INDEX] == BOOTLOADER_ACK_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x07
+      self.data[DATA_START_INDEX] = reason
+
+  def bootloader_erase(self, status):
+    if self.data[OPCODE_INDEX] == BOOTLOADER_ERASE_OPCODE:
+      self.data[MSG_LEN_INDEX] = 0x07
+      self.data[DATA_START_INDEX] = status
+
+  def bootloader_write_page(self, page_number, page_data=[]):
+    if self.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_OPCODE:
+      self.data[DATA_START_INDEX] = page_number
+      if len(page_data)==128:
+        self.data[MSG_LEN_INDEX] = 0x87
+        for i in range(0,len(page_data)):
+          self.data[DATA_START_INDEX+1+i] = page_data[i]
+
+  def bootloader_write_page_ext(self, page_number, page_data=[]):
+    if self.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_EXT_OPCODE:
+      num = page_number.to_bytes(2, byteorder='big')
+      self.data[DATA_START_INDEX] = num[0]
+      self.data[DATA_START_INDEX+1] = num[1]
+      if len(page_data)==128:
+        self.data[MSG_LEN_INDEX] = 0x88
+        for i in range(0,len(page_data)):
+          self.data[DATA_START_INDEX+2+i] = page_data[i]
+
+  def bootloader_write_page_addr32(self, addr, page_data=[]):
+    if self.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE:
+      num = addr.to_bytes(4, byteorder='big')
+      self.data[DATA_START_INDEX] = num[0]
+      self.data[DATA_START_INDEX+1] = num[1]
+      self.data[DATA_START_INDEX+2] = num[2]
+      self.data[DATA_START_INDEX+3] = num[3]
+      if len(page_data)==128:
+        self.data[MSG_LEN_INDEX] = 0x8a
+        for i in range(0,len(page_data)):
+          self.data[DATA_START_INDEX+4+i] = page_data[i]
+
+  def common_ascii(self, ascii):
+    if self.data[OPCODE_INDEX] == COMMON_ASCII_OPCODE:
+      if len(ascii)<=249:
+        self.data[MSG_LEN_INDEX] = 0x06+len(ascii)
+        for i in range(0,len(ascii)):
+          self.data[DATA_START_INDEX+i] = ord(ascii[i])
+
+  def common_data(self, data):
+    if self.data[OPCODE_INDEX] == COMMON_DATA_OPCODE:
+      if len(data)<=DATA_MAX_LEN:
+        self.data[MSG_LEN_INDEX] = 0x06+len(data)
+        for i in range(0,len(data),2):
+          num = data[i]
+          byte_arr = num.to_bytes(2, 'big')
+          self.data[DATA_START_INDEX+i] = byte_arr[1]
+          self.data[DATA_START_INDEX+i+1] = byte_arr[0]
+
+  def common_data_bytes(self, payload):
+    if self.data[OPCODE_INDEX] == COMMON_DATA_OPCODE:
+      if len(payload)<=DATA_MAX_LEN:
+        self.data[MSG_LEN_INDEX] = 0x06+len(payload)
+        self.data[DATA_START_INDEX:DATA_START_INDEX+len(payload)] = payload
+
+  def get_byte_count(self):
+    return self.data[MSG_LEN_INDEX]+0x03
+
+  ## Returns the frame as bytes, with a CRC trailer unless crc is CRC_NONE
+  def to_bytes(self, crc=CRC_NONE):
+    return cmd_bytes_to_frame(self.data, crc)
+
+  def clear(self):
+    self.data = [0x00]*CMD_MAX_LEN
+
+  def __str__(self):
+    return cmd_bytes_to_str(self.data)
+
+## Buffer for received TAOLST commands
+## Receives one command a byte at a time. A candidate frame is rejected as
+## soon as its second start byte, MSG_LEN or opcode is invalid (see
+## MSG_LEN_BY_OPCODE); the bytes after its first start byte, kept in data,
+## are then scanned again, so a start byte inside a rejected frame is never
+## lost. The bytes to scan again are queued in pending and fed in until a
+## frame completes; any left over are fed in by the next clear(), so the
+## buffer can be complete again right after clear() without more input:
+## callers check the state after clear() before appending more bytes.
+## resyncs counts rejected frames and discarded the bytes dropped outside of
+## any frame; clear() keeps both counts.
+## With a crc mode other than CRC_NONE, each frame must be followed by its CRC
+## trailer, which is kept in data after the frame. A frame whose trailer does
+## not match is counted in crc_errors and rejected the same way
+class RxCmdBuff:
+  def __init__(self, crc=CRC_NONE):
+    self.state = RxCmdBuffState.START_BYTE_0
+    self.start_index = 0
+    self.end_index = 0
+    self.crc = crc
+    self.data = [0x00]*(CMD_MAX_LEN+crc)
+    self.resyncs = 0
+    self.discarded = 0
+    self.crc_errors = 0
+    self.pending = []      # bytes to scan again, oldest first
+    self.draining = False  # feeding pending in
+
+  ## Starts a new frame, keeping pending
+  def reset(self):
+    self.state = RxCmdBuffState.START_BYTE_0
+    self.start_index = 0
+    self.end_index = 0
+    self.data = [0x00]*(CMD_MAX_LEN+self.crc)
+
+  ## Starts a new frame and feeds pending in, which may complete it
+  def clear(self):
+    self.reset()
+    if self.pending:
+      self.drain()
+
+  ## Rejects the frame being received, of which b is byte number consumed,
+  ## drops its first start byte and queues the bytes after it to be fed in
+  ## again, ahead of the bytes already queued
+  def resync(self, consumed, b):
+    replay = self.data[START_BYTE_1_INDEX:consumed]
+    replay.append(b)
+    self.resyncs += 1
+    self.discarded += 1
+    self.reset()
+    self.pending[0:0] = replay
+    if not self.draining:
+      self.drain()
+
+  ## Feeds queued bytes in, oldest first, until a frame completes
+  def drain(self):
+    self.draining = True
+    while self.pending and self.state != RxCmdBuffState.COMPLETE:
+      self.append_byte(self.pending.pop(0))
+    self.draining = False
+
+  def append_byte(self, b):
+    if self.pending and not self.draining and \
+       self.state != RxCmdBuffState.COMPLETE:
+      self.pending.append(b)
+      self.drain()
+    elif self.state == RxCmdBuffState.START_BYTE_0:
+      if b==START_BYTE_0:
+        self.data[START_BYTE_0_INDEX] = b
+        self.state = RxCmdBuffState.START_BYTE_1
+      else:
+        self.discarded += 1
+    elif self.state == RxCmdBuffState.START_BYTE_1:
+      if b==START_BYTE_1:
+        self.data[START_BYTE_1_INDEX] = b
+        self.state = RxCmdBuffState.MSG_LEN
+      else:
+        self.resync(START_BYTE_1_INDEX, b)
+    elif self.state == RxCmdBuffState.MSG_LEN:
+      if 0x06 <= b and b <= 0x06+DATA_MAX_LEN:
+        self.data[MSG_LEN_INDEX] = b
+        self.start_index = 0x09
+        self.end_index = b+0x03
+        self.state = RxCmdBuffState.HWID_LSB
+      else:
+        self.resync(MSG_LEN_INDEX, b)
+    elif self.state == RxCmdBuffState.HWID_LSB:
+      self.data[HWID_LSB_INDEX] = b
+      self.state = RxCmdBuffState.HWID_MSB
+    elif self.state == RxCmdBuffState.HWID_MSB:
+      self.data[HWID_MSB_INDEX] = b
+      self.state = RxCmdBuffState.MSG_ID_LSB
+    elif self.state == RxCmdBuffState.MSG_ID_LSB:
+      self.data[MSG_ID_LSB_INDEX] = b
+      self.state = RxCmdBuffState.MSG_ID_MSB
+    elif self.state == RxCmdBuffState.MSG_ID_MSB:
+      self.data[MSG_ID_MSB_INDEX] = b
+      self.state = RxCmdBuffState.DEST_ID
+    elif self.state == RxCmdBuffState.DEST_ID:
+      self.data[DEST_ID_INDEX] = b
+      self.state = RxCmdBuffState.OPCODE
+    elif self.state == RxCmdBuffState.OPCODE:
+      lens = MSG_LEN_BY_OPCODE.get(b)
+      if lens is None or self.data[MSG_LEN_INDEX] not in lens:
+        self.resync(OPCODE_INDEX, b)
+        return
+      self.data[OPCODE_INDEX] = b
+      if self.start_index < self.end_index:
+        self.state = RxCmdBuffState.DATA
+      elif self.crc:
+        self.state = RxCmdBuffState.CRC
+      else:
+        self.state = RxCmdBuffState.COMPLETE
+    elif self.state == RxCmdBuffState.DATA:
+      if self.start_index < self.end_index:
+        self.data[self.start_index] = b
+        self.start_index += 1
+        if self.start_index == self.end_index:
+          if self.crc:
+            self.state = RxCmdBuffState.CRC
+          else:
+            self.state = RxCmdBuffState.COMPLETE
+      else:
+        self.state = RxCmdBuffState.COMPLETE
+    elif self.state == RxCmdBuffState.CRC:
+      self.data[self.start_index] = b
+      self.start_index += 1
+      if self.start_index == self.end_index+self.crc:
+        trailer = bytes(self.data[self.end_index:self.start_index])
+        if crc_trailer(bytes(self.data[0:self.end_index]), self.crc) == \
+           trailer:
+          self.state = RxCmdBuffState.COMPLETE
+        else:
+          self.crc_errors += 1
+          self.resync(self.start_index-1, b)
+    elif self.state == RxCmdBuffState.COMPLETE:
+      pass
+
+  def __str__(self):
+    if self.state == RxCmdBuffState.COMPLETE:
+      return cmd_bytes_to_str(self.data)
+    else:
+      pass
@@ -0,0 +1,170 @@
+# rawserial.py
+# Serial link on a POSIX (Linux) tty set up with termios and read and written
+# with os calls, in place of pyserial; open_serial opens it for raw:// paths
+
+# import Python modules
+import os        # tty file descriptor
+import selectors # waiting for the tty
+import termios   # line settings
+
+# "constants"
+
+## Bytes of the preallocated read buffer, a few of the largest frames; read
+## grows it for larger requests
+BUFFER_SIZE = 4096
+
+## Raw mode VMIN and VTIME: a read returns whatever is waiting, at once. A
+## frame-sized VMIN would only apply to blocking reads, which would block
+## in_waiting and the byte-at-a-time writes of transport.transact, and which
+## wait forever for a reply that never comes (VTIME only times the gap after
+## the first byte); frame-sized reads come from the selector wait and one
+## readv of everything waiting instead
+VMIN  = 0
+VTIME = 0
+
+# helper functions
+
+## Returns the termios speed constant for baudrate; raises ValueError if the
+## platform has none
+def termios_speed(baudrate):
+  speed = getattr(termios, 'B{:d}'.format(baudrate), None)
+  if speed is None:
+    raise ValueError('unsupported baud rate: {:d}'.format(baudrate))
+  return speed
+
+# classes
+
+## A tty opened non-blocking in raw mode (8N1, no flow control, no echo or
+## line editing) with the calls the ground tools make on a serial.Serial:
+## in_waiting, read, write, fileno and close. Reads fill a preallocated buffer
+## with os.readv, as many bytes as are waiting in one call, and in_waiting and
+## read are answered from the buffer until it runs dry; pyserial makes an
+## ioctl for each in_waiting and a select and a read for each read. Writes go
+## straight to os.write and wait on a selector only when the tty output
+## buffer is full; pyserial follows each write with a select. timeout and
+## write_timeout (seconds, None: forever) bound how long read and write wait,
+## as in pyserial
+class RawSerial:
+  def __init__(self, dev, baudrate=115200, timeout=None, write_timeout=None):
+    self.port = dev
+    self.timeout = timeout
+    self.write_timeout = write_timeout
+    self.buffer = bytearray(BUFFER_SIZE)
+    self.view = memoryview(self.buffer)
+    self.head = 0 # next byte to return
+    self.tail = 0 # end of the bytes read
+    self.fd = os.open(dev, os.O_RDWR|os.O_NOCTTY|os.O_NONBLOCK)
+    try:
+      self.configure(baudrate)
+    except (OSError, ValueError, termios.error):
+      os.close(self.fd)
+      raise
+    self.read_selector = selectors.DefaultSelector()
+    self.read_selector.register(self.fd, selectors.EVENT_READ)
+    self.write_selector = selectors.DefaultSelector()
+    self.write_selector.register(self.fd, selectors.EVENT_WRITE)
+
+  ## Sets raw mode at baudrate with VMIN and VTIME; reads never block (the fd
+  ## is non-blocking and waiting is left to the selector)
+  def configure(self, baudrate):
+    speed = termios_speed(baudrate)
+    iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(self.fd)
+    iflag &= ~(termios.IGNBRK|termios.BRKINT|termios.PARMRK|termios.ISTRIP|\
+               termios.INLCR|termios.IGNCR|termios.ICRNL|termios.IXON|\
+               termios.IXOFF|termios.IXANY)
+    oflag &= ~termios.OPOST
+    lflag &= ~(termios.ECHO|termios.ECHONL|termios.ICANON|termios.ISIG|\
+               termios.IEXTEN)
+    cflag &= ~(termios.CSIZE|termios.PARENB|termios.CSTOPB|\
+               getattr(termios, 'CRTSCTS', 0))
+    cflag |= termios.CS8|termios.CREAD|termios.CLOCAL
+    cc[termios.VMIN] = VMIN
+    cc[termios.VTIME] = VTIME
+    termios.tcsetattr(self.fd, termios.TCSANOW,\
+     [iflag, oflag, cflag, lflag, speed, speed, cc]\
+    )
+    termios.tcflush(self.fd, termios.TCIOFLUSH)
+    self.baudrate = baudrate
+
+  def fileno(self):
+    return self.fd
+
+  ## Replaces the buffer with one of size bytes, keeping the bytes not yet
+  ## returned
+  def grow(self, size):
+    buffer = bytearray(size)
+    buffer[0:self.tail-self.head] = self.view[self.head:self.tail]
+    self.view.release()
+    self.buffer = buffer
+    self.view = memoryview(buffer)
+    self.tail -= self.head
+    self.head = 0
+
+  ## Reads what is waiting into the buffer, after the bytes not yet returned;
+  ## returns the number of bytes read, 0 if the buffer is full
+  def fill(self):
+    if self.head == self.tail:
+      self.head = self.tail = 0
+    elif self.tail == len(self.buffer):
+      if self.head == 0:
+        return 0
+      self.buffer[0:self.tail-self.head] = self.view[self.head:self.tail]
+      self.tail -= self.head
+      self.head = 0
+    try:
+      n = os.readv(self.fd, [self.view[self.tail:]])
+    except BlockingIOError:
+      return 0
+    self.tail += n
+    return n
+
+  ## Bytes that can be read without waiting; the tty is only read when the
+  ## buffer is empty
+  @property
+  def in_waiting(self):
+    if self.head == self.tail:
+      self.fill()
+    return self.tail-self.head
+
+  ## Returns up to size bytes, waiting up to timeout seconds for them to
+  ## arrive
+  def read(self, size=1):
+    if size > len(self.buffer):
+      self.grow(size)
+    if self.tail-self.head < size:
+      self.fill()
+    while self.tail-self.head < size:
+      if not self.read_selector.select(self.timeout):
+        break
+      self.fill()
+    n = min(size, self.tail-self.head)
+    data = bytes(self.view[self.head:self.head+n])
+    self.head += n
+    return data
+
+  ## Writes data, waiting up to write_timeout seconds for room; returns the
+  ## number of bytes written
+  def write(self, data):
+    view = memoryview(data)
+    written = 0
+    while written < len(view):
+      try:
+        written += os.write(self.fd, view[written:])
+        continue
+      except BlockingIOError:
+        pass
+      if not self.write_selector.select(self.write_timeout):
+        break
+    return written
+
+  ## Drops the bytes received but not read
+  def reset_input_buffer(self):
+    self.head = self.tail = 0
+    termios.tcflush(self.fd, termios.TCIFLUSH)
+
+  def close(self):
+    if self.fd is not None:
+      self.read_selector.close()
+      self.write_selector.close()
+      os.close(self.fd)
+      self.fd = None
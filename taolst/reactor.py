@@ -0,0 +1,134 @@
+# reactor.py
+# Serves many serial ports from one thread: a selectors (epoll on Linux) loop
+# splits what each port reads into frames and drains each port's write queue
+# when the port can take more
+
+# import Python modules
+import selectors # waiting for any port
+import time      # perf_counter_ns
+
+# import shared TAOLST modules
+from taolst import router     # frame splitting and endpoints
+from taolst.protocol import * # TAOLST constants
+
+# classes
+
+## A port served by a Reactor, by non-blocking file descriptor. Each whole
+## frame read is passed to on_frame(port, frame, t_read), if given, as a
+## memoryview that is only valid during the call, with the perf_counter_ns
+## time it was read. Writes are queued as by router.Endpoint, up to
+## router.MAX_QUEUED bytes, and drained by the reactor when the port becomes
+## writable, so a slow port never blocks the others. A port that fails or is
+## closed at the other end is removed from its reactor and closed
+class Port(router.Endpoint):
+  def __init__(self, name, fd, on_frame=None, crc=CRC_NONE):
+    super().__init__(name, fd)
+    self.on_frame = on_frame
+    self.scanner = router.FrameScanner(crc)
+    self.reactor = None
+
+  def write(self, frame):
+    super().write(frame)
+    if self.queue and self.reactor is not None:
+      self.reactor.want_write(self)
+
+  def disconnect(self):
+    if self.reactor is not None:
+      self.reactor.remove(self)
+    super().disconnect()
+
+## A serial device, e.g. a board on /dev/ttyUSB0 (or a raw:// or socket://
+## device, see device.open_serial)
+class SerialPort(Port):
+  def __init__(self, name, dev, baudrate=None, on_frame=None, crc=CRC_NONE):
+    from taolst import device # serial devices
+    if baudrate is None:
+      baudrate = device.BAUDRATE
+    self.serial_port = device.open_serial(dev, baudrate)
+    super().__init__(name, self.serial_port.fileno(), on_frame, crc)
+
+  def close(self):
+    self.queue.clear()
+    self.queued = 0
+    self.serial_port.close()
+    self.fd = None
+
+## Waits on every port at once with one selectors.DefaultSelector (epoll on
+## Linux, so the cost of a wait does not grow with the number of ports and
+## there is no limit of 1024 descriptors as with select). Each port is
+## watched for reading, and for writing only while it has bytes queued. A
+## port that fails or is closed at the other end is removed
+class Reactor:
+  def __init__(self):
+    self.selector = selectors.DefaultSelector()
+    self.ports = []
+    self.writing = set() # ports watched for writing
+    self.polls = 0
+    self.events = 0
+
+  def add(self, port):
+    port.reactor = self
+    self.selector.register(port.fd, selectors.EVENT_READ, port)
+    self.ports.append(port)
+
+  def remove(self, port):
+    self.selector.unregister(port.fd)
+    self.writing.discard(port)
+    self.ports.remove(port)
+    port.reactor = None
+
+  ## Watches port for writing until its queue is drained
+  def want_write(self, port):
+    if port not in self.writing:
+      self.selector.modify(\
+       port.fd, selectors.EVENT_READ|selectors.EVENT_WRITE, port\
+      )
+      self.writing.add(port)
+
+  ## Waits up to timeout seconds (None: forever) for ports to become readable
+  ## or writable, passes the frames read to their on_frame and drains their
+  ## write queues
+  def poll(self, timeout=None):
+    events = self.selector.select(timeout)
+    self.polls += 1
+    self.events += len(events)
+    for key, mask in events:
+      port = key.data
+      if mask & selectors.EVENT_WRITE and port in self.writing and \
+         port.drain() and port.reactor is self:
+        self.selector.modify(port.fd, selectors.EVENT_READ, port)
+        self.writing.discard(port)
+      if port.reactor is not self or not mask & selectors.EVENT_READ:
+        continue
+      chunk = port.read()
+      if chunk is None:
+        continue
+      if not chunk:
+        port.disconnect()
+        continue
+      t_read = time.perf_counter_ns()
+      for frame in port.scanner.feed(chunk):
+        port.frames_in += 1
+        if port.on_frame is not None:
+          port.on_frame(port, frame, t_read)
+
+  ## Serves until interrupted or every port is closed
+  def run(self):
+    while self.ports:
+      self.poll()
+
+  def close(self):
+    for port in list(self.ports):
+      self.remove(port)
+      port.close()
+    self.selector.close()
+
+  def __str__(self):
+    s = '{:d} polls, {:d} events\n'.format(self.polls, self.events)
+    for port in self.ports:
+      s += '{:s}: {:d} frames in, {:d} out, {:d} dropped, {:d} bytes '\
+           'queued, {:d} bytes discarded\n'.format(\
+            port.name, port.frames_in, port.frames_out, port.dropped,\
+            port.queued, port.scanner.discarded\
+           )
+    return s
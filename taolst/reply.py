@@ -0,0 +1,148 @@
+# reply.py
+# Generates the reply a board in its bootloader would send to a TAOLST command
+
+# import shared TAOLST modules
+from taolst import protocol
+from taolst.protocol import *
+
+# "constants"
+
+## Emulated board state
+MAX_DELAY = 1000
+FLASH_WRITE_OK = True
+TIME_SET = True
+BOOT_STATE = True
+
+# classes
+
+## Buffer for transmitted TAOLST commands
+class TxCmdBuff:
+  def __init__(self):
+    self.empty = True
+    self.start_index = 0
+    self.end_index = 0
+    self.data = [0x00]*CMD_MAX_LEN
+
+  def clear(self):
+    self.empty = True
+    self.start_index = 0
+    self.end_index = 0
+    self.data = [0x00]*CMD_MAX_LEN
+
+  def generate_reply(self, rx_cmd_buff):
+    if rx_cmd_buff.state==RxCmdBuffState.COMPLETE and self.empty:
+      self.data[START_BYTE_0_INDEX] = START_BYTE_0
+      self.data[START_BYTE_1_INDEX] = START_BYTE_1
+      self.data[HWID_LSB_INDEX] = rx_cmd_buff.data[HWID_LSB_INDEX]
+      self.data[HWID_MSB_INDEX] = rx_cmd_buff.data[HWID_MSB_INDEX]
+      self.data[MSG_ID_LSB_INDEX] = rx_cmd_buff.data[MSG_ID_LSB_INDEX]
+      self.data[MSG_ID_MSB_INDEX] = rx_cmd_buff.data[MSG_ID_MSB_INDEX]
+      self.data[DEST_ID_INDEX] = \
+       (0x0f & rx_cmd_buff.data[DEST_ID_INDEX]) << 4 | \
+       (0xf0 & rx_cmd_buff.data[DEST_ID_INDEX]) >> 4
+      if rx_cmd_buff.data[OPCODE_INDEX] == APP_GET_TELEM_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = APP_TELEM_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == APP_GET_TIME_OPCODE:
+        if TIME_SET:
+          import datetime # datetime
+          dt = datetime.datetime.now(tz=datetime.timezone.utc) - protocol.J2000
+          sec = int(dt.total_seconds())
+          ns = dt.microseconds * 1000
+          sec_bytes = bytearray(sec.to_bytes(4, 'little'))
+          ns_bytes = bytearray(ns.to_bytes(4, "little"))
+          self.data[MSG_LEN_INDEX] = 0x0e
+          self.data[OPCODE_INDEX] = APP_SET_TIME_OPCODE
+          self.data[DATA_START_INDEX] = sec_bytes[0]
+          self.data[DATA_START_INDEX+1] = sec_bytes[1]
+          self.data[DATA_START_INDEX+2] = sec_bytes[2]
+          self.data[DATA_START_INDEX+3] = sec_bytes[3]
+          self.data[DATA_START_INDEX+4] = ns_bytes[0]
+          self.data[DATA_START_INDEX+5] = ns_bytes[1]
+          self.data[DATA_START_INDEX+6] = ns_bytes[2]
+          self.data[DATA_START_INDEX+7] = ns_bytes[3]
+        else:
+          self.data[MSG_LEN_INDEX] = 0x06
+          self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == APP_REBOOT_OPCODE:
+        #If no delay provided, then common ack immediately
+        if(rx_cmd_buff.data[MSG_LEN_INDEX] == 0x06):
+          self.data[MSG_LEN_INDEX] = 0x06
+          self.data[OPCODE_INDEX] = COMMON_ACK_OPCODE
+        else:
+          delay_bytes = rx_cmd_buff.data[DATA_START_INDEX:DATA_START_INDEX+4]
+          delay = \
+            (delay_bytes[3] << 24) + (delay_bytes[2] << 16) + \
+            (delay_bytes[1] << 8) + (delay_bytes[0])
+          if (delay <= MAX_DELAY):
+            self.data[MSG_LEN_INDEX] = 0x06
+            self.data[OPCODE_INDEX] = COMMON_ACK_OPCODE
+          else:
+            self.data[MSG_LEN_INDEX] = 0x06
+            self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == APP_SET_TIME_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_ACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == APP_TELEM_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == BOOTLOADER_ACK_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == BOOTLOADER_ERASE_OPCODE:
+        if BOOT_STATE:
+          self.data[MSG_LEN_INDEX] = 0x07
+          self.data[OPCODE_INDEX] = BOOTLOADER_ACK_OPCODE
+          self.data[DATA_START_INDEX] = BOOTLOADER_ACK_REASON_ERASED
+        else:
+          self.data[MSG_LEN_INDEX] = 0x06
+          self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == BOOTLOADER_NACK_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == BOOTLOADER_PING_OPCODE:
+        if BOOT_STATE:
+          self.data[MSG_LEN_INDEX] = 0x07
+          self.data[OPCODE_INDEX] = BOOTLOADER_ACK_OPCODE
+          self.data[DATA_START_INDEX] = BOOTLOADER_ACK_REASON_PONG
+        else:
+          self.data[MSG_LEN_INDEX] = 0x06
+          self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == BOOTLOADER_WRITE_PAGE_OPCODE:
+        if BOOT_STATE:
+          if (FLASH_WRITE_OK):
+            page_number = rx_cmd_buff.data[DATA_START_INDEX]
+            self.data[MSG_LEN_INDEX] = 0x07
+            self.data[OPCODE_INDEX] = BOOTLOADER_ACK_OPCODE
+            self.data[DATA_START_INDEX] = page_number
+          else:
+            self.data[MSG_LEN_INDEX] = 0x06
+            self.data[OPCODE_INDEX] = BOOTLOADER_NACK_OPCODE
+        else:
+          self.data[MSG_LEN_INDEX] = 0x06
+          self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == BOOTLOADER_JUMP_OPCODE:
+        if BOOT_STATE:
+          self.data[MSG_LEN_INDEX] = 0x07
+          self.data[OPCODE_INDEX] = BOOTLOADER_ACK_OPCODE
+          self.data[DATA_START_INDEX] = BOOTLOADER_ACK_REASON_JUMP
+        else:
+          self.data[MSG_LEN_INDEX] = 0x06
+          self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == COMMON_ACK_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_ACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == COMMON_ASCII_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+      elif rx_cmd_buff.data[OPCODE_INDEX] == COMMON_NACK_OPCODE:
+        self.data[MSG_LEN_INDEX] = 0x06
+        self.data[OPCODE_INDEX] = COMMON_NACK_OPCODE
+
+  ## Returns the reply frame as bytes, with a CRC trailer unless crc is
+  ## CRC_NONE
+  def to_bytes(self, crc=CRC_NONE):
+    return cmd_bytes_to_frame(self.data, crc)
+
+  def __str__(self):
+    return cmd_bytes_to_str(self.data)
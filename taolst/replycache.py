@@ -0,0 +1,110 @@
+# replycache.py
+# Bounded LRU caches keyed by HWID, message ID and source/destination: replies
+# to answer retransmitted commands with, and frames already received
+
+# import Python modules
+from collections import OrderedDict # LRU order
+
+# import shared TAOLST modules
+from taolst.protocol import * # TAOLST constants
+
+# "constants"
+
+## Entries kept before the least recently used is evicted
+DEFAULT_CAPACITY = 256
+
+# helper functions
+
+## Returns the cache key of a list of command bytes: (HWID, message ID,
+## DEST_ID byte), the byte holding both the source and destination IDs
+def frame_key(data):
+  return (\
+   (data[HWID_MSB_INDEX]<<8)|data[HWID_LSB_INDEX],\
+   (data[MSG_ID_MSB_INDEX]<<8)|data[MSG_ID_LSB_INDEX],\
+   data[DEST_ID_INDEX]\
+  )
+
+## Returns the bytes of the command in a list of command bytes
+def frame_bytes(data):
+  return bytes(data[0:data[MSG_LEN_INDEX]+0x03])
+
+# classes
+
+## Replies by the command they answer, for a board (or emulator) to answer a
+## retransmitted command without executing it again. A cached reply is only
+## returned for a command identical to the one it answered, so a message ID
+## reused for a different command misses. Lookups and inserts are O(1)
+class ReplyCache:
+  def __init__(self, capacity=DEFAULT_CAPACITY):
+    self.capacity = capacity
+    self.entries = OrderedDict() # key -> (command bytes, reply)
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  ## Returns the cached reply to a command (a list of command bytes), or None
+  def get(self, data):
+    key = frame_key(data)
+    entry = self.entries.get(key)
+    if entry is not None and entry[0] == frame_bytes(data):
+      self.entries.move_to_end(key)
+      self.hits += 1
+      return entry[1]
+    self.misses += 1
+    return None
+
+  ## Caches the reply to a command, evicting the least recently used entry
+  ## when full
+  def put(self, data, reply):
+    key = frame_key(data)
+    self.entries[key] = (frame_bytes(data), reply)
+    self.entries.move_to_end(key)
+    if len(self.entries) > self.capacity:
+      self.entries.popitem(last=False)
+      self.evictions += 1
+
+  def clear(self):
+    self.entries.clear()
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __str__(self):
+    return '{:d} cached, {:d} hits, {:d} misses, {:d} evicted'.format(\
+     len(self.entries), self.hits, self.misses, self.evictions\
+    )
+
+## Keys of the most recent frames received, for dropping a retransmitted or
+## echoed frame instead of taking it as the reply to the next command. A hit
+## is a duplicate; checks are O(1)
+class DuplicateFilter:
+  def __init__(self, capacity=DEFAULT_CAPACITY):
+    self.capacity = capacity
+    self.keys = OrderedDict() # key -> None
+    self.hits = 0
+    self.misses = 0
+
+  ## Returns True if a frame with the key of data (a list of command bytes)
+  ## was seen before, otherwise records it and returns False
+  def seen(self, data):
+    key = frame_key(data)
+    if key in self.keys:
+      self.keys.move_to_end(key)
+      self.hits += 1
+      return True
+    self.keys[key] = None
+    if len(self.keys) > self.capacity:
+      self.keys.popitem(last=False)
+    self.misses += 1
+    return False
+
+  def clear(self):
+    self.keys.clear()
+
+  def __len__(self):
+    return len(self.keys)
+
+  def __str__(self):
+    return '{:d} frames, {:d} duplicates dropped'.format(\
+     self.misses, self.hits\
+    )
@@ -0,0 +1,174 @@
+# responder.py
+# Answers frames that expect an automatic reply, such as the common_ack COMM
+# sends to TERM, from pre-encoded reply templates
+
+# import Python modules
+import collections # suppression window
+import os          # reads and writes on the port file descriptor
+import select      # waiting for the port
+import threading   # background responder
+import time        # perf_counter_ns
+
+# import shared TAOLST modules
+from taolst import router     # frame splitting
+from taolst import trace      # latency histograms
+from taolst.protocol import * # TAOLST constants
+
+# "constants"
+
+## Replies later than this many seconds after the command was read count as
+## late
+DEFAULT_DEADLINE = 0.005
+
+## Seconds a (HWID, message ID) is not answered again after a reply to it,
+## or after suppress: the board answers a common_ack with a common_ack, so
+## answering that one too would start an endless exchange
+DEFAULT_SUPPRESS = 5.0
+
+## (HWID, message ID) pairs kept in the suppression window at most
+SUPPRESS_CAPACITY = 256
+
+## Seconds a ResponderThread read waits, bounding how long stop() takes
+READ_TIMEOUT = 0.1
+
+# classes
+
+## Answers commands addressed to node by opcode. Each reply is encoded once
+## as a template; answering copies it and patches in the HWID, message ID
+## and swapped DEST_ID of the command (and the CRC trailer), so the reply
+## costs no TxCmd or per-byte work. The time from reading a command to
+## writing its reply goes into a trace.LatencyHistogram. A frame with the
+## HWID and message ID of one answered (or passed to suppress) less than
+## suppress seconds ago is not answered, and is counted in suppressed
+class Responder:
+  def __init__(self, node=DEST_TERM, crc=CRC_NONE, deadline=DEFAULT_DEADLINE,\
+               suppress=DEFAULT_SUPPRESS):
+    self.node = node
+    self.crc = crc
+    self.deadline_ns = int(deadline*1e9)
+    self.suppress_ns = int(suppress*1e9)
+    self.templates = {} # command opcode -> reply frame template
+    self.recent = collections.OrderedDict() # (HWID, msg ID) -> t_until (ns)
+    self.latency = trace.LatencyHistogram()
+    self.answered = 0
+    self.late = 0
+    self.suppressed = 0
+    self.add_template(COMMON_ACK_OPCODE, COMMON_ACK_OPCODE)
+
+  ## Answers commands with opcode by a reply with reply_opcode and data
+  def add_template(self, opcode, reply_opcode, data=b''):
+    self.templates[opcode] = bytearray(\
+     [START_BYTE_0, START_BYTE_1, 0x06+len(data), 0x00, 0x00, 0x00, 0x00,\
+      0x00, reply_opcode]\
+    )+bytes(data)+bytes(self.crc)
+
+  ## Returns the reply to a frame (bytes-like, a whole frame) if it is
+  ## addressed to node and has a template, otherwise None
+  def reply(self, frame):
+    if frame[DEST_ID_INDEX]&0x0f != self.node:
+      return None
+    template = self.templates.get(frame[OPCODE_INDEX])
+    if template is None:
+      return None
+    reply = bytearray(template)
+    reply[HWID_LSB_INDEX:DEST_ID_INDEX] = frame[HWID_LSB_INDEX:DEST_ID_INDEX]
+    reply[DEST_ID_INDEX] = ((frame[DEST_ID_INDEX]&0x0f)<<4)|\
+                           ((frame[DEST_ID_INDEX]&0xf0)>>4)
+    if self.crc:
+      reply[-self.crc:] = crc_trailer(memoryview(reply)[0:-self.crc], self.crc)
+    return reply
+
+  ## Keeps frames with hw_id and msg_id from being answered for the next
+  ## suppress seconds, e.g. late replies to a command whose message ID expired
+  def suppress(self, hw_id, msg_id):
+    key = (hw_id, msg_id)
+    self.recent[key] = time.perf_counter_ns()+self.suppress_ns
+    self.recent.move_to_end(key)
+    if len(self.recent) > SUPPRESS_CAPACITY:
+      self.recent.popitem(last=False)
+
+  ## Writes the reply to frame with write, if it has one and it is not
+  ## suppressed, and records the time since t_read (perf_counter_ns when frame
+  ## was read); returns True if it was answered
+  def respond(self, frame, write, t_read):
+    reply = self.reply(frame)
+    if reply is None:
+      return False
+    hw_id = (frame[HWID_MSB_INDEX]<<8)|frame[HWID_LSB_INDEX]
+    msg_id = (frame[MSG_ID_MSB_INDEX]<<8)|frame[MSG_ID_LSB_INDEX]
+    t_until = self.recent.get((hw_id, msg_id))
+    if t_until is not None and time.perf_counter_ns() < t_until:
+      self.suppressed += 1
+      return False
+    write(reply)
+    self.suppress(hw_id, msg_id)
+    latency_ns = time.perf_counter_ns()-t_read
+    self.latency.add(latency_ns)
+    self.answered += 1
+    if latency_ns > self.deadline_ns:
+      self.late += 1
+    return True
+
+  def __str__(self):
+    return '{:d} answered, {:d} late, {:d} suppressed, p50 < {:d} us, '\
+           'p99 < {:d} us, {:s}'.format(\
+            self.answered, self.late, self.suppressed,\
+            self.latency.quantile_us(0.5),\
+            self.latency.quantile_us(0.99), str(self.latency)\
+           )
+
+## Runs a Responder on a serial port in a background thread. The thread owns
+## reading the port: frames it does not answer are passed to on_frame (as
+## bytes), if given, e.g. to put them on a queue for the application. It
+## waits, reads and writes on the file descriptor of the port directly: each
+## call releases the interpreter lock, and getting it back can take up to the
+## thread switch interval (sys.getswitchinterval) while other threads run
+## Python code, so the fewer calls per reply the lower the tail latency. The
+## thread stops when the port is closed at the other end (a read returns no
+## bytes) or fails; error then holds the OSError, if any
+class ResponderThread(threading.Thread):
+  def __init__(self, serial_port, responder, on_frame=None):
+    super().__init__(daemon=True)
+    self.serial_port = serial_port
+    self.responder = responder
+    self.on_frame = on_frame
+    self.scanner = router.FrameScanner(responder.crc)
+    self.fd = serial_port.fileno()
+    self.stopping = False
+    self.error = None
+
+  ## Writes frame; pyserial opens the port non-blocking, so a full output
+  ## buffer is waited out. A failed write stops the thread
+  def write(self, frame):
+    while frame and not self.stopping:
+      try:
+        frame = frame[os.write(self.fd, frame):]
+      except BlockingIOError:
+        select.select([], [self.fd], [], READ_TIMEOUT)
+      except OSError as error:
+        self.error = error
+        self.stopping = True
+
+  def run(self):
+    while not self.stopping:
+      if not select.select([self.fd], [], [], READ_TIMEOUT)[0]:
+        continue
+      try:
+        chunk = os.read(self.fd, router.READ_SIZE)
+      except BlockingIOError:
+        continue
+      except OSError as error:
+        self.error = error
+        return
+      if not chunk:
+        return
+      t_read = time.perf_counter_ns()
+      for frame in self.scanner.feed(chunk):
+        if not self.responder.respond(frame, self.write, t_read) and \
+           self.on_frame is not None:
+          self.on_frame(bytes(frame))
+
+  ## Stops the thread within READ_TIMEOUT seconds
+  def stop(self):
+    self.stopping = True
+    self.join()
@@ -0,0 +1,345 @@
+# router.py
+# Forwards TAOLST frames between serial ports, ptys and TCP connections by the
+# destination nibble of DEST_ID
+
+# import Python modules
+import collections # write queues
+import os          # pty and endpoint file descriptors
+import select      # waiting for any endpoint
+import time        # perf_counter_ns
+
+# import shared TAOLST modules
+from taolst import trace      # latency histograms
+from taolst.protocol import * # TAOLST constants
+
+# "constants"
+
+## Bytes read from an endpoint at a time
+READ_SIZE = 4096
+
+## Bytes queued for an endpoint that is not taking them, e.g. a stalled
+## client, beyond which further frames to it are dropped
+MAX_QUEUED = 0x10000
+
+## Node names accepted in place of destination IDs
+NODE_IDS = {
+ 'comm': DEST_COMM, 'ctrl': DEST_CTRL, 'expt': DEST_EXPT, 'term': DEST_TERM
+}
+
+# helper functions
+
+## Returns the destination ID of a node name (comm, ctrl, expt, term) or
+## number; raises ValueError otherwise
+def node_id(name):
+  if name in NODE_IDS:
+    return NODE_IDS[name]
+  dst = int(name, 0)
+  if not 0 <= dst <= 0x0f:
+    raise ValueError('destination ID out of range: '+name)
+  return dst
+
+# classes
+
+## Splits a byte stream into whole frames (and CRC trailers) without copying
+## them: feed returns memoryview slices of the bytes read, and only a partial
+## frame at the end is kept for the next read. Headers are checked as
+## RxCmdBuff does (length, and length against opcode); bytes that cannot
+## start a frame are discarded. CRC trailers are passed on unchecked
+class FrameScanner:
+  def __init__(self, crc=CRC_NONE):
+    self.crc = crc
+    self.pending = b'' # partial frame from the last read
+    self.frames = 0
+    self.discarded = 0
+
+  ## Returns the list of frames completed by the bytes of chunk
+  def feed(self, chunk):
+    data = self.pending+chunk if self.pending else chunk
+    view = memoryview(data)
+    frames = []
+    n = len(data)
+    pos = 0
+    keep = n
+    while True:
+      i = data.find(b'\x22\x69', pos)
+      if i < 0:
+        keep = n-1 if n > pos and data[n-1] == START_BYTE_0 else n
+        self.discarded += keep-pos
+        break
+      self.discarded += i-pos
+      if i+OPCODE_INDEX >= n:
+        keep = i
+        break
+      msg_len = data[i+MSG_LEN_INDEX]
+      lens = MSG_LEN_BY_OPCODE.get(data[i+OPCODE_INDEX])
+      if not 0x06 <= msg_len <= 0x06+DATA_MAX_LEN or \
+         lens is None or msg_len not in lens:
+        self.discarded += 1
+        pos = i+1
+        continue
+      end = i+msg_len+0x03+self.crc
+      if end > n:
+        keep = i
+        break
+      frames.append(view[i:end])
+      pos = end
+    self.pending = bytes(data[keep:])
+    self.frames += len(frames)
+    return frames
+
+## A link the router reads frames from and writes frames to, by
+## non-blocking file descriptor; subclasses open it. Writes go straight to
+## the link while nothing is queued; what the link cannot take at once is
+## queued, up to MAX_QUEUED bytes, and written when the link becomes
+## writable, so a stalled link never blocks the others
+class Endpoint:
+  def __init__(self, name, fd=None):
+    self.name = name
+    self.fd = fd
+    if fd is not None:
+      os.set_blocking(fd, False)
+    self.scanner = None
+    self.queue = collections.deque() # bytes not yet written, by frame
+    self.queued = 0                  # bytes in queue
+    self.frames_in = 0
+    self.frames_out = 0
+    self.dropped = 0 # frames routed here while it was not connected or full
+
+  def fileno(self):
+    return self.fd
+
+  ## Returns the bytes available, None if there were none after all, or b''
+  ## when the link is closed
+  def read(self):
+    try:
+      return os.read(self.fd, READ_SIZE)
+    except BlockingIOError:
+      return None
+    except OSError:
+      return b''
+
+  ## Writes what the link takes of data at once; returns the bytes written
+  def send(self, data):
+    return os.write(self.fd, data)
+
+  def write(self, frame):
+    if self.fd is None:
+      self.dropped += 1
+      return
+    n = 0
+    if not self.queue:
+      try:
+        n = self.send(frame)
+      except BlockingIOError:
+        pass
+      except OSError:
+        self.dropped += 1
+        self.disconnect()
+        return
+      if n == len(frame):
+        self.frames_out += 1
+        return
+    if n == 0 and self.queued+len(frame) > MAX_QUEUED:
+      self.dropped += 1
+      return
+    self.queue.append(bytes(frame[n:]))
+    self.queued += len(frame)-n
+
+  ## Writes queued bytes until the link takes no more; returns True once the
+  ## queue is empty. A link that fails is disconnected, dropping the queue
+  def drain(self):
+    while self.queue:
+      data = self.queue[0]
+      try:
+        n = self.send(data)
+      except BlockingIOError:
+        return False
+      except OSError:
+        self.dropped += len(self.queue)
+        self.disconnect()
+        return True
+      self.queued -= n
+      if n < len(data):
+        self.queue[0] = data[n:]
+        return False
+      self.queue.popleft()
+      self.frames_out += 1
+    return True
+
+  ## Stops reading a link that was closed at the other end
+  def disconnect(self):
+    self.close()
+
+  def close(self):
+    self.queue.clear()
+    self.queued = 0
+    if self.fd is not None:
+      os.close(self.fd)
+      self.fd = None
+
+## A serial device, e.g. a board on /dev/ttyUSB0
+class SerialEndpoint(Endpoint):
+  def __init__(self, name, dev, baudrate=None):
+    from taolst import device # serial devices
+    if baudrate is None:
+      baudrate = device.BAUDRATE
+    self.serial_port = device.open_serial(dev, baudrate)
+    super().__init__(name, self.serial_port.fileno())
+
+  def close(self):
+    self.queue.clear()
+    self.queued = 0
+    self.serial_port.close()
+    self.fd = None
+
+## A new pty for a ground tool to open as its serial device; path is the
+## device to pass to the tool
+class PtyEndpoint(Endpoint):
+  def __init__(self, name):
+    import tty # raw mode
+    master_fd, self.slave_fd = os.openpty()
+    tty.setraw(self.slave_fd)
+    self.path = os.ttyname(self.slave_fd)
+    super().__init__(name, master_fd)
+
+  def close(self):
+    super().close()
+    os.close(self.slave_fd)
+
+## A TCP port a ground tool connects to; the latest connection replaces the
+## one before. Frames routed here while nobody is connected are dropped
+class TcpEndpoint(Endpoint):
+  def __init__(self, name, port, host='127.0.0.1'):
+    import socket # listening socket
+    super().__init__(name)
+    self.listener = socket.create_server((host, port))
+    self.listener.setblocking(False)
+    self.connection = None
+
+  ## Accepts a waiting connection in place of the current one; the port stays
+  ## open when a connection closes
+  def accept(self):
+    try:
+      connection = self.listener.accept()[0]
+    except OSError:
+      return
+    self.disconnect()
+    connection.setblocking(False)
+    self.connection = connection
+    self.fd = connection.fileno()
+
+  def disconnect(self):
+    self.queue.clear()
+    self.queued = 0
+    if self.connection is not None:
+      self.connection.close()
+      self.connection = None
+      self.fd = None
+
+  def read(self):
+    try:
+      return self.connection.recv(READ_SIZE)
+    except BlockingIOError:
+      return None
+    except OSError:
+      return b''
+
+  def send(self, data):
+    return self.connection.send(data)
+
+  def close(self):
+    self.disconnect()
+    self.listener.close()
+
+## Frames, bytes and forwarding latency (last byte read to frame written) of
+## one route, from an endpoint to another
+class RouteStats:
+  def __init__(self):
+    self.frames = 0
+    self.bytes = 0
+    self.latency = trace.LatencyHistogram()
+
+## Forwards each frame read from an endpoint to the endpoint serving its
+## destination nibble, unchanged: frames are written from the buffer they
+## were read into. Frames to a destination without a route, or back to the
+## endpoint they came from, are dropped
+class Router:
+  def __init__(self, crc=CRC_NONE):
+    self.crc = crc
+    self.endpoints = []
+    self.routes = [None]*16 # destination nibble -> endpoint
+    self.stats = {}         # (from name, to name) -> RouteStats
+    self.unrouted = 0
+
+  ## Adds an endpoint serving the destination IDs in dsts
+  def add(self, endpoint, dsts=()):
+    endpoint.scanner = FrameScanner(self.crc)
+    self.endpoints.append(endpoint)
+    for dst in dsts:
+      self.routes[dst] = endpoint
+
+  ## Forwards the frames in bytes read from endpoint at t_read (ns)
+  def forward(self, endpoint, chunk, t_read):
+    for frame in endpoint.scanner.feed(chunk):
+      endpoint.frames_in += 1
+      out = self.routes[frame[DEST_ID_INDEX]&0x0f]
+      if out is None or out is endpoint:
+        self.unrouted += 1
+        continue
+      out.write(frame)
+      key = (endpoint.name, out.name)
+      stats = self.stats.get(key)
+      if stats is None:
+        stats = self.stats[key] = RouteStats()
+      stats.frames += 1
+      stats.bytes += len(frame)
+      stats.latency.add(time.perf_counter_ns()-t_read)
+
+  ## Waits up to timeout seconds (None: forever) for endpoints to become
+  ## readable, or writable while they have bytes queued, forwards what they
+  ## received and drains their write queues
+  def poll(self, timeout=None):
+    listeners = {\
+     e.listener: e for e in self.endpoints if isinstance(e, TcpEndpoint)\
+    }
+    readers = [e for e in self.endpoints if e.fd is not None]
+    writers = [e for e in readers if e.queue]
+    readable, writable = select.select(\
+     readers+list(listeners), writers, [], timeout\
+    )[0:2]
+    for w in writable:
+      w.drain()
+    for r in readable:
+      if r in listeners:
+        listeners[r].accept()
+        continue
+      if r.fd is None:
+        continue
+      chunk = r.read()
+      if chunk:
+        self.forward(r, chunk, time.perf_counter_ns())
+      elif chunk is not None:
+        r.disconnect()
+
+  ## Routes until interrupted
+  def run(self):
+    while True:
+      self.poll()
+
+  def close(self):
+    for endpoint in self.endpoints:
+      endpoint.close()
+
+  def __str__(self):
+    s = '{:d} unrouted\n'.format(self.unrouted)
+    for endpoint in self.endpoints:
+      s += '{:s}: {:d} frames in, {:d} out, {:d} dropped, {:d} bytes '\
+           'queued, {:d} bytes discarded\n'.format(\
+            endpoint.name, endpoint.frames_in, endpoint.frames_out,\
+            endpoint.dropped, endpoint.queued, endpoint.scanner.discarded\
+           )
+    for (src, dst), stats in sorted(self.stats.items()):
+      s += '{:s} -> {:s}: {:d} frames, {:d} bytes, {:s}\n'.format(\
+       src, dst, stats.frames, stats.bytes, str(stats.latency)\
+      )
+    return s
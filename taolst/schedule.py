@@ -0,0 +1,275 @@
+# schedule.py
+# Contact pass prediction and a priority command queue packed into passes
+# (requires NumPy)
+
+# import Python modules
+import heapq # priority queue
+import numpy # elevation over a time grid
+import time  # sleep
+
+# import shared TAOLST modules
+from taolst import sgp4      # vectorized SGP4
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+# "constants"
+
+## WGS-84 ellipsoid for ground stations
+WGS84_A  = 6378.137            # km
+WGS84_F  = 1.0/298.257223563
+WGS84_E2 = WGS84_F*(2.0-WGS84_F)
+
+## GMST at J2000.0 (degrees) and its rate (degrees per UT1 day), IAU 1982
+GMST_J2000 = 280.46061837
+GMST_RATE  = 360.98564736629
+
+## J2000_UNIX_NS is noon TT, 64.184 s before noon UTC; GMST counts UT days
+## from noon UTC, so a J2000 time plus this offset is on the UT count
+J2000_UT_OFFSET_NS = J2000_UNIX_NS-946728000*1000000000
+
+## Defaults
+DEFAULT_MIN_ELEVATION = 10.0  # degrees above the horizon for a usable pass
+DEFAULT_STEP          = 10.0  # seconds between pass prediction samples
+DEFAULT_BAUD          = 115200
+DEFAULT_TURNAROUND    = 0.005 # board processing seconds per command
+DEFAULT_MARGIN        = 5.0   # seconds left unused after AOS and before LOS
+DEFAULT_TIMEOUT       = 1.0   # seconds to wait for each reply
+
+## Bits on the wire per byte with 8N1 framing
+BITS_PER_BYTE = 10
+
+## Reply length (bytes) by command opcode, for the link budget; other
+## commands get a common_ack or common_nack
+REPLY_BYTES = {
+ BOOTLOADER_PING_OPCODE:              0x0a,
+ BOOTLOADER_ERASE_OPCODE:             0x0a,
+ BOOTLOADER_WRITE_PAGE_OPCODE:        0x0a,
+ BOOTLOADER_WRITE_PAGE_EXT_OPCODE:    0x0a,
+ BOOTLOADER_WRITE_PAGE_ADDR32_OPCODE: 0x0a,
+ BOOTLOADER_JUMP_OPCODE:              0x0a,
+ APP_GET_TELEM_OPCODE:                0x57,
+ APP_GET_TIME_OPCODE:                 0x11
+}
+REPLY_BYTES_DEFAULT = 0x09
+
+## Command priorities; lower values are sent first
+PRIORITY_HIGH   = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW    = 2
+
+## Nanoseconds per second
+SECOND_NS = 1000000000
+
+# helper functions
+
+## Returns Greenwich mean sidereal time (radians) at J2000 nanosecond times
+def gmst(t_ns):
+  days = (numpy.asarray(t_ns, dtype=numpy.int64)+J2000_UT_OFFSET_NS)/\
+         (86400.0*SECOND_NS)
+  return numpy.radians(numpy.fmod(GMST_J2000+GMST_RATE*days, 360.0))
+
+## Rotates TEME positions (shape (...,3)) at times t_ns into the earth-fixed
+## frame, ignoring polar motion
+def teme_to_ecef(r, t_ns):
+  theta = gmst(t_ns)
+  c = numpy.cos(theta)
+  s = numpy.sin(theta)
+  return numpy.stack(\
+   (c*r[...,0]+s*r[...,1], -s*r[...,0]+c*r[...,1], r[...,2]), axis=-1\
+  )
+
+## Returns the command built by a queue entry: the entry itself, or what it
+## returns if it is a function (e.g. one stamping the current time)
+def build(entry):
+  return entry() if callable(entry) else entry
+
+# classes
+
+## Ground station at geodetic latitude and longitude (degrees) and altitude
+## (km), usable above min_elevation degrees
+class Station:
+  def __init__(self, lat, lon, alt=0.0, min_elevation=DEFAULT_MIN_ELEVATION):
+    self.lat = lat
+    self.lon = lon
+    self.alt = alt
+    self.min_elevation = min_elevation
+    phi = numpy.radians(lat)
+    lam = numpy.radians(lon)
+    n = WGS84_A/numpy.sqrt(1.0-WGS84_E2*numpy.sin(phi)**2)
+    self.ecef = numpy.array((\
+     (n+alt)*numpy.cos(phi)*numpy.cos(lam),\
+     (n+alt)*numpy.cos(phi)*numpy.sin(lam),\
+     (n*(1.0-WGS84_E2)+alt)*numpy.sin(phi)\
+    ))
+    self.up = numpy.array((\
+     numpy.cos(phi)*numpy.cos(lam), numpy.cos(phi)*numpy.sin(lam),\
+     numpy.sin(phi)\
+    ))
+
+  ## Returns the elevation (degrees) of TEME positions r at times t_ns
+  def elevation(self, r, t_ns):
+    rho = teme_to_ecef(r, t_ns)-self.ecef
+    return numpy.degrees(numpy.arcsin(\
+     (rho@self.up)/numpy.linalg.norm(rho, axis=-1)\
+    ))
+
+## One contact pass: acquisition and loss of signal and the time of the
+## highest elevation, in J2000 nanoseconds
+class Pass:
+  def __init__(self, t_aos, t_los, t_max, max_elevation):
+    self.t_aos = t_aos
+    self.t_los = t_los
+    self.t_max = t_max
+    self.max_elevation = max_elevation
+
+  def duration(self):
+    return (self.t_los-self.t_aos)/SECOND_NS
+
+  def __str__(self):
+    return '{:.0f} s pass, max elevation {:.1f} deg'.format(\
+     self.duration(), self.max_elevation\
+    )
+
+## Seconds of link time each command needs: the command and its reply on the
+## wire plus the board turnaround. A pass can carry commands for its length
+## minus a margin after AOS and before LOS.
+class LinkBudget:
+  def __init__(self, baud=DEFAULT_BAUD, turnaround=DEFAULT_TURNAROUND,\
+               margin=DEFAULT_MARGIN):
+    self.byte_time = BITS_PER_BYTE/baud
+    self.turnaround = turnaround
+    self.margin = margin
+
+  def seconds(self, cmd):
+    reply = REPLY_BYTES.get(cmd.data[OPCODE_INDEX], REPLY_BYTES_DEFAULT)
+    return (cmd.get_byte_count()+reply)*self.byte_time+self.turnaround
+
+  def capacity(self, contact):
+    return max(0.0, contact.duration()-2.0*self.margin)
+
+## Predicts the passes of one TLE over a station between J2000 nanosecond
+## times t_start and t_stop, sampling the elevation every step seconds in one
+## SGP4 call; AOS and LOS are interpolated between samples
+def predict_passes(tle, station, t_start, t_stop, step=DEFAULT_STEP):
+  t_ns = numpy.arange(t_start, t_stop, int(step*SECOND_NS), dtype=numpy.int64)
+  r = sgp4.Elements([tle]).at(t_ns)[0][0]
+  el = station.elevation(r, t_ns)-station.min_elevation
+  up = el >= 0.0
+  edges = numpy.flatnonzero(up[1:] != up[:-1])+1
+  starts = list(edges[up[edges]])
+  stops = list(edges[~up[edges]])
+  if up[0]:
+    starts.insert(0, 0)
+  if up[-1]:
+    stops.append(len(t_ns))
+  # time at which the elevation crosses the minimum between samples i-1, i
+  def crossing(i):
+    if i == 0 or i == len(t_ns):
+      return int(t_ns[min(i,len(t_ns)-1)])
+    f = el[i-1]/(el[i-1]-el[i])
+    return int(t_ns[i-1]+f*(t_ns[i]-t_ns[i-1]))
+  passes = []
+  for i, j in zip(starts, stops):
+    k = i+int(numpy.argmax(el[i:j]))
+    passes.append(Pass(\
+     crossing(i), crossing(j), int(t_ns[k]), el[k]+station.min_elevation\
+    ))
+  return passes
+
+## Priority queue of commands sent during contact passes. Entries are TxCmds
+## or functions returning one when called just before sending (for commands
+## such as APP_SET_TIME that carry the current time). Each pass takes the
+## highest priority entries that fit its link budget, in the order they were
+## added within a priority; an entry that does not fit holds back the rest of
+## its priority, so multi-frame uploads stay in order, while lower priorities
+## may fill the remaining time. What does not fit or fails spills to the next
+## pass.
+class Scheduler:
+  def __init__(self, budget=None, timeout=DEFAULT_TIMEOUT, tracer=None):
+    self.budget = budget if budget is not None else LinkBudget()
+    self.timeout = timeout
+    self.tracer = tracer
+    self.queue = [] # heap of (priority, seq, entry)
+    self.seq = 0
+    self.rx_cmd_buff = RxCmdBuff()
+    self.sent = 0
+    self.failed = 0
+
+  def add(self, entry, priority=PRIORITY_NORMAL):
+    heapq.heappush(self.queue, (priority, self.seq, entry))
+    self.seq += 1
+
+  def __len__(self):
+    return len(self.queue)
+
+  ## Removes and returns the queue items that fit one pass, in send order
+  def take(self, contact):
+    left = self.budget.capacity(contact)
+    taken = []
+    kept = []
+    held = set()
+    while self.queue:
+      item = heapq.heappop(self.queue)
+      if item[0] not in held:
+        seconds = self.budget.seconds(build(item[2]))
+        if seconds <= left:
+          taken.append(item)
+          left -= seconds
+          continue
+        held.add(item[0])
+      kept.append(item)
+    for item in kept:
+      heapq.heappush(self.queue, item)
+    return taken
+
+  ## Returns how many entries each pass would carry until the queue is
+  ## empty, without sending or changing the queue
+  def plan(self, passes):
+    queue = list(self.queue)
+    counts = []
+    for contact in passes:
+      if not self.queue:
+        break
+      counts.append(len(self.take(contact)))
+    self.queue = queue
+    heapq.heapify(self.queue)
+    return counts
+
+  ## Sends the queue over serial_port pass by pass, waiting for each AOS on
+  ## clock (a timesync.GroundClock); commands follow each other without
+  ## pauses. A command that fails or would run past LOS goes back in the
+  ## queue with the rest of its priority. Returns the number of passes used
+  def run(self, serial_port, passes, clock):
+    used = 0
+    for contact in passes:
+      if not self.queue:
+        break
+      if contact.t_los <= clock.now_ns():
+        continue
+      taken = self.take(contact)
+      wait = (contact.t_aos+self.budget.margin*SECOND_NS-clock.now_ns())/\
+             SECOND_NS
+      if wait > 0:
+        time.sleep(wait)
+      t_end = contact.t_los-int(self.budget.margin*SECOND_NS)
+      used += 1
+      held = set()
+      for item in taken:
+        if item[0] in held:
+          heapq.heappush(self.queue, item)
+          continue
+        cmd = build(item[2])
+        if clock.now_ns()+self.budget.seconds(cmd)*SECOND_NS > t_end:
+          held.add(item[0])
+          heapq.heappush(self.queue, item)
+          continue
+        self.rx_cmd_buff.clear()
+        if transport.transact(\
+            serial_port, cmd, self.rx_cmd_buff, self.tracer, self.timeout\
+           ):
+          self.sent += 1
+        else:
+          self.failed += 1
+          held.add(item[0])
+          heapq.heappush(self.queue, item)
+    return used
@@ -0,0 +1,292 @@
+# sgp4.py
+# SGP4 orbit propagation vectorized over TLEs and times (requires NumPy)
+
+# import Python modules
+import numpy # element arrays and broadcast propagation
+
+# "constants"
+
+## WGS-72 gravity model, as used to generate TLEs
+MU    = 398600.8                       # km^3/s^2
+RE    = 6378.135                       # km
+XKE   = 60.0/numpy.sqrt(RE*RE*RE/MU)   # sqrt(mu), earth radii^1.5 per minute
+J2    = 0.001082616
+J3    = -0.00000253881
+J4    = -0.00000165597
+J3OJ2 = J3/J2
+VKMPS = RE*XKE/60.0                    # km/s per earth radius per minute
+
+## Orbits with a longer period need the deep-space SDP4 terms
+DEEP_SPACE_MINUTES = 225.0
+
+## Error codes, as in the reference implementation
+ERROR_NONE         = 0
+ERROR_ECCENTRICITY = 1 # mean eccentricity out of range
+ERROR_SEMI_LATUS   = 4 # semi-latus rectum below zero
+ERROR_DECAYED      = 6 # orbit has decayed
+
+## Kepler equation iterations; each converges well within this for LEO
+KEPLER_ITERATIONS = 10
+
+## Nanoseconds per minute
+MINUTE_NS = 60*1000000000
+
+# helper functions
+
+## Returns a TLE exponent field such as ' 51582-3' as a float
+def exp_field(field):
+  return float(field[0]+'.'+field[1:6])*10.0**int(field[6:8])
+
+## Returns minutes since each TLE epoch for J2000 nanosecond times t_ns:
+## shape (n,m) for t_ns of shape (m,) or (n,m), or, given rows, minutes since
+## the epoch of TLE rows[i] for each t_ns[i]
+def minutes_since(elements, t_ns, rows=None):
+  t_ns = numpy.asarray(t_ns, dtype=numpy.int64)
+  if rows is not None:
+    return (t_ns-elements.epoch_ns[rows])/MINUTE_NS
+  return (t_ns-elements.epoch_ns[:,None])/MINUTE_NS
+
+## Returns the distance between expected and reported positions (or
+## velocities) along the last axis
+def errors(expected, reported):
+  return numpy.linalg.norm(numpy.asarray(reported)-expected, axis=-1)
+
+# classes
+
+## SGP4 mean elements and initialized coefficients for n TLEs, one array
+## element per TLE. Only near-earth orbits (period under 225 minutes) are
+## supported; a deep-space TLE raises ValueError
+class Elements:
+  def __init__(self, tles):
+    self.norads = numpy.array([t.norad for t in tles])
+    self.epoch_ns = numpy.array([t.epoch_ns for t in tles], dtype=numpy.int64)
+    deg = numpy.pi/180.0
+    self.bstar = numpy.array([exp_field(t.line1[53:61]) for t in tles])
+    self.inclo = numpy.array([float(t.line2[8:16]) for t in tles])*deg
+    self.nodeo = numpy.array([float(t.line2[17:25]) for t in tles])*deg
+    self.ecco = numpy.array([float('.'+t.line2[26:33]) for t in tles])
+    self.argpo = numpy.array([float(t.line2[34:42]) for t in tles])*deg
+    self.mo = numpy.array([float(t.line2[43:51]) for t in tles])*deg
+    self.no_kozai = numpy.array([float(t.line2[52:63]) for t in tles])*\
+                    (2.0*numpy.pi/1440.0)
+    self.init()
+
+  ## Computes the propagation coefficients of every TLE at once
+  def init(self):
+    ecco = self.ecco
+    inclo = self.inclo
+    # recover the original mean motion and semi-major axis
+    eccsq = ecco*ecco
+    omeosq = 1.0-eccsq
+    rteosq = numpy.sqrt(omeosq)
+    cosio = numpy.cos(inclo)
+    cosio2 = cosio*cosio
+    ak = (XKE/self.no_kozai)**(2.0/3.0)
+    d1 = 0.75*J2*(3.0*cosio2-1.0)/(rteosq*omeosq)
+    delta = d1/(ak*ak)
+    adel = ak*(1.0-delta*delta-delta*(1.0/3.0+134.0*delta*delta/81.0))
+    delta = d1/(adel*adel)
+    no = self.no_kozai/(1.0+delta)
+    if numpy.any(2.0*numpy.pi/no >= DEEP_SPACE_MINUTES):
+      raise ValueError('deep-space TLEs are not supported: '+', '.join(\
+       str(n) for n in self.norads[2.0*numpy.pi/no >= DEEP_SPACE_MINUTES]\
+      ))
+    ao = (XKE/no)**(2.0/3.0)
+    sinio = numpy.sin(inclo)
+    po = ao*omeosq
+    con42 = 1.0-5.0*cosio2
+    con41 = -con42-cosio2-cosio2
+    posq = po*po
+    rp = ao*(1.0-ecco)
+    # perigee-dependent atmosphere parameters
+    simple = rp < 220.0/RE+1.0
+    perige = (rp-1.0)*RE
+    sfour = numpy.where(perige < 98.0, 20.0, perige-78.0)
+    sfour = numpy.where(perige < 156.0, sfour, 78.0)
+    qzms24 = ((120.0-sfour)/RE)**4
+    sfour = sfour/RE+1.0
+    # secular and drag coefficients
+    pinvsq = 1.0/posq
+    tsi = 1.0/(ao-sfour)
+    eta = ao*ecco*tsi
+    etasq = eta*eta
+    eeta = ecco*eta
+    psisq = numpy.abs(1.0-etasq)
+    coef = qzms24*tsi**4
+    coef1 = coef/psisq**3.5
+    cc2 = coef1*no*(ao*(1.0+1.5*etasq+eeta*(4.0+etasq))+\
+          0.375*J2*tsi/psisq*con41*(8.0+3.0*etasq*(8.0+etasq)))
+    cc1 = self.bstar*cc2
+    eccentric = ecco > 1.0e-4
+    cc3 = numpy.where(eccentric,\
+     -2.0*coef*tsi*J3OJ2*no*sinio/numpy.where(eccentric, ecco, 1.0), 0.0)
+    x1mth2 = 1.0-cosio2
+    cc4 = 2.0*no*coef1*ao*omeosq*(eta*(2.0+0.5*etasq)+ecco*(0.5+2.0*etasq)-\
+          J2*tsi/(ao*psisq)*(-3.0*con41*(1.0-2.0*eeta+etasq*(1.5-0.5*eeta))+\
+          0.75*x1mth2*(2.0*etasq-eeta*(1.0+etasq))*numpy.cos(2.0*self.argpo)))
+    cc5 = 2.0*coef1*ao*omeosq*(1.0+2.75*(etasq+eeta)+eeta*etasq)
+    cosio4 = cosio2*cosio2
+    temp1 = 1.5*J2*pinvsq*no
+    temp2 = 0.5*temp1*J2*pinvsq
+    temp3 = -0.46875*J4*pinvsq*pinvsq*no
+    self.mdot = no+0.5*temp1*rteosq*con41+\
+                0.0625*temp2*rteosq*(13.0-78.0*cosio2+137.0*cosio4)
+    self.argpdot = -0.5*temp1*con42+\
+                   0.0625*temp2*(7.0-114.0*cosio2+395.0*cosio4)+\
+                   temp3*(3.0-36.0*cosio2+49.0*cosio4)
+    xhdot1 = -temp1*cosio
+    self.nodedot = xhdot1+(0.5*temp2*(4.0-19.0*cosio2)+\
+                   2.0*temp3*(3.0-7.0*cosio2))*cosio
+    self.omgcof = self.bstar*cc3*numpy.cos(self.argpo)
+    self.xmcof = numpy.where(eccentric,\
+     -(2.0/3.0)*coef*self.bstar/numpy.where(eccentric, eeta, 1.0), 0.0)
+    self.nodecf = 3.5*omeosq*xhdot1*cc1
+    self.t2cof = 1.5*cc1
+    self.xlcof = -0.25*J3OJ2*sinio*(3.0+5.0*cosio)/numpy.where(\
+     numpy.abs(cosio+1.0) > 1.5e-12, 1.0+cosio, 1.5e-12\
+    )
+    self.aycof = -0.5*J3OJ2*sinio
+    self.delmo = (1.0+eta*numpy.cos(self.mo))**3
+    self.sinmao = numpy.sin(self.mo)
+    self.x7thm1 = 7.0*cosio2-1.0
+    # higher-order drag terms, left out for perigees under 220 km
+    cc1sq = cc1*cc1
+    d2 = 4.0*ao*tsi*cc1sq
+    temp = d2*tsi*cc1/3.0
+    d3 = (17.0*ao+sfour)*temp
+    d4 = 0.5*temp*ao*tsi*(221.0*ao+31.0*sfour)*cc1
+    full = ~simple
+    self.d2 = d2*full
+    self.d3 = d3*full
+    self.d4 = d4*full
+    self.t3cof = (d2+2.0*cc1sq)*full
+    self.t4cof = 0.25*(3.0*d3+cc1*(12.0*d2+10.0*cc1sq))*full
+    self.t5cof = 0.2*(3.0*d4+12.0*cc1*d3+6.0*d2*d2+\
+                 15.0*cc1sq*(2.0*d2+cc1sq))*full
+    self.omgcof = self.omgcof*full
+    self.xmcof = self.xmcof*full
+    self.cc5 = cc5*full
+    self.cc1 = cc1
+    self.cc4 = cc4
+    self.eta = eta
+    self.no = no
+    self.con41 = con41
+    self.x1mth2 = x1mth2
+    self.cosio = cosio
+    self.sinio = sinio
+
+  def __len__(self):
+    return len(self.norads)
+
+  ## Propagates every TLE to tsince minutes from its epoch; tsince has shape
+  ## (n,m), or (m,) for the same offsets for every TLE. Returns positions (km)
+  ## and velocities (km/s) in the TEME frame with shape (n,m,3), and error
+  ## codes with shape (n,m); positions and velocities are NaN where the code
+  ## is not ERROR_NONE. Given rows instead, propagates TLE rows[i] to
+  ## tsince[i] and the leading shape is that of tsince
+  def propagate(self, tsince, rows=None):
+    t = numpy.atleast_1d(numpy.asarray(tsince, dtype=float))
+    if rows is None:
+      t = numpy.broadcast_to(t, (len(self), t.shape[-1]))
+      c = lambda name: getattr(self, name)[:,None]
+    else:
+      c = lambda name: getattr(self, name)[rows]
+    twopi = 2.0*numpy.pi
+    # secular gravity and atmospheric drag
+    xmdf = c('mo')+c('mdot')*t
+    argpdf = c('argpo')+c('argpdot')*t
+    nodedf = c('nodeo')+c('nodedot')*t
+    t2 = t*t
+    nodem = nodedf+c('nodecf')*t2
+    delomg = c('omgcof')*t
+    delm = c('xmcof')*((1.0+c('eta')*numpy.cos(xmdf))**3-c('delmo'))
+    mm = xmdf+delomg+delm
+    argpm = argpdf-delomg-delm
+    t3 = t2*t
+    t4 = t3*t
+    tempa = 1.0-c('cc1')*t-c('d2')*t2-c('d3')*t3-c('d4')*t4
+    tempe = c('bstar')*c('cc4')*t+\
+            c('bstar')*c('cc5')*(numpy.sin(mm)-c('sinmao'))
+    templ = c('t2cof')*t2+c('t3cof')*t3+t4*(c('t4cof')+t*c('t5cof'))
+    error = numpy.zeros(t.shape, dtype=numpy.int8)
+    nm = numpy.broadcast_to(c('no'), t.shape)
+    am = (XKE/nm)**(2.0/3.0)*tempa*tempa
+    nm = XKE/am**1.5
+    em = c('ecco')-tempe
+    error[(em >= 1.0)|(em < -0.001)] = ERROR_ECCENTRICITY
+    em = numpy.maximum(em, 1.0e-6)
+    mm = mm+c('no')*templ
+    xlm = mm+argpm+nodem
+    nodem = numpy.fmod(nodem, twopi)
+    argpm = numpy.fmod(argpm, twopi)
+    xlm = numpy.fmod(xlm, twopi)
+    mm = numpy.fmod(xlm-argpm-nodem, twopi)
+    # long-period periodics
+    axnl = em*numpy.cos(argpm)
+    temp = 1.0/(am*(1.0-em*em))
+    aynl = em*numpy.sin(argpm)+temp*c('aycof')
+    xl = mm+argpm+nodem+temp*c('xlcof')*axnl
+    # Kepler's equation
+    u = numpy.fmod(xl-nodem, twopi)
+    eo1 = u
+    for i in range(0,KEPLER_ITERATIONS):
+      sineo1 = numpy.sin(eo1)
+      coseo1 = numpy.cos(eo1)
+      tem5 = (u-aynl*coseo1+axnl*sineo1-eo1)/\
+             (1.0-coseo1*axnl-sineo1*aynl)
+      eo1 = eo1+numpy.clip(tem5, -0.95, 0.95)
+    sineo1 = numpy.sin(eo1)
+    coseo1 = numpy.cos(eo1)
+    # short-period periodics
+    ecose = axnl*coseo1+aynl*sineo1
+    esine = axnl*sineo1-aynl*coseo1
+    el2 = axnl*axnl+aynl*aynl
+    pl = am*(1.0-el2)
+    error[(error == ERROR_NONE)&(pl < 0.0)] = ERROR_SEMI_LATUS
+    pl = numpy.abs(pl)
+    rl = am*(1.0-ecose)
+    rdotl = numpy.sqrt(am)*esine/rl
+    rvdotl = numpy.sqrt(pl)/rl
+    betal = numpy.sqrt(numpy.abs(1.0-el2))
+    temp = esine/(1.0+betal)
+    sinu = am/rl*(sineo1-aynl-axnl*temp)
+    cosu = am/rl*(coseo1-axnl+aynl*temp)
+    su = numpy.arctan2(sinu, cosu)
+    sin2u = (cosu+cosu)*sinu
+    cos2u = 1.0-2.0*sinu*sinu
+    temp = 1.0/pl
+    temp1 = 0.5*J2*temp
+    temp2 = temp1*temp
+    mrt = rl*(1.0-1.5*temp2*betal*c('con41'))+\
+          0.5*temp1*c('x1mth2')*cos2u
+    su = su-0.25*temp2*c('x7thm1')*sin2u
+    xnode = nodem+1.5*temp2*c('cosio')*sin2u
+    xinc = c('inclo')+1.5*temp2*c('cosio')*c('sinio')*cos2u
+    mvt = rdotl-nm*temp1*c('x1mth2')*sin2u/XKE
+    rvdot = rvdotl+nm*temp1*(c('x1mth2')*cos2u+1.5*c('con41'))/XKE
+    error[(error == ERROR_NONE)&(mrt < 1.0)] = ERROR_DECAYED
+    # orientation vectors
+    sinsu = numpy.sin(su)
+    cossu = numpy.cos(su)
+    snod = numpy.sin(xnode)
+    cnod = numpy.cos(xnode)
+    sini = numpy.sin(xinc)
+    cosi = numpy.cos(xinc)
+    xmx = -snod*cosi
+    xmy = cnod*cosi
+    uvec = numpy.stack(\
+     (xmx*sinsu+cnod*cossu, xmy*sinsu+snod*cossu, sini*sinsu), axis=-1\
+    )
+    vvec = numpy.stack(\
+     (xmx*cossu-cnod*sinsu, xmy*cossu-snod*sinsu, sini*cossu), axis=-1\
+    )
+    r = (mrt*RE)[...,None]*uvec
+    v = (mvt[...,None]*uvec+rvdot[...,None]*vvec)*VKMPS
+    r[error != ERROR_NONE] = numpy.nan
+    v[error != ERROR_NONE] = numpy.nan
+    return r, v, error
+
+  ## Propagates to J2000 nanosecond board times t_ns (shape (m,) or (n,m),
+  ## or matching rows); returns as propagate
+  def at(self, t_ns, rows=None):
+    return self.propagate(minutes_since(self, t_ns, rows), rows)
@@ -0,0 +1,176 @@
+# telem.py
+# Declarative APP_TELEM schema, struct-based decoding and a columnar store
+# of decoded records (requires NumPy)
+
+# import Python modules
+import numpy  # structured arrays for the columnar store
+import struct # precompiled little-endian unpacking
+
+# import shared TAOLST modules
+from taolst.protocol import * # TAOLST constants and RxCmdBuff
+
+# "constants"
+
+## APP_TELEM payload length (MSG_LEN 0x54 less the 6-byte header)
+TELEM_LEN = 0x54-0x06
+
+## struct format characters allowed in a schema and their NumPy equivalents
+FIELD_TYPES = {
+ 'b': '<i1', 'B': '<u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4',
+ 'q': '<i8', 'Q': '<u8', 'f': '<f4', 'd': '<f8'
+}
+
+## Store columns recorded with every decoded record
+STORE_COLUMNS = [('t_rx', '<f8'), ('hw_id', '<u2')]
+
+## Initial store capacity in records; the store doubles when full
+STORE_CAPACITY = 1024
+
+## Default schema: the APP_TELEM field layout is not fixed by the protocol
+## documentation, so every payload is kept as 39 raw 16-bit words until a
+## flight schema is loaded with Schema.from_csv
+DEFAULT_FIELDS = [\
+ ('word_{:02d}'.format(i), 2*i, 'H', None, '') for i in range(0,TELEM_LEN//2)\
+]
+
+# classes
+
+## Telemetry layout: a list of (name, byte offset, struct format character,
+## scale, units) fields; a field with a scale is decoded as raw*scale, one
+## without keeps its raw integer value
+class Schema:
+  def __init__(self, fields):
+    fields = sorted(fields, key=lambda field: field[1])
+    fmt = '<'
+    position = 0
+    for name, offset, ftype, scale, units in fields:
+      if ftype not in FIELD_TYPES:
+        raise ValueError('field '+name+': unknown type '+ftype)
+      if offset < position:
+        raise ValueError('field '+name+': overlaps the previous field')
+      fmt += 'x'*(offset-position)+ftype
+      position = offset+struct.calcsize('<'+ftype)
+    if position > TELEM_LEN:
+      raise ValueError('schema is {:d} bytes, longer than {:d}'.format(\
+       position, TELEM_LEN\
+      ))
+    self.fields = fields
+    self.names = [field[0] for field in fields]
+    self.struct = struct.Struct(fmt)
+    self.scales = [\
+     (i, field[3]) for i, field in enumerate(fields) if field[3] is not None\
+    ]
+
+  ## Reads fields from a CSV file with lines "name,offset,type,scale,units";
+  ## scale and units may be empty and lines starting with # are skipped
+  @classmethod
+  def from_csv(cls, path):
+    fields = []
+    with open(path, 'r') as infile:
+      for line in infile:
+        line = line.strip()
+        if not line or line.startswith('#'):
+          continue
+        cols = [col.strip() for col in line.split(',')]+['','']
+        scale = float(cols[3]) if cols[3] else None
+        fields.append((cols[0], int(cols[1],0), cols[2], scale, cols[4]))
+    return cls(fields)
+
+  ## Returns the decoded field values of one payload as a list
+  def decode(self, payload, offset=0):
+    values = list(self.struct.unpack_from(payload, offset))
+    for i, scale in self.scales:
+      values[i] = values[i]*scale
+    return values
+
+  ## Returns the APP_TELEM payload bytes for decoded field values
+  def encode(self, values):
+    values = list(values)
+    for i, scale in self.scales:
+      if self.fields[i][2] in 'fd':
+        values[i] = values[i]/scale
+      else:
+        values[i] = int(round(values[i]/scale))
+    return self.struct.pack(*values).ljust(TELEM_LEN, b'\x00')
+
+  ## Returns name=value pairs with units for one payload
+  def to_str(self, payload):
+    s = ''
+    for field, value in zip(self.fields, self.decode(payload)):
+      s += ' '+field[0]+'='+str(value)+field[4]
+    return s[1:]
+
+  ## Returns the NumPy dtype of decoded records, prefixed by STORE_COLUMNS
+  def dtype(self):
+    columns = list(STORE_COLUMNS)
+    for name, offset, ftype, scale, units in self.fields:
+      columns.append((name, '<f8' if scale is not None else FIELD_TYPES[ftype]))
+    return numpy.dtype(columns)
+
+  ## Returns the NumPy dtype that views one raw payload in place
+  def raw_dtype(self):
+    return numpy.dtype({\
+     'names':   self.names,\
+     'formats': [FIELD_TYPES[field[2]] for field in self.fields],\
+     'offsets': [field[1] for field in self.fields],\
+     'itemsize': TELEM_LEN\
+    })
+
+## Growable structured array of decoded telemetry records, one column per
+## field; save and load use the .npy format so a long archive can be opened
+## memory-mapped and queried by column without re-parsing frames
+class TelemStore:
+  def __init__(self, schema, capacity=STORE_CAPACITY):
+    self.schema = schema
+    self.records = numpy.zeros(capacity, dtype=schema.dtype())
+    self.count = 0
+
+  def reserve(self, count):
+    if count > len(self.records):
+      records = numpy.zeros(\
+       max(count,2*len(self.records)), dtype=self.records.dtype\
+      )
+      records[0:self.count] = self.records[0:self.count]
+      self.records = records
+
+  def append_payload(self, payload, t_rx, hw_id):
+    self.reserve(self.count+1)
+    self.records[self.count] = \
+     tuple([t_rx, hw_id]+self.schema.decode(payload))
+    self.count += 1
+
+  def append_cmd(self, rx_cmd_buff, t_rx):
+    if rx_cmd_buff.state == RxCmdBuffState.COMPLETE and \
+       rx_cmd_buff.data[OPCODE_INDEX] == APP_TELEM_OPCODE and \
+       rx_cmd_buff.data[MSG_LEN_INDEX]-0x06 == TELEM_LEN:
+      data = rx_cmd_buff.data
+      self.append_payload(\
+       bytes(data[DATA_START_INDEX:DATA_START_INDEX+TELEM_LEN]), t_rx,\
+       (data[HWID_MSB_INDEX]<<8)|data[HWID_LSB_INDEX]\
+      )
+
+  ## Decodes many concatenated payloads at once, e.g. a capture file
+  def append_block(self, payloads, t_rx, hw_id):
+    raw = numpy.frombuffer(payloads, dtype=self.schema.raw_dtype())
+    self.reserve(self.count+len(raw))
+    block = self.records[self.count:self.count+len(raw)]
+    block['t_rx'] = t_rx
+    block['hw_id'] = hw_id
+    for name, offset, ftype, scale, units in self.schema.fields:
+      block[name] = raw[name] if scale is None else raw[name]*scale
+    self.count += len(raw)
+
+  ## Returns the stored records; a view, valid until the next append
+  def view(self):
+    return self.records[0:self.count]
+
+  def save(self, path):
+    numpy.save(path, self.view())
+
+  ## Returns the records of a saved store, memory-mapped read-only
+  @staticmethod
+  def load(path):
+    return numpy.load(path, mmap_mode='r')
+
+  def __len__(self):
+    return self.count
@@ -0,0 +1,169 @@
+# timesync.py
+# NTP-style board clock synchronization over APP_GET_TIME and APP_SET_TIME
+
+# import Python modules
+import time # perf_counter_ns, time_ns
+
+# import shared TAOLST modules
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+# "constants"
+
+## Defaults
+DEFAULT_SAMPLES = 8   # APP_GET_TIME round trips per estimate
+DEFAULT_TIMEOUT = 1.0 # seconds to wait for each reply
+DEFAULT_ROUNDS  = 2   # APP_SET_TIME commands per sync
+
+# helper functions
+
+## Returns the board time (J2000 nanoseconds) carried by an APP_SET_TIME
+## command, the reply to APP_GET_TIME
+def board_time_ns(data):
+  sec = (data[DATA_START_INDEX+3]<<24)|(data[DATA_START_INDEX+2]<<16)|\
+        (data[DATA_START_INDEX+1]<< 8)|(data[DATA_START_INDEX+0]<< 0)
+  ns  = (data[DATA_START_INDEX+7]<<24)|(data[DATA_START_INDEX+6]<<16)|\
+        (data[DATA_START_INDEX+5]<< 8)|(data[DATA_START_INDEX+4]<< 0)
+  return sec*1000000000+ns
+
+# classes
+
+## Ground clock in J2000 nanoseconds: the wall clock is read once and
+## perf_counter_ns measures from there, so a wall clock step during a sync
+## does not corrupt the round trips
+class GroundClock:
+  def __init__(self):
+    self.anchor = time.time_ns()-J2000_UNIX_NS
+    self.anchor_perf = time.perf_counter_ns()
+
+  def now_ns(self):
+    return self.anchor+time.perf_counter_ns()-self.anchor_perf
+
+## One APP_GET_TIME round trip: ground send and receive times t0 and t3 and
+## the board time read in between (J2000 nanoseconds)
+class TimeSample:
+  def __init__(self, t0, board, t3):
+    self.t0 = t0
+    self.board = board
+    self.t3 = t3
+
+  def rtt_ns(self):
+    return self.t3-self.t0
+
+  ## Board minus ground time, assuming a symmetric link
+  def offset_ns(self):
+    return self.board-(self.t0+self.t3)//2
+
+## Measures and sets one board's clock. Each estimate takes several samples
+## and keeps the one with the smallest round trip, the NTP clock filter: its
+## midpoint assumption has the smallest possible error, at most rtt/2.
+## APP_SET_TIME is built just before it is written, with the time the board
+## will have received it: now plus the estimated one-way latency. Message
+## IDs count up from msg_id, or come from allocator (a msgid.MsgIdAllocator)
+## if given.
+class TimeSync:
+  def __init__(self, serial_port, hw_id, src, dst, msg_id=0x0000,\
+               samples=DEFAULT_SAMPLES, timeout=DEFAULT_TIMEOUT,\
+               allocator=None):
+    self.serial_port = serial_port
+    self.hw_id = hw_id
+    self.src = src
+    self.dst = dst
+    self.msg_id = msg_id
+    self.samples = samples
+    self.timeout = timeout
+    self.allocator = allocator
+    self.clock = GroundClock()
+    self.rx_cmd_buff = RxCmdBuff()
+
+  def next_msg_id(self):
+    if self.allocator is not None:
+      return self.allocator.allocate(self.dst)
+    msg_id = self.msg_id
+    self.msg_id = (self.msg_id+1)&0xffff
+    return msg_id
+
+  ## Returns one TimeSample, or None on a timeout or if the board time is not
+  ## set (the board replies common_nack)
+  def sample(self):
+    cmd = TxCmd(APP_GET_TIME_OPCODE, self.hw_id, self.next_msg_id(),\
+                self.src, self.dst)
+    frame = bytes(cmd.data[0:cmd.get_byte_count()])
+    self.rx_cmd_buff.clear()
+    t0 = self.clock.now_ns()
+    ok = transport.exchange(\
+     self.serial_port, frame, self.rx_cmd_buff, self.timeout\
+    )
+    t3 = self.clock.now_ns()
+    if not ok or self.rx_cmd_buff.data[OPCODE_INDEX] != APP_SET_TIME_OPCODE:
+      return None
+    return TimeSample(t0, board_time_ns(self.rx_cmd_buff.data), t3)
+
+  ## Returns the sample with the smallest round trip out of samples tries,
+  ## or None if none succeeded
+  def measure(self):
+    best = None
+    for i in range(0,self.samples):
+      sample = self.sample()
+      if sample is not None and \
+         (best is None or sample.rtt_ns() < best.rtt_ns()):
+        best = sample
+    return best
+
+  ## Returns the smallest common_ack round trip out of samples tries, for
+  ## when the board time is not set yet; 0 if none succeeded
+  def ack_rtt_ns(self):
+    best = 0
+    for i in range(0,self.samples):
+      cmd = TxCmd(COMMON_ACK_OPCODE, self.hw_id, self.next_msg_id(),\
+                  self.src, self.dst)
+      frame = bytes(cmd.data[0:cmd.get_byte_count()])
+      self.rx_cmd_buff.clear()
+      t0 = self.clock.now_ns()
+      ok = transport.exchange(\
+       self.serial_port, frame, self.rx_cmd_buff, self.timeout\
+      )
+      rtt = self.clock.now_ns()-t0
+      if ok and (best == 0 or rtt < best):
+        best = rtt
+    return best
+
+  ## Sets the board clock to ground time, compensated by latency_ns;
+  ## returns True when the board acknowledges
+  def set_time(self, latency_ns):
+    cmd = TxCmd(APP_SET_TIME_OPCODE, self.hw_id, self.next_msg_id(),\
+                self.src, self.dst)
+    t = self.clock.now_ns()+latency_ns
+    cmd.app_set_time(sec=t//1000000000, ns=t%1000000000)
+    frame = bytes(cmd.data[0:cmd.get_byte_count()])
+    self.rx_cmd_buff.clear()
+    ok = transport.exchange(\
+     self.serial_port, frame, self.rx_cmd_buff, self.timeout\
+    )
+    return ok and self.rx_cmd_buff.data[OPCODE_INDEX] == COMMON_ACK_OPCODE
+
+  ## Sets the board clock and returns (offset before, one-way latency,
+  ## residual offset after) in nanoseconds. After each set, the offset is
+  ## measured again and folded into the latency of the next set, which
+  ## removes the error from the uplink and downlink frames having different
+  ## lengths; rounds sets are sent at most. The offset before is None if the
+  ## board time was not set and the residual is None if it cannot be measured
+  def sync(self, rounds=DEFAULT_ROUNDS):
+    before = self.measure()
+    if before is not None:
+      latency_ns = before.rtt_ns()//2
+    else:
+      latency_ns = self.ack_rtt_ns()//2
+    after = None
+    for i in range(0,rounds):
+      if after is not None:
+        latency_ns -= after.offset_ns()
+      if not self.set_time(latency_ns):
+        break
+      after = self.measure()
+      if after is None:
+        break
+    return \
+     before.offset_ns() if before is not None else None,\
+     latency_ns,\
+     after.offset_ns() if after is not None else None
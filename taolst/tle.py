@@ -0,0 +1,258 @@
+# tle.py
+# Two-line element sets: catalog loading, validation and COMMON_ASCII uplink
+
+# import Python modules
+import json # persisted acknowledged epochs
+import os   # paths
+
+# import shared TAOLST modules
+from taolst import transport # command round trips
+from taolst.protocol import * # TAOLST constants, TxCmd and RxCmdBuff
+
+# "constants"
+
+## TLE line and name lengths
+LINE_LEN = 69
+NAME_LEN = 24
+
+## COMMON_ASCII prefix of a TLE uplink, followed by the name padded to
+## NAME_LEN and both lines
+ASCII_PREFIX = 'TLE'
+
+## Defaults
+DEFAULT_TIMEOUT = 1.0 # seconds to wait for the board to acknowledge
+
+## Persisted acknowledged epochs file name for a HWID
+ACK_FILE = 'tle-{:04x}.json'
+
+## Nanoseconds per day
+DAY_NS = 86400*1000000000
+
+# helper functions
+
+## Returns the checksum of a TLE line: the sum of its digits, counting each
+## minus sign as 1, modulo 10, over all but the last column
+def checksum(line):
+  total = 0
+  for c in line[0:LINE_LEN-1]:
+    if '0'<=c<='9':
+      total += ord(c)-ord('0')
+    elif c == '-':
+      total += 1
+  return total%10
+
+## Returns True if a TLE line has the right length and checksum
+def valid_line(line, number):
+  return len(line) == LINE_LEN and line[0] == number and \
+         line[LINE_LEN-1].isdigit() and checksum(line) == int(line[LINE_LEN-1])
+
+## Returns the days from 1970-01-01 to January 1 of a year
+def days_before_year(year):
+  return 365*(year-1970)+(year-1969)//4-(year-1901)//100+(year-1601)//400
+
+## Returns the epoch of a TLE line 1 in J2000 nanoseconds; the two-digit year
+## means 1957 to 2056
+def epoch_ns(line1):
+  year = int(line1[18:20])
+  year += 2000 if year < 57 else 1900
+  day, frac = line1[20:32].strip().split('.')
+  unix_ns = (days_before_year(year)+int(day)-1)*DAY_NS+\
+            int(frac)*DAY_NS//10**len(frac)
+  return unix_ns-J2000_UNIX_NS
+
+## Returns the catalog files at path: path itself, or the files in it if it
+## is a directory
+def catalog_paths(path):
+  if os.path.isdir(path):
+    return [os.path.join(path,name) for name in sorted(os.listdir(path))]
+  return [path]
+
+## Returns the persisted acknowledged epochs path for a HWID in directory
+def ack_path(directory, hw_id):
+  return os.path.join(directory, ACK_FILE.format(hw_id))
+
+# classes
+
+## One element set; raises ValueError if either line is malformed or fails
+## its checksum, or if the lines are for different satellites
+class Tle:
+  def __init__(self, name, line1, line2):
+    line1 = line1.rstrip()
+    line2 = line2.rstrip()
+    if not valid_line(line1, '1'):
+      raise ValueError('bad TLE line 1: '+line1)
+    if not valid_line(line2, '2'):
+      raise ValueError('bad TLE line 2: '+line2)
+    if line1[2:7] != line2[2:7]:
+      raise ValueError('TLE lines for different satellites: '+line1[2:7]+\
+                       ', '+line2[2:7])
+    self.name = name.strip()
+    self.line1 = line1
+    self.line2 = line2
+    self.norad = int(line1[2:7])
+    self.epoch_ns = epoch_ns(line1)
+
+  ## Returns the COMMON_ASCII payload that uplinks this TLE
+  def ascii(self):
+    return ASCII_PREFIX+self.name[0:NAME_LEN].ljust(NAME_LEN)+\
+           self.line1+self.line2
+
+  def __str__(self):
+    return self.name+'\n'+self.line1+'\n'+self.line2
+
+## TLEs indexed by NORAD ID and epoch. Catalog files hold two-line or
+## three-line (with a name line) entries; entries with a bad checksum are
+## counted and skipped
+class Catalog:
+  def __init__(self):
+    self.tles = {} # NORAD ID -> {epoch_ns -> Tle}
+    self.rejected = 0
+
+  def add(self, tle):
+    self.tles.setdefault(tle.norad, {})[tle.epoch_ns] = tle
+
+  ## Adds the TLEs in the lines of a catalog; returns how many were added
+  def add_lines(self, lines):
+    added = 0
+    name = ''
+    line1 = None
+    for line in lines:
+      line = line.rstrip()
+      if not line:
+        continue
+      if line[0] == '1' and len(line) == LINE_LEN:
+        line1 = line
+      elif line[0] == '2' and len(line) == LINE_LEN and line1 is not None:
+        try:
+          self.add(Tle(name, line1, line))
+          added += 1
+        except ValueError:
+          self.rejected += 1
+        name = ''
+        line1 = None
+      else:
+        if line1 is not None:
+          self.rejected += 1
+        name = line[2:] if line.startswith('0 ') else line
+        line1 = None
+    return added
+
+  ## Loads a catalog file; returns how many TLEs were added
+  def load(self, path):
+    with open(path, 'r') as infile:
+      return self.add_lines(infile)
+
+  def __len__(self):
+    return sum(len(by_epoch) for by_epoch in self.tles.values())
+
+  def norads(self):
+    return sorted(self.tles)
+
+  ## Returns the TLEs of a NORAD ID ordered by epoch
+  def history(self, norad):
+    by_epoch = self.tles.get(norad, {})
+    return [by_epoch[epoch] for epoch in sorted(by_epoch)]
+
+  ## Returns the TLE with the latest epoch for a NORAD ID, or None
+  def freshest(self, norad):
+    by_epoch = self.tles.get(norad)
+    if not by_epoch:
+      return None
+    return by_epoch[max(by_epoch)]
+
+## Uplinks TLEs to one board as COMMON_ASCII. Each frame is built once per
+## TLE and cached; sends only patch in the message ID. The epoch the board
+## last acknowledged for each NORAD ID is persisted to path, and a TLE that
+## is not newer is not sent again. Message IDs count up from msg_id, or come
+## from allocator (a msgid.MsgIdAllocator) if given.
+class Uplink:
+  def __init__(self, serial_port, hw_id, src, dst, path=None, msg_id=0x0000,\
+               timeout=DEFAULT_TIMEOUT, allocator=None):
+    self.serial_port = serial_port
+    self.hw_id = hw_id
+    self.src = src
+    self.dst = dst
+    self.path = path
+    self.msg_id = msg_id
+    self.timeout = timeout
+    self.allocator = allocator
+    self.frames = {} # (NORAD ID, epoch_ns) -> encoded frame
+    self.acked = {}  # NORAD ID -> last acknowledged epoch_ns
+    self.rx_cmd_buff = RxCmdBuff()
+    self.sent = 0
+    self.skipped = 0
+    self.failed = 0
+    self.load()
+
+  def load(self):
+    if self.path is not None and os.path.exists(self.path):
+      with open(self.path, 'r') as infile:
+        model = json.load(infile)
+      self.acked = {int(norad): epoch for norad, epoch in\
+                    model['acked'].items()}
+
+  def save(self):
+    if self.path is not None:
+      with open(self.path, 'w') as outfile:
+        json.dump({'hw_id': self.hw_id, 'acked': self.acked}, outfile)
+
+  def next_msg_id(self):
+    if self.allocator is not None:
+      return self.allocator.allocate(self.dst)
+    msg_id = self.msg_id
+    self.msg_id = (self.msg_id+1)&0xffff
+    return msg_id
+
+  ## Returns the encoded frame of a TLE, building and caching it the first
+  ## time, with msg_id patched in
+  def frame(self, tle, msg_id):
+    key = (tle.norad, tle.epoch_ns)
+    frame = self.frames.get(key)
+    if frame is None:
+      cmd = TxCmd(COMMON_ASCII_OPCODE, self.hw_id, 0x0000, self.src, self.dst)
+      cmd.common_ascii(tle.ascii())
+      frame = bytes(cmd.data[0:cmd.get_byte_count()])
+      self.frames[key] = frame
+    frame = bytearray(frame)
+    frame[MSG_ID_LSB_INDEX] = msg_id&0xff
+    frame[MSG_ID_MSB_INDEX] = (msg_id>>8)&0xff
+    return frame
+
+  ## Returns True if the board has not acknowledged this or a later epoch
+  def needed(self, tle):
+    acked = self.acked.get(tle.norad)
+    return acked is None or tle.epoch_ns > acked
+
+  ## Sends a TLE unless it is not newer than the acknowledged one; returns
+  ## True if it was sent and acknowledged
+  def send(self, tle):
+    if not self.needed(tle):
+      self.skipped += 1
+      return False
+    frame = self.frame(tle, self.next_msg_id())
+    self.rx_cmd_buff.clear()
+    ok = transport.exchange(\
+     self.serial_port, frame, self.rx_cmd_buff, self.timeout\
+    )
+    self.sent += 1
+    if not ok or self.rx_cmd_buff.data[OPCODE_INDEX] != COMMON_ACK_OPCODE:
+      self.failed += 1
+      return False
+    self.acked[tle.norad] = tle.epoch_ns
+    self.save()
+    return True
+
+  ## Sends the freshest TLE in catalog of each NORAD ID in norads; returns
+  ## the NORAD IDs whose TLE the board acknowledged
+  def update(self, catalog, norads):
+    updated = []
+    for norad in norads:
+      tle = catalog.freshest(norad)
+      if tle is not None and self.send(tle):
+        updated.append(norad)
+    return updated
+
+  def __str__(self):
+    return '{:d} sent, {:d} skipped, {:d} failed'.format(\
+     self.sent, self.skipped, self.failed\
+    )
@@ -0,0 +1,185 @@
+# trace.py
+# Optional per-frame timing instrumentation for TAOLST round trips
+#
+# Usage: set TAOLST_TRACE=/path/to/trace.json before running a script. Each
+# TxCmd/reply round trip is timed per msg_id. At exit a Chrome trace (open in
+# chrome://tracing or https://ui.perfetto.dev) is written to the path and a
+# histogram summary is printed to stderr.
+
+# import Python modules
+import atexit      # dump trace at exit
+import collections # bounded span history
+import os          # environment variables
+import sys         # stderr
+import time        # perf_counter_ns
+
+# "constants"
+
+## Round trip phases, in order
+##  encode:   serialize the TxCmd into frame bytes
+##  transmit: write the frame to the link
+##  wait:     last byte written until first reply byte
+##  decode:   first reply byte until RxCmdBuff is complete
+PHASES = ('encode', 'transmit', 'wait', 'decode')
+
+## Histogram buckets are powers of two in microseconds: [0,1), [1,2), [2,4)...
+HIST_BUCKETS = 32
+
+## Chrome trace thread IDs used to separate ground, uplink and downlink time
+TID_GROUND   = 0
+TID_UPLINK   = 1
+TID_DOWNLINK = 2
+
+## Most recent FrameSpans kept for the Chrome trace, so a long run does not
+## grow without bound; the histograms count every frame
+MAX_SPANS = 100000
+
+## Environment variable that enables tracing
+TRACE_ENV = 'TAOLST_TRACE'
+
+# classes
+
+## Timestamps (perf_counter_ns) for one TxCmd/reply round trip
+class FrameSpan:
+  def __init__(self, msg_id, opcode):
+    self.msg_id = msg_id
+    self.opcode = opcode
+    self.t_start = time.perf_counter_ns()
+    self.t_encoded = 0
+    self.t_written = 0
+    self.t_first_rx = 0
+    self.t_complete = 0
+
+  def phase_bounds(self):
+    written = self.t_written if self.t_written else self.t_complete
+    first_rx = self.t_first_rx if self.t_first_rx else self.t_complete
+    return {
+     'encode':   (self.t_start,            self.t_encoded),
+     'transmit': (self.t_encoded,          written),
+     'wait':     (written,                 max(written, first_rx)),
+     'decode':   (first_rx,                self.t_complete)
+    }
+
+  def durations(self):
+    bounds = self.phase_bounds()
+    return {phase: bounds[phase][1]-bounds[phase][0] for phase in PHASES}
+
+## Latency histogram with power-of-two microsecond buckets, mean and max
+class LatencyHistogram:
+  def __init__(self):
+    self.buckets = [0]*HIST_BUCKETS
+    self.count = 0
+    self.total_ns = 0
+    self.max_ns = 0
+
+  def add(self, ns):
+    self.buckets[min((ns//1000).bit_length(), HIST_BUCKETS-1)] += 1
+    self.count += 1
+    self.total_ns += ns
+    self.max_ns = max(self.max_ns, ns)
+
+  ## Adds the latencies of another histogram, e.g. from another process
+  def merge(self, other):
+    for i in range(0,HIST_BUCKETS):
+      self.buckets[i] += other.buckets[i]
+    self.count += other.count
+    self.total_ns += other.total_ns
+    self.max_ns = max(self.max_ns, other.max_ns)
+
+  def mean_us(self):
+    return self.total_ns/self.count/1000 if self.count else 0.0
+
+  ## Returns the upper bound in microseconds of the bucket holding quantile q
+  ## (0 to 1) of the latencies
+  def quantile_us(self, q):
+    seen = 0
+    for i in range(0,HIST_BUCKETS):
+      seen += self.buckets[i]
+      if seen and seen >= q*self.count:
+        return 1<<i
+    return 0
+
+  ## Returns one line per nonempty bucket
+  def buckets_str(self):
+    s = ''
+    for i in range(0,HIST_BUCKETS):
+      if self.buckets[i]:
+        lo = 0 if i==0 else 1<<(i-1)
+        s += '          [{:>9d}, {:>9d}) us: {:d}\n'.format(\
+         lo, 1<<i, self.buckets[i]\
+        )
+    return s
+
+  def __str__(self):
+    return 'mean {:10.1f} us, max {:10.1f} us'.format(\
+     self.mean_us(), self.max_ns/1000\
+    )
+
+## Collects the last max_spans FrameSpans and per-phase latency histograms of
+## every frame
+class Tracer:
+  def __init__(self, max_spans=MAX_SPANS):
+    self.spans = collections.deque(maxlen=max_spans)
+    self.t0 = time.perf_counter_ns()
+    self.hist = {phase: LatencyHistogram() for phase in PHASES}
+
+  def begin(self, msg_id, opcode):
+    return FrameSpan(msg_id, opcode)
+
+  def end(self, span):
+    span.t_complete = time.perf_counter_ns()
+    for phase, ns in span.durations().items():
+      self.hist[phase].add(ns)
+    self.spans.append(span)
+
+  def histogram_str(self):
+    count = self.hist[PHASES[0]].count
+    s = 'taolst trace: '+str(count)+' frames\n'
+    for phase in PHASES:
+      s += '{:>8s}: {:s}\n'.format(phase, str(self.hist[phase]))
+      s += self.hist[phase].buckets_str()
+    return s
+
+  def chrome_trace(self):
+    events = [
+     {'name':'thread_name','ph':'M','pid':0,'tid':TID_GROUND,
+      'args':{'name':'ground'}},
+     {'name':'thread_name','ph':'M','pid':0,'tid':TID_UPLINK,
+      'args':{'name':'uplink'}},
+     {'name':'thread_name','ph':'M','pid':0,'tid':TID_DOWNLINK,
+      'args':{'name':'downlink'}}
+    ]
+    tids = {
+     'encode':TID_GROUND, 'transmit':TID_UPLINK,
+     'wait':TID_DOWNLINK, 'decode':TID_DOWNLINK
+    }
+    for span in self.spans:
+      args = {'msg_id':'0x{:04x}'.format(span.msg_id),
+              'opcode':'0x{:02x}'.format(span.opcode)}
+      for phase, (t_a, t_b) in span.phase_bounds().items():
+        if t_b > t_a:
+          events.append({
+           'name':phase, 'cat':'taolst', 'ph':'X', 'pid':0, 'tid':tids[phase],
+           'ts':(t_a-self.t0)/1000, 'dur':(t_b-t_a)/1000, 'args':args
+          })
+    return {'traceEvents':events, 'displayTimeUnit':'ms'}
+
+  def dump(self, path):
+    import json # imported here so untraced runs never load it
+    with open(path, 'w') as outfile:
+      json.dump(self.chrome_trace(), outfile)
+
+# helper functions
+
+## Returns a Tracer if TAOLST_TRACE is set, registering an exit handler that
+## writes the Chrome trace and prints histograms; otherwise returns None
+def from_env():
+  path = os.environ.get(TRACE_ENV, '')
+  if not path:
+    return None
+  tracer = Tracer()
+  def _dump():
+    tracer.dump(path)
+    sys.stderr.write(tracer.histogram_str())
+  atexit.register(_dump)
+  return tracer
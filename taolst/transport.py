@@ -0,0 +1,92 @@
+# transport.py
+# Sends TAOLST commands over a serial link and collects the reply
+
+# import Python modules
+import time # perf_counter, perf_counter_ns
+
+# import shared TAOLST modules
+from taolst.protocol import *
+
+# helper functions
+
+## Clears rx_cmd_buff while it holds a complete frame that duplicates (a
+## replycache.DuplicateFilter, or None) has seen before; clear() may complete
+## the next frame queued in rx_cmd_buff
+def drop_duplicate(rx_cmd_buff, duplicates):
+  while duplicates is not None and \
+        rx_cmd_buff.state == RxCmdBuffState.COMPLETE and \
+        duplicates.seen(rx_cmd_buff.data):
+    rx_cmd_buff.clear()
+
+## Writes cmd (a TxCmd or a complete RxCmdBuff) one byte at a time while
+## feeding reply bytes into rx_cmd_buff until rx_cmd_buff holds a complete
+## command; times the round trip if a trace.Tracer is given. The frame gets
+## the CRC trailer of rx_cmd_buff.crc, the mode of the link. Frames that a
+## replycache.DuplicateFilter, if given, has seen before are dropped. A reply
+## already complete in rx_cmd_buff (queued by RxCmdBuff and fed in by
+## clear()) is taken without reading, once the whole frame is written.
+## Returns False if timeout seconds pass without a complete reply, otherwise
+## True
+def transact(serial_port, cmd, rx_cmd_buff, tracer=None, timeout=None,\
+             duplicates=None):
+  t_deadline = None
+  if timeout is not None:
+    t_deadline = time.perf_counter()+timeout
+  span = None
+  if tracer is not None:
+    span = tracer.begin(\
+     (cmd.data[MSG_ID_MSB_INDEX]<<8)|(cmd.data[MSG_ID_LSB_INDEX]<<0),\
+     cmd.data[OPCODE_INDEX]\
+    )
+  frame = cmd_bytes_to_frame(cmd.data, rx_cmd_buff.crc)
+  if span is not None:
+    span.t_encoded = time.perf_counter_ns()
+  byte_i = 0
+  drop_duplicate(rx_cmd_buff, duplicates)
+  if rx_cmd_buff.state == RxCmdBuffState.COMPLETE:
+    serial_port.write(frame)
+    byte_i = len(frame)
+    if span is not None:
+      span.t_written = time.perf_counter_ns()
+  while rx_cmd_buff.state != RxCmdBuffState.COMPLETE:
+    if byte_i < len(frame):
+      serial_port.write(frame[byte_i:byte_i+1])
+      byte_i += 1
+      if span is not None and byte_i == len(frame):
+        span.t_written = time.perf_counter_ns()
+    if serial_port.in_waiting>0:
+      rx_bytes = serial_port.read(1)
+      if span is not None and not span.t_first_rx:
+        span.t_first_rx = time.perf_counter_ns()
+      for b in rx_bytes:
+        rx_cmd_buff.append_byte(b)
+        drop_duplicate(rx_cmd_buff, duplicates)
+    elif t_deadline is not None and time.perf_counter() > t_deadline:
+      return False
+  if span is not None:
+    tracer.end(span)
+  return True
+
+## Writes a whole frame with one call, then feeds reply bytes into rx_cmd_buff
+## until it holds a complete command; used where the time between writing and
+## the reply matters more than matching the byte-at-a-time pacing of transact.
+## The CRC trailer of rx_cmd_buff.crc, if any, is written after the frame.
+## Frames that duplicates has seen before are dropped, and a reply already
+## complete in rx_cmd_buff is taken without reading. Returns False if timeout
+## seconds pass without a complete reply
+def exchange(serial_port, frame, rx_cmd_buff, timeout=None, duplicates=None):
+  t_deadline = None
+  if timeout is not None:
+    t_deadline = time.perf_counter()+timeout
+  if rx_cmd_buff.crc:
+    frame = bytes(frame)+crc_trailer(memoryview(frame), rx_cmd_buff.crc)
+  serial_port.write(frame)
+  drop_duplicate(rx_cmd_buff, duplicates)
+  while rx_cmd_buff.state != RxCmdBuffState.COMPLETE:
+    if serial_port.in_waiting>0:
+      for b in serial_port.read(1):
+        rx_cmd_buff.append_byte(b)
+        drop_duplicate(rx_cmd_buff, duplicates)
+    elif t_deadline is not None and time.perf_counter() > t_deadline:
+      return False
+  return True
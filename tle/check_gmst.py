@@ -0,0 +1,65 @@
+# Usage: python3 check_gmst.py [tolerance_deg]
+# Parameters:
+#  tolerance_deg: largest acceptable GMST error in degrees (default 0.01,
+#                 about 2.4 s of Earth rotation)
+# Output:
+#  GMST from taolst/schedule.py at reference epochs against published values,
+#  and whether each is within the tolerance
+
+# import Python modules
+import calendar # UTC calendar dates to Unix times
+import os       # path to the shared taolst package
+import sys      # accessing script arguments
+
+# initialize script arguments
+tolerance_deg = 0.01 # largest acceptable error
+
+# parse script arguments
+if len(sys.argv) > 2:
+  print(\
+   'Usage: '\
+   'python3 check_gmst.py '\
+   '[tolerance_deg]'\
+  )
+  exit()
+if len(sys.argv) > 1:
+  tolerance_deg = float(sys.argv[1])
+
+# import modules needed once inputs are given
+import numpy # degrees
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import schedule   # GMST
+from taolst.protocol import * # J2000_UNIX_NS
+
+################################################################################
+
+# "constants"
+
+## (name, J2000 ns, GMST in degrees): J2000.0 itself (noon TT), noon UT1 of
+## the same day (the IAU 1982 GMST_J2000) and example 3-5 of Vallado,
+## Fundamentals of Astrodynamics and Applications (1992-08-20 12:14 UT1)
+REFERENCES = (
+ ('J2000.0 (noon TT)', 0, 280.19245),
+ ('2000-01-01 12:00 UT', -schedule.J2000_UT_OFFSET_NS, schedule.GMST_J2000),
+ ('1992-08-20 12:14 UT',\
+  calendar.timegm((1992,8,20,12,14,0))*1000000000-J2000_UNIX_NS, 152.578788)
+)
+
+################################################################################
+
+# Compare each reference with the computed GMST
+passed = 0
+for name, t_ns, expected_deg in REFERENCES:
+  gmst_deg = numpy.degrees(schedule.gmst(t_ns))%360.0
+  error_deg = (gmst_deg-expected_deg+180.0)%360.0-180.0
+  ok = abs(error_deg) <= tolerance_deg
+  passed += ok
+  print('{:>20s}: GMST {:11.6f} deg, expected {:11.6f} deg, error {:+.6f} '\
+   'deg {:s}'.format(\
+    name, gmst_deg, expected_deg, error_deg, 'ok' if ok else 'FAILED'\
+  ))
+print('{:d} of {:d} references within {:g} deg'.format(\
+ passed, len(REFERENCES), tolerance_deg\
+))
@@ -0,0 +1,89 @@
+# Usage: python3 check_positions.py /path/to/catalogs /path/to/positions.csv
+#                                   [tolerance_km]
+# Parameters:
+#  /path/to/catalogs:     TLE catalog file, or directory of catalog files
+#  /path/to/positions.csv: board-reported positions, with a header line
+#                          t_ns,norad,x_km,y_km,z_km and one report per line;
+#                          t_ns is the board time in J2000 nanoseconds and
+#                          x,y,z are in the TEME frame
+#  tolerance_km:          largest acceptable position error (default 1)
+# Output:
+#  Position error statistics per NORAD ID against SGP4 from the freshest TLE,
+#  and the reports off by more than the tolerance
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+
+# initialize script arguments
+catalogs = ''      # catalog file or directory
+positions = ''     # board-reported positions
+tolerance_km = 1.0 # largest acceptable error
+
+# parse script arguments
+if 3<=len(sys.argv)<=4:
+  catalogs = sys.argv[1]
+  positions = sys.argv[2]
+  if len(sys.argv) > 3:
+    tolerance_km = float(sys.argv[3])
+else:
+  print(\
+   'Usage: '\
+   'python3 check_positions.py '\
+   '/path/to/catalogs /path/to/positions.csv [tolerance_km]'\
+  )
+  exit()
+
+# import modules needed once inputs are given
+import numpy # report arrays
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import sgp4 # vectorized SGP4
+from taolst import tle  # TLE catalogs
+
+################################################################################
+
+# Load the catalogs
+catalog = tle.Catalog()
+for path in tle.catalog_paths(catalogs):
+  catalog.load(path)
+
+# Load the board reports
+reports = numpy.loadtxt(positions, delimiter=',', skiprows=1, ndmin=1, dtype=[\
+ ('t_ns','<i8'), ('norad','<i4'), ('x','<f8'), ('y','<f8'), ('z','<f8')\
+])
+t_ns = reports['t_ns']
+norads = reports['norad']
+reported = numpy.stack((reports['x'], reports['y'], reports['z']), axis=-1)
+
+# Propagate every report in one call, each with the freshest TLE of its target
+targets = [norad for norad in numpy.unique(norads)\
+           if catalog.freshest(norad) is not None]
+missing = len(norads)-numpy.isin(norads, targets).sum()
+if missing:
+  print('{:d} reports for targets not in the catalogs'.format(missing))
+if not targets:
+  exit()
+elements = sgp4.Elements([catalog.freshest(norad) for norad in targets])
+known = numpy.isin(norads, targets)
+rows = numpy.searchsorted(targets, norads[known])
+expected, velocity, error = elements.at(t_ns[known], rows)
+errors = sgp4.errors(expected, reported[known])
+
+# Print statistics per target and the reports out of tolerance
+for row, norad in enumerate(targets):
+  e = errors[rows == row]
+  print('{:05d}: {:d} reports, error mean {:.3f} km, max {:.3f} km'.format(\
+   norad, len(e), numpy.nanmean(e), numpy.nanmax(e)\
+  ))
+bad = numpy.flatnonzero(~(errors <= tolerance_km))
+for i in bad:
+  print('{:05d} at {:d} ns: {:s}'.format(\
+   targets[rows[i]], t_ns[known][i],\
+   'SGP4 error {:d}'.format(error[i]) if error[i] else\
+   'off by {:.3f} km'.format(errors[i])\
+  ))
+print('{:d} of {:d} reports within {:g} km'.format(\
+ len(errors)-len(bad), len(errors), tolerance_km\
+))
@@ -0,0 +1,128 @@
+# Usage: python3 plan_passes.py /path/to/catalogs norad lat lon [alt] [hours]
+#                               [min_elevation] [baud] [/path/to/program.hex]
+# Parameters:
+#  /path/to/catalogs:    TLE catalog file, or directory of catalog files
+#  norad:                NORAD ID of the satellite
+#  lat, lon:             ground station latitude and longitude in degrees
+#  alt:                  ground station altitude in km (default 0)
+#  hours:                how far ahead to predict, from now (default 24)
+#  min_elevation:        lowest usable elevation in degrees (default 10)
+#  baud:                 link baud rate (default 115200)
+#  /path/to/program.hex: program whose upload is planned into the passes
+# Output:
+#  One line per pass with its AOS and LOS times (UTC), duration, maximum
+#  elevation and how many write page frames fit; with a program, the number
+#  of its frames each pass carries
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+
+# initialize script arguments
+catalogs = ''         # catalog file or directory
+norad = 0             # satellite
+lat = 0.0             # station latitude
+lon = 0.0             # station longitude
+alt = 0.0             # station altitude
+hours = 24.0          # prediction span
+min_elevation = 10.0  # usable elevation
+baud = 115200         # link rate
+program = ''          # program to upload
+
+# parse script arguments
+if 5<=len(sys.argv)<=10:
+  catalogs = sys.argv[1]
+  norad = int(sys.argv[2])
+  lat = float(sys.argv[3])
+  lon = float(sys.argv[4])
+  if len(sys.argv) > 5:
+    alt = float(sys.argv[5])
+  if len(sys.argv) > 6:
+    hours = float(sys.argv[6])
+  if len(sys.argv) > 7:
+    min_elevation = float(sys.argv[7])
+  if len(sys.argv) > 8:
+    baud = int(sys.argv[8])
+  if len(sys.argv) > 9:
+    program = sys.argv[9]
+else:
+  print(\
+   'Usage: '\
+   'python3 plan_passes.py '\
+   '/path/to/catalogs norad lat lon [alt] [hours] [min_elevation] [baud] '\
+   '[/path/to/program.hex]'\
+  )
+  exit()
+
+# import modules needed once inputs are given
+import datetime # timedelta
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import hexfile  # Intel HEX pages
+from taolst import schedule # pass prediction and command queue
+from taolst import timesync # ground clock
+from taolst import tle      # TLE catalogs
+from taolst.protocol import * # TAOLST constants and TxCmd
+from taolst.protocol import J2000 # space time epoch
+
+################################################################################
+
+# Special values for the EXPT board
+
+HWID = 0x5441
+SRC  = 0x00
+
+# Load the catalogs
+catalog = tle.Catalog()
+for path in tle.catalog_paths(catalogs):
+  catalog.load(path)
+target = catalog.freshest(norad)
+if target is None:
+  print('{:05d}: not in catalogs'.format(norad))
+  exit()
+
+# Predict passes from now
+station = schedule.Station(lat, lon, alt, min_elevation)
+t_now = timesync.GroundClock().now_ns()
+passes = schedule.predict_passes(\
+ target, station, t_now, t_now+int(hours*3600*schedule.SECOND_NS)\
+)
+
+# Queue the program upload, if any, then the jump
+budget = schedule.LinkBudget(baud)
+scheduler = schedule.Scheduler(budget)
+page_cmd = TxCmd(BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, 0x0000, SRC, DEST_EXPT)
+page_cmd.bootloader_write_page_ext(page_number=0, page_data=bytes(128))
+if program:
+  for page_number, page_data in enumerate(hexfile.read_pages(program)):
+    cmd = TxCmd(\
+     BOOTLOADER_WRITE_PAGE_EXT_OPCODE, HWID, page_number, SRC, DEST_EXPT\
+    )
+    cmd.bootloader_write_page_ext(page_number=page_number, page_data=page_data)
+    scheduler.add(cmd)
+  scheduler.add(TxCmd(\
+   BOOTLOADER_JUMP_OPCODE, HWID, len(scheduler), SRC, DEST_EXPT\
+  ))
+counts = scheduler.plan(passes)
+
+# Print the passes
+def utc(t_ns):
+  return (J2000+datetime.timedelta(microseconds=t_ns//1000)).\
+   strftime('%Y-%m-%d %H:%M:%S')
+print('{:05d} {:s}: {:d} passes in {:g} hours'.format(\
+ norad, target.name, len(passes), hours\
+))
+for i, contact in enumerate(passes):
+  line = '{:s} to {:s}: {:s}, {:d} write pages fit'.format(\
+   utc(contact.t_aos), utc(contact.t_los)[11:], str(contact),\
+   int(budget.capacity(contact)/budget.seconds(page_cmd))\
+  )
+  if program and i < len(counts):
+    line += ', {:d} frames planned'.format(counts[i])
+  print(line)
+if program:
+  print('{:d} frames need {:d} passes{:s}'.format(\
+   len(scheduler), len(counts),\
+   '' if sum(counts) == len(scheduler) else ', more than predicted'\
+  ))
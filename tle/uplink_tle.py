@@ -0,0 +1,99 @@
+# Usage: python3 uplink_tle.py /path/to/dev /path/to/catalogs /path/to/state
+#                              [norad ...]
+# Parameters:
+#  /path/to/dev:      path to device, e.g. /dev/ttyUSB0
+#  /path/to/catalogs: TLE catalog file, or directory of catalog files
+#  /path/to/state:    directory of the per-HWID acknowledged epochs
+#  norad:             NORAD IDs to uplink (default all in the catalogs)
+# Output:
+#  One line per NORAD ID with the freshest epoch and whether it was uplinked;
+#  tle-HWID.json in the state directory holds the acknowledged epochs and
+#  msgid-HWID.json the next message ID
+
+# import Python modules
+import os   # path to the shared taolst package
+import sys  # accessing script arguments
+
+# initialize script arguments
+dev = ''      # serial device
+catalogs = '' # catalog file or directory
+state = ''    # acknowledged epochs directory
+norads = []   # NORAD IDs to uplink
+
+# parse script arguments
+if len(sys.argv)>=4:
+  dev = sys.argv[1]
+  catalogs = sys.argv[2]
+  state = sys.argv[3]
+  norads = [int(norad) for norad in sys.argv[4:]]
+else:
+  print(\
+   'Usage: '\
+   'python3 uplink_tle.py '\
+   '/path/to/dev /path/to/catalogs /path/to/state [norad ...]'\
+  )
+  exit()
+
+# import modules needed once catalogs are given
+import datetime # timedelta
+
+# import shared TAOLST modules
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from taolst import device # serial devices
+from taolst import msgid  # persisted message IDs
+from taolst import tle    # TLE catalogs and uplink
+from taolst.protocol import * # TAOLST constants
+from taolst.protocol import J2000 # space time epoch
+
+################################################################################
+
+# Special values for the EXPT board
+
+HWID = 0x5441
+SRC  = 0x00
+
+# Load the catalogs
+catalog = tle.Catalog()
+for path in tle.catalog_paths(catalogs):
+  added = catalog.load(path)
+  print('{:s}: {:d} TLEs'.format(path, added))
+print('{:d} TLEs for {:d} satellites, {:d} rejected'.format(\
+ len(catalog), len(catalog.norads()), catalog.rejected\
+))
+if not norads:
+  norads = catalog.norads()
+
+# Create serial object
+try:
+  serial_port = device.open_serial(dev)
+except:
+  print('Serial port object creation failed:')
+  print('  '+dev)
+  exit()
+
+################################################################################
+
+# Uplink the freshest TLE of each target the board does not have yet
+allocator = msgid.MsgIdAllocator(HWID, msgid.state_path(state, HWID))
+uplink = tle.Uplink(\
+ serial_port, HWID, SRC, DEST_EXPT, tle.ack_path(state, HWID),\
+ allocator=allocator\
+)
+for norad in norads:
+  freshest = catalog.freshest(norad)
+  if freshest is None:
+    print('{:05d}: not in catalogs'.format(norad))
+    continue
+  epoch = J2000+datetime.timedelta(microseconds=freshest.epoch_ns//1000)
+  needed = uplink.needed(freshest)
+  if uplink.send(freshest):
+    result = 'uplinked'
+  elif not needed:
+    result = 'already acknowledged'
+  else:
+    result = 'not acknowledged'
+  print('{:05d} {:24s} {:s}: {:s}'.format(\
+   norad, freshest.name, epoch.strftime('%Y-%m-%d %H:%M:%S'), result\
+  ))
+allocator.save(release=True)
+print(str(uplink))